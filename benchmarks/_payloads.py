@@ -0,0 +1,175 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Synthetic gateway payloads shared by the benchmark scripts.
+# The shapes mirror what Discord sends for the respective events,
+# with snowflakes encoded as strings as they are in JSON.
+
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List
+
+EPOCH_ID = 80351110224678912
+
+
+def snowflake(rng: random.Random) -> str:
+    return str(rng.randrange(EPOCH_ID, EPOCH_ID << 6))
+
+
+def user(rng: random.Random) -> Dict[str, Any]:
+    return {
+        'id': snowflake(rng),
+        'username': f'user{rng.randrange(1_000_000)}',
+        'global_name': None,
+        'discriminator': '0',
+        'avatar': '%032x' % rng.getrandbits(128),
+        'public_flags': 0,
+        'bot': False,
+    }
+
+
+def member(rng: random.Random, roles: List[str]) -> Dict[str, Any]:
+    return {
+        'user': user(rng),
+        'roles': rng.sample(roles, k=min(len(roles), 3)),
+        'nick': None,
+        'avatar': None,
+        'joined_at': '2021-04-12T18:01:02.123000+00:00',
+        'premium_since': None,
+        'deaf': False,
+        'mute': False,
+        'pending': False,
+        'flags': 0,
+        'communication_disabled_until': None,
+    }
+
+
+def message_create(rng: random.Random, *, guild_id: str = '0', channel_id: str = '0') -> Dict[str, Any]:
+    author = user(rng)
+    return {
+        'id': snowflake(rng),
+        'type': 0,
+        'content': 'hello world ' * rng.randrange(1, 10),
+        'channel_id': channel_id,
+        'guild_id': guild_id,
+        'author': author,
+        'member': {k: v for k, v in member(rng, []).items() if k != 'user'},
+        'attachments': [],
+        'embeds': [],
+        'mentions': [],
+        'mention_roles': [],
+        'pinned': False,
+        'mention_everyone': False,
+        'tts': False,
+        'timestamp': '2024-01-01T00:00:00.000000+00:00',
+        'edited_timestamp': None,
+        'flags': 0,
+        'components': [],
+        'nonce': snowflake(rng),
+    }
+
+
+def guild_create(rng: random.Random, *, members: int = 250, channels: int = 50, roles: int = 20) -> Dict[str, Any]:
+    guild_id = snowflake(rng)
+    role_ids = [snowflake(rng) for _ in range(roles)]
+    return {
+        'id': guild_id,
+        'name': 'Benchmark Guild',
+        'icon': None,
+        'owner_id': snowflake(rng),
+        'afk_channel_id': None,
+        'afk_timeout': 300,
+        'verification_level': 1,
+        'default_message_notifications': 1,
+        'explicit_content_filter': 2,
+        'mfa_level': 0,
+        'features': ['COMMUNITY', 'NEWS'],
+        'premium_tier': 1,
+        'premium_subscription_count': 3,
+        'preferred_locale': 'en-US',
+        'nsfw_level': 0,
+        'system_channel_flags': 0,
+        'large': members >= 250,
+        'unavailable': False,
+        'member_count': members,
+        'joined_at': '2021-04-12T18:01:02.123000+00:00',
+        'roles': [
+            {
+                'id': role_id,
+                'name': f'role {i}',
+                'color': 0,
+                'hoist': False,
+                'position': i,
+                'permissions': '104320577',
+                'managed': False,
+                'mentionable': False,
+                'flags': 0,
+            }
+            for i, role_id in enumerate(role_ids)
+        ],
+        'channels': [
+            {
+                'id': snowflake(rng),
+                'type': 0,
+                'name': f'channel-{i}',
+                'position': i,
+                'parent_id': None,
+                'topic': None,
+                'nsfw': False,
+                'rate_limit_per_user': 0,
+                'last_message_id': None,
+                'permission_overwrites': [
+                    {'id': role_ids[0], 'type': 0, 'allow': '1024', 'deny': '0'},
+                ],
+            }
+            for i in range(channels)
+        ],
+        'members': [member(rng, role_ids) for _ in range(members)],
+        'presences': [],
+        'voice_states': [],
+        'threads': [],
+        'emojis': [],
+        'stickers': [],
+        'stage_instances': [],
+        'guild_scheduled_events': [],
+        'soundboard_sounds': [],
+    }
+
+
+def ready(rng: random.Random, *, guilds: int = 1000) -> Dict[str, Any]:
+    return {
+        'v': 10,
+        'user': user(rng),
+        'session_id': '%032x' % rng.getrandbits(128),
+        'resume_gateway_url': 'wss://gateway-us-east1-b.discord.gg',
+        'guilds': [{'id': snowflake(rng), 'unavailable': True} for _ in range(guilds)],
+        'private_channels': [],
+        'application': {'id': snowflake(rng), 'flags': 0},
+        'shard': [0, 1],
+    }
+
+
+def dispatch(event: str, data: Dict[str, Any], sequence: int) -> Dict[str, Any]:
+    return {'t': event, 's': sequence, 'op': 0, 'd': data}
@@ -0,0 +1,108 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Measures ConnectionState.get_channel for known and unknown channel IDs as
+# the number of cached guilds grows, compared to checking every guild, as
+# was done before.
+#
+# Usage: python benchmarks/channel_lookup.py
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Union
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discord  # noqa: E402
+from discord.state import ConnectionState  # noqa: E402
+
+import _payloads  # noqa: E402
+
+
+class ScanningConnectionState(ConnectionState):
+    def get_channel(self, id: Optional[int]) -> Optional[Union[discord.abc.GuildChannel, discord.Thread]]:
+        if id is None:
+            return None
+
+        pm = self._get_private_channel(id)
+        if pm is not None:
+            return pm
+
+        for guild in self.guilds:
+            channel = guild._resolve_channel(id)
+            if channel is not None:
+                return channel
+
+
+def make_state(cls: type, guilds: int) -> ConnectionState:
+    state = cls(
+        dispatch=lambda event, *args: None,
+        handlers={},
+        hooks={},
+        http=mock.MagicMock(),
+        intents=discord.Intents.default(),
+    )
+    rng = random.Random(0)
+    for _ in range(guilds):
+        state._add_guild_from_data(_payloads.guild_create(rng, members=0, channels=5, roles=1))  # type: ignore
+    return state
+
+
+def measure(state: ConnectionState, ids: List[int]) -> float:
+    get_channel = state.get_channel
+    start = time.perf_counter()
+    for channel_id in ids:
+        get_channel(channel_id)
+    return (time.perf_counter() - start) / len(ids)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure channel lookups against the number of guilds.')
+    parser.add_argument('-n', '--lookups', type=int, default=200, help='lookups per measurement')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f'{"guilds":>8} {"lookup":>8} {"indexed (us)":>13} {"scan (us)":>12}')
+    for guilds in (100, 1000, 10000, 50000):
+        indexed = make_state(ConnectionState, guilds)
+        scanning = make_state(ScanningConnectionState, guilds)
+        channels = [channel.id for guild in indexed.guilds for channel in guild.channels]
+        known = [rng.choice(channels) for _ in range(args.lookups)]
+        unknown = [rng.getrandbits(63) for _ in range(args.lookups)]
+
+        for name, ids in (('known', known), ('unknown', unknown)):
+            a = measure(indexed, ids)
+            b = measure(scanning, ids)
+            print(f'{guilds:>8} {name:>8} {a * 1e6:>13.2f} {b * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
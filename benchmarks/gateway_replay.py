@@ -0,0 +1,122 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Replays a gateway recording made with discord.GatewayRecorder into a
+# Client without any network connection and reports the events per second,
+# the time spent in each ConnectionState parser and the peak memory.
+#
+# Without a recording, a synthetic one is generated first, which makes this
+# usable as a reproducible benchmark of the state layer.
+#
+# Usage: python benchmarks/gateway_replay.py [recording] [--speed 1.0] [--trace-memory]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discord  # noqa: E402
+
+import _payloads  # noqa: E402
+
+
+def generate(path: str, *, guilds: int, messages: int) -> None:
+    rng = random.Random(0)
+    payloads = [_payloads.guild_create(rng, members=250, channels=20) for _ in range(guilds)]
+    ready = _payloads.ready(rng, guilds=0)
+    ready['guilds'] = [{'id': guild['id'], 'unavailable': True} for guild in payloads]
+
+    with discord.GatewayRecorder(path) as recorder:
+        recorder.record(None, json.dumps({'t': None, 's': None, 'op': 10, 'd': {'heartbeat_interval': 41250}}))
+        sequence = 1
+        recorder.record(None, json.dumps(_payloads.dispatch('READY', ready, sequence)))
+        for guild in payloads:
+            sequence += 1
+            recorder.record(None, json.dumps(_payloads.dispatch('GUILD_CREATE', guild, sequence)))
+
+        for _ in range(messages):
+            guild = rng.choice(payloads)
+            channel = rng.choice(guild['channels'])
+            message = _payloads.message_create(rng, guild_id=guild['id'], channel_id=channel['id'])
+            sequence += 1
+            recorder.record(None, json.dumps(_payloads.dispatch('MESSAGE_CREATE', message, sequence)))
+            if rng.random() < 0.5:
+                reaction = {
+                    'user_id': message['author']['id'],
+                    'channel_id': channel['id'],
+                    'message_id': message['id'],
+                    'guild_id': guild['id'],
+                    'emoji': {'id': None, 'name': '\N{THUMBS UP SIGN}'},
+                    'burst': False,
+                    'type': 0,
+                }
+                sequence += 1
+                recorder.record(None, json.dumps(_payloads.dispatch('MESSAGE_REACTION_ADD', reaction, sequence)))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Replay a gateway recording and report state layer performance.')
+    parser.add_argument('recording', nargs='?', help='recording made with discord.GatewayRecorder')
+    parser.add_argument('--speed', type=float, default=None, help='replay speed, as fast as possible if omitted')
+    parser.add_argument('--trace-memory', action='store_true', help='trace the peak memory with tracemalloc')
+    parser.add_argument('--guilds', type=int, default=100, help='guilds in the synthetic recording')
+    parser.add_argument('--messages', type=int, default=50000, help='messages in the synthetic recording')
+    args = parser.parse_args()
+
+    path = args.recording
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.gz')
+        os.close(fd)
+        generate(path, guilds=args.guilds, messages=args.messages)
+
+    try:
+        client = discord.Client(intents=discord.Intents.all(), chunk_guilds_at_startup=False)
+        stats = await discord.GatewayReplayer(path).replay(client, speed=args.speed, trace_memory=args.trace_memory)
+    finally:
+        if args.recording is None:
+            os.remove(path)
+
+    print(f'{stats.frames} frames, {stats.events} events in {stats.elapsed:.3f}s ({stats.events_per_second:,.0f} events/s)')
+    if stats.peak_memory is not None:
+        print(f'peak memory: {stats.peak_memory / 1024 / 1024:.1f} MiB')
+
+    print()
+    print(f'{"event":<32} {"calls":>8} {"total (ms)":>11} {"per call (us)":>14}')
+    timings = sorted(stats.parser_time.items(), key=lambda item: item[1], reverse=True)
+    for event, elapsed in timings:
+        calls = stats.parser_calls[event]
+        if calls:
+            print(f'{event:<32} {calls:>8} {elapsed * 1e3:>11.2f} {elapsed / calls * 1e6:>14.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
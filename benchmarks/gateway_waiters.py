@@ -0,0 +1,81 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Measures the per-frame overhead of DiscordWebSocket.received_message
+# as the number of pending gateway waiters (DiscordWebSocket.wait_for)
+# for other events grows.
+#
+# Usage: python benchmarks/gateway_waiters.py
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from discord.gateway import DiscordWebSocket  # noqa: E402
+
+import _payloads  # noqa: E402
+
+
+async def measure(waiters: int, frames: int) -> float:
+    ws = DiscordWebSocket(mock.MagicMock(), loop=asyncio.get_running_loop())
+    ws._connection = mock.MagicMock()
+    ws._discord_parsers = {'MESSAGE_CREATE': lambda data: None}
+    ws.shard_id = 0
+
+    for i in range(waiters):
+        # e.g. voice connects and chunk requests waiting on their own events
+        event = 'VOICE_STATE_UPDATE' if i % 2 else 'GUILD_MEMBERS_CHUNK'
+        ws.wait_for(event, lambda data: False)
+
+    rng = random.Random(0)
+    frame = json.dumps(_payloads.dispatch('MESSAGE_CREATE', _payloads.message_create(rng), 1))
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        await ws.received_message(frame)
+    return (time.perf_counter() - start) / frames
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure gateway dispatch overhead against pending waiters.')
+    parser.add_argument('-n', '--frames', type=int, default=20000, help='frames per measurement')
+    args = parser.parse_args()
+
+    print(f'{"waiters":>8} {"per frame (us)":>15}')
+    for waiters in (0, 10, 100, 1000, 10000):
+        elapsed = await measure(waiters, args.frames)
+        print(f'{waiters:>8} {elapsed * 1e6:>15.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Measures the time and memory taken to load guilds from GUILD_CREATE
+# payloads with and without lazy_guilds, and the cost of the first access
+# to a channel and a role of a lazily loaded guild.
+#
+# Usage: python benchmarks/guild_hydration.py
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discord  # noqa: E402
+from discord.state import ConnectionState  # noqa: E402
+
+import _payloads  # noqa: E402
+
+
+def make_state(lazy: bool) -> ConnectionState:
+    return ConnectionState(
+        dispatch=lambda event, *args: None,
+        handlers={},
+        hooks={},
+        http=mock.MagicMock(),
+        intents=discord.Intents.default(),
+        lazy_guilds=lazy,
+    )
+
+
+def measure(lazy: bool, payloads: List[Dict[str, Any]]) -> Tuple[float, float, float]:
+    state = make_state(lazy)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for payload in payloads:
+        state._add_guild_from_data(payload)  # type: ignore
+    elapsed = time.perf_counter() - start
+    # The payloads are kept alive by the benchmark either way, so only the objects created count
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for payload in payloads:
+        guild = state._get_guild(int(payload['id']))
+        guild.get_channel(int(payload['channels'][0]['id']))  # type: ignore
+        guild.get_role(int(payload['roles'][0]['id']))  # type: ignore
+    access = time.perf_counter() - start
+    return elapsed / len(payloads), used / len(payloads), access / len(payloads)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure loading guilds eagerly and lazily.')
+    parser.add_argument('-n', '--guilds', type=int, default=2000, help='guilds to load')
+    parser.add_argument('-c', '--channels', type=int, default=50, help='channels per guild')
+    parser.add_argument('-r', '--roles', type=int, default=20, help='roles per guild')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    payloads = [_payloads.guild_create(rng, members=1, channels=args.channels, roles=args.roles) for _ in range(args.guilds)]
+
+    print(f'{"mode":>6} {"load (us)":>10} {"KiB/guild":>10} {"first access (us)":>18}')
+    for name, lazy in (('eager', False), ('lazy', True)):
+        elapsed, used, access = measure(lazy, payloads)
+        print(f'{name:>6} {elapsed * 1e6:>10.1f} {used / 1024:>10.1f} {access * 1e6:>18.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
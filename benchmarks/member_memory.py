@@ -0,0 +1,106 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Measures the memory used per cached member and the cost of looking up a
+# member with the default member cache and with CompactCacheStorage.
+# Users are cached before measuring since both share them.
+#
+# Usage: python benchmarks/member_memory.py
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Tuple
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discord  # noqa: E402
+from discord.state import ConnectionState  # noqa: E402
+
+import _payloads  # noqa: E402
+
+
+def make_state(storage: discord.CacheStorage) -> ConnectionState:
+    return ConnectionState(
+        dispatch=lambda event, *args: None,
+        handlers={},
+        hooks={},
+        http=mock.MagicMock(),
+        intents=discord.Intents.all(),
+        cache_storage=storage,
+    )
+
+
+def measure(storage: discord.CacheStorage, payload: Dict[str, Any], lookups: int) -> Tuple[float, float, float]:
+    state = make_state(storage)
+    # The user cache is weak so they have to be kept alive meanwhile
+    users = [state.store_user(member['user']) for member in payload['members']]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    guild = state._add_guild_from_data(payload)  # type: ignore
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    members = len(payload['members'])
+    ids = [int(member['user']['id']) for member in payload['members']]
+    rng = random.Random(1)
+    ids = [rng.choice(ids) for _ in range(lookups)]
+    get_member = guild.get_member
+    start = time.perf_counter()
+    for member_id in ids:
+        get_member(member_id)
+    lookup = (time.perf_counter() - start) / lookups
+
+    start = time.perf_counter()
+    for member in guild.members:
+        member.display_name
+    iteration = (time.perf_counter() - start) / members
+    del users
+    return used / members, lookup, iteration
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure the memory used per cached member.')
+    parser.add_argument('-n', '--lookups', type=int, default=100000, help='lookups per measurement')
+    parser.add_argument('-r', '--roles', type=int, default=10, help='roles in the guild')
+    args = parser.parse_args()
+
+    print(f'{"members":>8} {"storage":>8} {"bytes/member":>13} {"lookup (us)":>12} {"iterate (us)":>13}')
+    for members in (1000, 10000, 100000):
+        payload = _payloads.guild_create(random.Random(0), members=members, channels=0, roles=args.roles)
+        for name, storage in (('default', discord.CacheStorage()), ('compact', discord.CompactCacheStorage())):
+            used, lookup, iteration = measure(storage, payload, args.lookups)
+            print(f'{members:>8} {name:>8} {used:>13.0f} {lookup * 1e6:>12.2f} {iteration * 1e6:>13.2f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Measures the throughput of MESSAGE_REACTION_ADD events for cached messages
+# as the message cache (the max_messages option) grows, compared to looking
+# messages up by scanning the cache, as was done before.
+#
+# Usage: python benchmarks/message_cache.py
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discord  # noqa: E402
+from discord import utils  # noqa: E402
+from discord.message import Message  # noqa: E402
+from discord.state import ConnectionState  # noqa: E402
+
+import _payloads  # noqa: E402
+
+
+class ScanningConnectionState(ConnectionState):
+    def _get_message(self, msg_id: Optional[int]) -> Optional[Message]:
+        return utils.find(lambda m: m.id == msg_id, reversed(self._messages)) if self._messages else None
+
+
+def measure(cls: type, size: int, events: int) -> float:
+    state = cls(
+        dispatch=lambda event, *args: None,
+        handlers={},
+        hooks={},
+        http=mock.MagicMock(),
+        intents=discord.Intents.default(),
+        max_messages=size,
+    )
+
+    rng = random.Random(0)
+    messages = [_payloads.message_create(rng) for _ in range(size)]
+    for data in messages:
+        state.parse_message_create(data)  # type: ignore
+
+    reactions = []
+    for _ in range(events):
+        message = rng.choice(messages)
+        reactions.append(
+            {
+                'user_id': message['author']['id'],
+                'channel_id': message['channel_id'],
+                'message_id': message['id'],
+                'emoji': {'id': None, 'name': '\N{THUMBS UP SIGN}'},
+                'burst': False,
+                'type': 0,
+            }
+        )
+
+    start = time.perf_counter()
+    for data in reactions:
+        state.parse_message_reaction_add(data)  # type: ignore
+    return events / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure reaction event throughput against the message cache size.')
+    parser.add_argument('-n', '--events', type=int, default=5000, help='reaction events per measurement')
+    args = parser.parse_args()
+
+    print(f'{"cached":>8} {"indexed (events/s)":>19} {"scan (events/s)":>16}')
+    for size in (1000, 5000, 10000, 50000):
+        indexed = measure(ConnectionState, size, args.events)
+        scan = measure(ScanningConnectionState, size, args.events)
+        print(f'{size:>8} {indexed:>19.0f} {scan:>16.0f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Measures the cost of RateLimitBackend.get_ratelimit with many live buckets,
+# and of expiring them once they become inactive, compared to scanning every
+# bucket whenever a new one is created, as was done before.
+#
+# Usage: python benchmarks/ratelimit_expiry.py [--buckets 500000]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from discord.http import Ratelimit  # noqa: E402
+from discord.ratelimits import RateLimitBackend  # noqa: E402
+
+
+class FullScanBackend(RateLimitBackend):
+    # The expiry used before, every bucket is checked when one is created
+    def get_ratelimit(self, key: str, *, max_ratelimit_timeout: Optional[float] = None) -> Ratelimit:
+        try:
+            return self._buckets[key]
+        except KeyError:
+            self._buckets[key] = value = Ratelimit(max_ratelimit_timeout, key=key, backend=self)
+            if len(self._buckets) >= 256:
+                expired = [k for k, bucket in self._buckets.items() if bucket.is_inactive()]
+                for k in expired:
+                    del self._buckets[k]
+                    self.expired_buckets += 1
+            return value
+
+
+def fill(backend: RateLimitBackend, count: int) -> None:
+    # The full scan is quadratic while filling, so the buckets are added without it
+    get_ratelimit = RateLimitBackend.get_ratelimit
+    for i in range(count):
+        get_ratelimit(backend, f'bucket:{i}')
+
+
+def age(backend: RateLimitBackend, seconds: float) -> None:
+    for bucket in backend._buckets.values():
+        bucket._last_request -= seconds
+
+
+def measure(backend: RateLimitBackend, buckets: int, lookups: int) -> None:
+    name = type(backend).__name__
+    fill(backend, buckets)
+
+    # Steady state: every bucket is still active and new ones keep being created
+    start = time.perf_counter()
+    for i in range(lookups):
+        backend.get_ratelimit(f'new:{i}')
+    elapsed = (time.perf_counter() - start) / lookups
+    print(f'{name:>20} {"create (active)":>18} {elapsed * 1e6:>12.2f} us {backend.bucket_count:>10}')
+
+    start = time.perf_counter()
+    for i in range(lookups):
+        backend.get_ratelimit(f'bucket:{i}')
+    elapsed = (time.perf_counter() - start) / lookups
+    print(f'{name:>20} {"lookup (active)":>18} {elapsed * 1e6:>12.2f} us {backend.bucket_count:>10}')
+
+    # Every bucket became inactive
+    age(backend, 301)
+    start = time.perf_counter()
+    backend.get_ratelimit('expire')
+    elapsed = time.perf_counter() - start
+    print(f'{name:>20} {"expire all":>18} {elapsed * 1e3:>12.2f} ms {backend.bucket_count:>10}')
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure rate limit bucket lookups and expiry.')
+    parser.add_argument('-b', '--buckets', type=int, default=500000, help='number of live buckets')
+    parser.add_argument('-n', '--lookups', type=int, default=100, help='lookups per measurement')
+    args = parser.parse_args()
+
+    print(f'{"backend":>20} {"operation":>18} {"time":>15} {"buckets":>10}')
+    measure(RateLimitBackend(), args.buckets, args.lookups)
+    measure(FullScanBackend(), args.buckets, args.lookups)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Runs several processes sending requests to the same rate limited route of a
+# fake REST API and reports how many 429 responses they received, with either
+# the default in-memory rate limits or discord.SharedRateLimitBackend.
+#
+# Usage: python benchmarks/rest_ratelimit_load.py [--processes 4] [--requests 20] [--memory]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiohttp import web  # noqa: E402
+
+import discord  # noqa: E402
+from discord.http import HTTPClient, Route  # noqa: E402
+
+USER = {'id': '1000', 'username': 'bot', 'discriminator': '0', 'avatar': None, 'bot': True}
+
+
+class FakeAPI:
+    def __init__(self, limit: int, window: float) -> None:
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset: Optional[float] = None
+        self.ok = 0
+        self.ratelimited = 0
+
+    def response(self, data: object, *, status: int = 200, headers: Optional[dict] = None) -> web.Response:
+        return web.Response(body=json.dumps(data).encode(), status=status, headers=headers, content_type='application/json')
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        return self.response(USER)
+
+    async def get_messages(self, request: web.Request) -> web.Response:
+        now = time.monotonic()
+        if self.reset is None or now >= self.reset:
+            self.reset = now + self.window
+            self.remaining = self.limit
+
+        reset_after = self.reset - now
+        headers = {
+            'X-Ratelimit-Bucket': 'messages',
+            'X-Ratelimit-Limit': str(self.limit),
+            'X-Ratelimit-Reset-After': f'{reset_after:.3f}',
+        }
+        if self.remaining <= 0:
+            self.ratelimited += 1
+            headers['X-Ratelimit-Remaining'] = '0'
+            headers['Via'] = '1.1 google'
+            return self.response(
+                {'message': 'You are being rate limited.', 'retry_after': reset_after, 'global': False},
+                status=429,
+                headers=headers,
+            )
+
+        self.ok += 1
+        self.remaining -= 1
+        headers['X-Ratelimit-Remaining'] = str(self.remaining)
+        return self.response([], headers=headers)
+
+
+def worker(url: str, path: Optional[str], requests: int) -> None:
+    async def run() -> None:
+        Route.BASE = url + '/api/v10'
+        backend = discord.RateLimitBackend() if path is None else discord.SharedRateLimitBackend(path)
+        http = HTTPClient(asyncio.get_running_loop(), ratelimit_backend=backend)
+        await http.static_login('token')
+        try:
+            route = Route('GET', '/channels/{channel_id}/messages', channel_id=1)
+            # Learn the bucket hash before sending the burst
+            await http.request(route)
+            await asyncio.gather(*(http.request(route) for _ in range(requests - 1)))
+        finally:
+            await http.close()
+
+    asyncio.run(run())
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure 429 responses of processes sharing a REST rate limit.')
+    parser.add_argument('--processes', type=int, default=4, help='number of processes sharing the token')
+    parser.add_argument('--requests', type=int, default=20, help='requests sent by each process')
+    parser.add_argument('--limit', type=int, default=5, help='requests allowed per window by the fake API')
+    parser.add_argument('--window', type=float, default=1.0, help='length of a rate limit window in seconds')
+    parser.add_argument('--memory', action='store_true', help='use the default in-memory rate limits')
+    args = parser.parse_args()
+
+    api = FakeAPI(args.limit, args.window)
+    app = web.Application()
+    app.router.add_get('/api/v10/users/@me', api.get_user)
+    app.router.add_get('/api/v10/channels/{channel_id}/messages', api.get_messages)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = site._server.sockets[0].getsockname()[:2]  # type: ignore
+    url = f'http://{host}:{port}'
+
+    path = None
+    broker = None
+    if not args.memory:
+        path = os.path.join(tempfile.mkdtemp(), 'ratelimits.sock')
+        broker = discord.RateLimitBroker(path)
+        await broker.start()
+
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=worker, args=(url, path, args.requests)) for _ in range(args.processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    loop = asyncio.get_running_loop()
+    for process in processes:
+        await loop.run_in_executor(None, process.join)
+    elapsed = time.perf_counter() - start
+
+    if broker is not None:
+        await broker.close()
+    await runner.cleanup()
+
+    backend = 'memory' if args.memory else 'shared'
+    print(f'{backend}: {api.ok} requests, {api.ratelimited} 429 responses in {elapsed:.2f}s')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Sends the same attachment to many channels of a fake REST API at once and
+# reports the peak RSS of the sending process for each way of creating the
+# discord.File objects:
+#
+#   bytesio  File(io.BytesIO(data)) for every channel, aiohttp copies each buffer
+#   path     File(path) for every channel, opening the file every time
+#   source   FileSource(path).to_file() for every channel
+#   mmap     FileSource(path, mmap=True).to_file() for every channel
+#
+# Usage: python benchmarks/upload_memory.py [--size-mb 25] [--channels 100] [--mode source]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiohttp import web  # noqa: E402
+
+import discord  # noqa: E402
+from discord.http import HTTPClient, Route, handle_message_parameters  # noqa: E402
+
+MODES = ('bytesio', 'path', 'source', 'mmap')
+USER = {'id': '1000', 'username': 'bot', 'discriminator': '0', 'avatar': None, 'bot': True}
+
+
+def peak_rss() -> int:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+async def serve() -> None:
+    async def get_user(request: web.Request) -> web.Response:
+        return web.Response(body=json.dumps(USER).encode(), content_type='application/json')
+
+    async def send_message(request: web.Request) -> web.Response:
+        # Discard the upload without buffering it
+        async for _ in request.content.iter_chunked(1 << 16):
+            pass
+        return web.Response(body=b'{}', content_type='application/json')
+
+    app = web.Application(client_max_size=0)
+    app.router.add_get('/api/v10/users/@me', get_user)
+    app.router.add_post('/api/v10/channels/{channel_id}/messages', send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    # The parent process reads the port from the first line of output
+    print(site._server.sockets[0].getsockname()[1], flush=True)  # type: ignore
+    await asyncio.Event().wait()
+
+
+async def send(url: str, path: str, mode: str, channels: int, data: Optional[bytes]) -> None:
+    Route.BASE = url + '/api/v10'
+    http = HTTPClient(asyncio.get_running_loop())
+    await http.static_login('token')
+
+    source = discord.FileSource(path, mmap=mode == 'mmap') if mode in ('source', 'mmap') else None
+
+    def factory() -> discord.File:
+        if data is not None:
+            return discord.File(io.BytesIO(data), 'upload.bin')
+        if source is not None:
+            return source.to_file('upload.bin')
+        return discord.File(path, 'upload.bin')
+
+    files: List[discord.File] = []
+
+    async def send_one(channel_id: int) -> None:
+        file = factory()
+        files.append(file)
+        with handle_message_parameters(file=file) as params:
+            await http.send_message(channel_id, params=params)
+
+    try:
+        await asyncio.gather(*(send_one(channel_id) for channel_id in range(1, channels + 1)))
+    finally:
+        await http.close()
+        if source is not None:
+            source.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure the peak RSS of sending one attachment to many channels.')
+    parser.add_argument('--size-mb', type=int, default=25, help='size of the attachment in MiB')
+    parser.add_argument('--channels', type=int, default=100, help='number of channels to send it to')
+    parser.add_argument('--mode', choices=MODES, action='append', help='file creation mode, all by default')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', nargs=3, metavar=('URL', 'PATH', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve())
+        return
+
+    if args.worker:
+        url, path, mode = args.worker
+        baseline = peak_rss()
+        # Read outside of the event loop, it still counts towards the peak
+        data = Path(path).read_bytes() if mode == 'bytesio' else None
+        asyncio.run(send(url, path, mode, args.channels, data))
+        print(json.dumps({'baseline': baseline, 'peak': peak_rss()}))
+        return
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'upload.bin')
+    with open(path, 'wb') as fp:
+        for _ in range(args.size_mb):
+            fp.write(os.urandom(1 << 20))
+
+    # The server runs in its own process so that it doesn't count towards the measurements
+    server = subprocess.Popen([sys.executable, __file__, '--serve'], stdout=subprocess.PIPE, text=True)
+    try:
+        assert server.stdout is not None
+        url = f'http://127.0.0.1:{server.stdout.readline().strip()}'
+
+        print(f'sending {args.size_mb} MiB to {args.channels} channels')
+        for mode in args.mode or MODES:
+            command = [sys.executable, __file__, '--channels', str(args.channels), '--worker', url, path, mode]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(
+                f'{mode:<8} peak RSS {result["peak"] / (1 << 20):>8.1f} MiB (baseline {result["baseline"] / (1 << 20):.1f} MiB)'
+            )
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
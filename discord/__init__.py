@@ -76,6 +76,14 @@ from .presences import *
 from .primary_guild import *
 from .onboarding import *
 from .collectible import *
+from .sessions import *
+from .cluster import *
+from .replay import *
+from .ratelimits import *
+from .response_cache import *
+from .asset_cache import *
+from .metrics import *
+from .cache_storage import *
 
 
 class VersionInfo(NamedTuple):
@@ -0,0 +1,107 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from .errors import ClusterError
+
+# The connections between the processes of a ShardCluster and a RateLimitBroker
+# carry newline delimited JSON over a Unix socket.
+# Every message is an object of the form {"op": str, "nonce": int, "d": Any}.
+
+_log = logging.getLogger(__name__)
+
+# The longest message a connection can buffer, every IPC stream is opened with it as
+# its limit. asyncio's default of 64 KiB is too small for replies such as a guild
+# with many roles and channels.
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+def encode_message(payload: Dict[str, Any]) -> bytes:
+    # The standard library is used since latencies can be infinite before the first heartbeat
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class Channel:
+    # One end of an IPC connection, matching responses to pending requests by nonce
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self._nonces = itertools.count()
+        self._pending: Dict[int, asyncio.Future[Any]] = {}
+
+    async def read(self) -> Optional[Dict[str, Any]]:
+        try:
+            line = await self.reader.readline()
+        except ValueError:
+            # The message doesn't fit in the stream's buffer, the rest of the stream
+            # can't be framed anymore so the connection is treated as closed
+            _log.warning('Dropping an IPC connection that sent a message longer than its stream limit.')
+            return None
+
+        if not line:
+            return None
+        return json.loads(line)
+
+    def send(self, op: str, data: Any = None, *, nonce: Optional[int] = None, error: Optional[str] = None) -> None:
+        payload: Dict[str, Any] = {'op': op, 'nonce': nonce, 'd': data}
+        if error is not None:
+            payload['error'] = error
+        self.writer.write(encode_message(payload))
+
+    async def request(self, op: str, data: Any = None, *, timeout: Optional[float] = None) -> Any:
+        nonce = next(self._nonces)
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._pending[nonce] = future
+        try:
+            self.send(op, data, nonce=nonce)
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._pending.pop(nonce, None)
+
+    def resolve(self, payload: Dict[str, Any]) -> None:
+        future = self._pending.get(payload['nonce'])
+        if future is None or future.done():
+            return
+
+        error = payload.get('error')
+        if error is not None:
+            future.set_exception(ClusterError(error))
+        else:
+            future.set_result(payload['d'])
+
+    def close(self) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ClusterError('The IPC connection was closed'))
+        self._pending.clear()
+        self.writer.close()
@@ -26,10 +26,10 @@ from __future__ import annotations
 
 import io
 import os
-from typing import Any, Literal, Optional, TYPE_CHECKING, Tuple, Union
+from typing import Any, AsyncIterator, Literal, Optional, TYPE_CHECKING, Tuple, Union
 from .errors import DiscordException
 from . import utils
-from .file import File
+from .file import File, _save, _spool
 
 import yarl
 
@@ -86,6 +86,40 @@ class AssetMixin:
 
         return await self._state.http.get_from_cdn(self.url)
 
+    def stream(self, *, chunk_size: int = 65536, offset: int = 0) -> AsyncIterator[bytes]:
+        """Returns an :term:`asynchronous iterator` over the content of this asset.
+
+        The asset is downloaded in chunks of at most ``chunk_size`` bytes and
+        a dropped connection is resumed where it stopped using a ranged request.
+
+        .. versionadded:: 2.8
+
+        Parameters
+        ----------
+        chunk_size: :class:`int`
+            The maximum number of bytes to yield at a time.
+        offset: :class:`int`
+            The number of bytes to skip at the start of the asset.
+
+        Raises
+        ------
+        DiscordException
+            There was no internal connection state.
+        HTTPException
+            Downloading the asset failed.
+        NotFound
+            The asset was deleted.
+
+        Yields
+        -------
+        :class:`bytes`
+            The next chunk of the asset.
+        """
+        if self._state is None:
+            raise DiscordException('Invalid state (no ConnectionState provided)')
+
+        return self._state.http.stream_from_cdn(self.url, chunk_size=chunk_size, offset=offset)
+
     async def save(self, fp: Union[str, bytes, os.PathLike[Any], io.BufferedIOBase], *, seek_begin: bool = True) -> int:
         """|coro|
 
@@ -116,15 +150,7 @@ class AssetMixin:
             The number of bytes written.
         """
 
-        data = await self.read()
-        if isinstance(fp, io.BufferedIOBase):
-            written = fp.write(data)
-            if seek_begin:
-                fp.seek(0)
-            return written
-        else:
-            with open(fp, 'wb') as f:
-                return f.write(data)
+        return await _save(self.stream(), fp, seek_begin=seek_begin)
 
     async def to_file(
         self,
@@ -169,9 +195,8 @@ class AssetMixin:
             The asset as a file suitable for sending.
         """
 
-        data = await self.read()
         file_filename = filename if filename is not MISSING else yarl.URL(self.url).name
-        return File(io.BytesIO(data), filename=file_filename, description=description, spoiler=spoiler)
+        return await _spool(self.stream(), filename=file_filename, description=description, spoiler=spoiler)
 
 
 class Asset(AssetMixin):
@@ -0,0 +1,310 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+__all__ = ('AssetCache',)
+
+_log = logging.getLogger(__name__)
+
+# Query parameters signing attachment URLs, they change while the content stays the same
+_SIGNATURE_PARAMETERS = frozenset(('ex', 'is', 'hm'))
+
+
+class AssetCache:
+    """A bounded cache of CDN content for :class:`Client`.
+
+    Avatars, icons, emojis, stickers and attachments are served from URLs that
+    contain the hash or ID of their content, so the content of a URL never changes
+    and can be kept until it is evicted. The cache is filled by :meth:`Asset.read`,
+    :meth:`Attachment.read` and the other methods that download CDN content as a
+    whole, and the streaming methods such as :meth:`Attachment.save` are served
+    from it when the content is cached. Concurrent downloads of the same URL share
+    a single request.
+
+    Content is kept in memory and, if a ``path`` is given, in a directory on disk
+    which persists across restarts. Each tier evicts the least recently used content
+    once it exceeds its size. Content evicted from memory can still be read from disk.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    max_memory: :class:`int`
+        The maximum number of bytes to keep in memory. Defaults to 32 MiB.
+    path: Optional[Union[:class:`str`, :class:`os.PathLike`]]
+        The directory to keep content in on disk. It is created if it does not exist.
+        Defaults to ``None``, which only keeps content in memory.
+    max_disk: :class:`int`
+        The maximum number of bytes to keep on disk. Defaults to 512 MiB.
+
+    Attributes
+    -----------
+    max_memory: :class:`int`
+        The maximum number of bytes to keep in memory.
+    path: Optional[:class:`str`]
+        The directory content is kept in on disk.
+    max_disk: :class:`int`
+        The maximum number of bytes to keep on disk.
+    hits: :class:`int`
+        The number of downloads answered from the cache.
+    misses: :class:`int`
+        The number of downloads that were sent to the CDN.
+    memory_size: :class:`int`
+        The number of bytes kept in memory.
+    disk_size: :class:`int`
+        The number of bytes kept on disk. This is only known once the cache
+        was first used.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_memory: int = 32 * 1024 * 1024,
+        path: Optional[Union[str, os.PathLike[Any]]] = None,
+        max_disk: int = 512 * 1024 * 1024,
+    ) -> None:
+        self.max_memory: int = max_memory
+        self.path: Optional[str] = None if path is None else os.fspath(path)
+        self.max_disk: int = max_disk
+        self.hits: int = 0
+        self.misses: int = 0
+        self.memory_size: int = 0
+        self.disk_size: int = 0
+        # Key -> Content, least recently used first
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        # File name -> Size, least recently used first, loaded from the directory on first use
+        self._disk: Optional[OrderedDict[str, int]] = None
+
+    def __repr__(self) -> str:
+        return f'<AssetCache memory_size={self.memory_size} disk_size={self.disk_size} hit_rate={self.hit_rate:.2f}>'
+
+    @property
+    def hit_rate(self) -> float:
+        """:class:`float`: The fraction of downloads that were answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Returns the key content of a URL is cached under.
+
+        The signature of attachment URLs is removed since it changes over time,
+        the other query parameters such as ``size`` change the content and are kept.
+
+        Parameters
+        -----------
+        url: :class:`str`
+            The URL of the content.
+
+        Returns
+        --------
+        :class:`str`
+            The cache key.
+        """
+        parts = urlsplit(url)
+        if not parts.query:
+            return url
+        query = [item for item in parse_qsl(parts.query, keep_blank_values=True) if item[0] not in _SIGNATURE_PARAMETERS]
+        return urlunsplit(parts._replace(query=urlencode(sorted(query)), fragment=''))
+
+    async def get(self, url: str) -> Optional[bytes]:
+        """Returns the cached content of a URL, counting a hit or a miss.
+
+        Content found on disk is moved back into memory.
+
+        Parameters
+        -----------
+        url: :class:`str`
+            The URL of the content.
+
+        Returns
+        --------
+        Optional[:class:`bytes`]
+            The content, or ``None`` if it is not cached.
+        """
+        key = self.key(url)
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return data
+
+        if self.path is not None:
+            disk = await self._load()
+            name = self._file_name(key)
+            if name in disk:
+                loop = asyncio.get_running_loop()
+                try:
+                    data = await loop.run_in_executor(None, self._read, name)
+                except OSError:
+                    _log.debug('Could not read cached content of %s, removing it.', url, exc_info=True)
+                    await self._remove_file(name)
+                else:
+                    # It may have been evicted while it was read
+                    if name in disk:
+                        disk.move_to_end(name)
+                    self._store_memory(key, data)
+                    self.hits += 1
+                    return data
+
+        self.misses += 1
+        return None
+
+    async def set(self, url: str, data: bytes) -> None:
+        """Caches the content of a URL.
+
+        Parameters
+        -----------
+        url: :class:`str`
+            The URL of the content.
+        data: :class:`bytes`
+            The content.
+        """
+        key = self.key(url)
+        self._store_memory(key, data)
+
+        if self.path is None or len(data) > self.max_disk:
+            return
+
+        disk = await self._load()
+        name = self._file_name(key)
+        if name in disk:
+            disk.move_to_end(name)
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, name, data)
+        except OSError:
+            _log.warning('Could not write cached content of %s to disk.', url, exc_info=True)
+            return
+
+        if name in disk:
+            # Written by another call in the meantime
+            return
+
+        disk[name] = len(data)
+        self.disk_size += len(data)
+        while self.disk_size > self.max_disk:
+            await self._remove_file(next(iter(disk)))
+
+    async def clear(self) -> None:
+        """|coro|
+
+        Removes all cached content, including the content on disk, and resets the statistics.
+        """
+        self._memory.clear()
+        self.memory_size = 0
+        if self.path is not None:
+            disk = await self._load()
+            while disk:
+                await self._remove_file(next(iter(disk)))
+        self.hits = 0
+        self.misses = 0
+
+    def _store_memory(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory:
+            return
+
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.memory_size -= len(old)
+        self._memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.max_memory:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def _file_name(self, key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    async def _load(self) -> OrderedDict[str, int]:
+        if self._disk is None:
+            loop = asyncio.get_running_loop()
+            disk = await loop.run_in_executor(None, self._scan)
+            # Another call may have finished loading in the meantime
+            if self._disk is None:
+                self._disk = disk
+                self.disk_size = sum(disk.values())
+        return self._disk
+
+    def _scan(self) -> OrderedDict[str, int]:
+        assert self.path is not None
+        os.makedirs(self.path, exist_ok=True)
+        files = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                # Skip partially written files
+                if entry.is_file() and len(entry.name) == 64:
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        # The modification time is updated on every hit, so the oldest file was used least recently
+        files.sort()
+        return OrderedDict((name, size) for _, name, size in files)
+
+    def _read(self, name: str) -> bytes:
+        path = os.path.join(self.path, name)  # type: ignore # path is set when this is called
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        os.utime(path)
+        return data
+
+    def _write(self, name: str, data: bytes) -> None:
+        # Concurrent writes of the same content must not share a temporary file
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp, os.path.join(self.path, name))  # type: ignore # path is set when this is called
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    async def _remove_file(self, name: str) -> None:
+        assert self._disk is not None
+        # It may have been evicted by another call already
+        size = self._disk.pop(name, None)
+        if size is None:
+            return
+
+        self.disk_size -= size
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._unlink, name)
+
+    def _unlink(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.path, name))  # type: ignore # path is set when this is called
+        except OSError:
+            pass
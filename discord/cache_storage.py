@@ -0,0 +1,606 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import datetime
+import sys
+import weakref
+from array import array
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    ItemsView,
+    Iterable,
+    Iterator,
+    KeysView,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    ValuesView,
+)
+
+from . import utils
+from .member import Member
+from .presences import ClientStatus
+
+if TYPE_CHECKING:
+    from .activity import ActivityTypes
+    from .abc import GuildChannel
+    from .emoji import Emoji
+    from .guild import Guild
+    from .message import Message
+    from .sticker import GuildSticker
+    from .types.user import AvatarDecorationData
+    from .user import User
+
+    # avatar, banner, permissions, avatar decoration data, activities, client status
+    _MemberExtras = Tuple[
+        Optional[str],
+        Optional[str],
+        Optional[int],
+        Optional[AvatarDecorationData],
+        Tuple[ActivityTypes, ...],
+        ClientStatus,
+    ]
+
+__all__ = (
+    'CacheStorage',
+    'LRUCacheStorage',
+    'LRUCache',
+    'MessageCache',
+    'CompactCacheStorage',
+    'CompactMemberStore',
+)
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+# Stored instead of a missing timestamp
+_NO_TIME = -(2**63)
+
+
+class LRUCache(MutableMapping[K, V]):
+    """A mapping that keeps at most ``max_size`` items, evicting the least
+    recently used one once it is full.
+
+    Getting an item, including through :meth:`get`, marks it as used. Iterating
+    over the mapping or its views iterates over a copy, oldest first, so the
+    mapping can be modified while doing so.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    max_size: :class:`int`
+        The maximum number of items to keep.
+    pinned: Iterable[Any]
+        Keys that are never evicted. They still count towards ``max_size``.
+
+    Attributes
+    -----------
+    max_size: :class:`int`
+        The maximum number of items to keep.
+    evictions: :class:`int`
+        The number of items evicted so far.
+    """
+
+    def __init__(self, max_size: int, *, pinned: Iterable[K] = ()) -> None:
+        if max_size <= 0:
+            raise ValueError('max_size must be greater than 0')
+
+        self.max_size: int = max_size
+        self.evictions: int = 0
+        self._pinned: Set[K] = set(pinned)
+        # Least recently used first
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f'<LRUCache size={len(self)} max_size={self.max_size} evictions={self.evictions}>'
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(list(self._data))
+
+    def __getitem__(self, key: K) -> V:
+        value = self._data[key]
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        data = self._data
+        data[key] = value
+        data.move_to_end(key)
+        if len(data) > self.max_size:
+            self._evict()
+
+    def __delitem__(self, key: K) -> None:
+        del self._data[key]
+
+    def get(self, key: K, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    # The views are over a copy, so reading through them doesn't mark the items as used
+
+    def keys(self) -> KeysView[K]:
+        return KeysView(self._data.copy())
+
+    def values(self) -> ValuesView[V]:
+        return ValuesView(self._data.copy())
+
+    def items(self) -> ItemsView[K, V]:
+        return ItemsView(self._data.copy())
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def _evict(self) -> None:
+        data = self._data
+        # Pinned keys met on the way are moved behind the others, at most once each
+        for _ in range(len(data)):
+            if len(data) <= self.max_size:
+                return
+
+            key = next(iter(data))
+            if key in self._pinned:
+                data.move_to_end(key)
+            else:
+                del data[key]
+                self.evictions += 1
+
+
+class MessageCache:
+    """A bounded cache of messages, like a :class:`collections.deque` with a ``maxlen``
+    that is also indexed by message ID.
+
+    Messages are kept in the order they were added and the oldest message is dropped
+    once ``maxlen`` is exceeded. Adding a message with the ID of a cached message
+    replaces it and moves it to the back.
+
+    This is what :meth:`CacheStorage.messages` returns by default. Replacements must
+    implement the same methods.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    iterable: Iterable[:class:`Message`]
+        The messages to add, oldest first.
+    maxlen: :class:`int`
+        The maximum number of messages to keep.
+    """
+
+    __slots__ = ('maxlen', '_messages')
+
+    def __init__(self, iterable: Iterable[Message] = (), *, maxlen: int) -> None:
+        self.maxlen: int = maxlen
+        # Message ID -> Message, oldest first
+        self._messages: OrderedDict[int, Message] = OrderedDict()
+        for message in iterable:
+            self.append(message)
+
+    def __repr__(self) -> str:
+        return f'<MessageCache len={len(self)} maxlen={self.maxlen}>'
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._messages.values())
+
+    def __reversed__(self) -> Iterator[Message]:
+        return reversed(self._messages.values())
+
+    def __contains__(self, message: object) -> bool:
+        try:
+            return self._messages.get(message.id) is message  # type: ignore
+        except AttributeError:
+            return False
+
+    def get(self, message_id: Optional[int]) -> Optional[Message]:
+        """Returns the cached message with the given ID, if any."""
+        return self._messages.get(message_id)  # type: ignore # None is never a key
+
+    def append(self, message: Message) -> None:
+        """Adds a message, dropping the oldest one if the cache is full."""
+        messages = self._messages
+        if message.id in messages:
+            messages.move_to_end(message.id)
+        messages[message.id] = message
+        if len(messages) > self.maxlen:
+            messages.popitem(last=False)
+
+    def remove(self, message: Message) -> None:
+        """Removes a message.
+
+        Raises
+        -------
+        ValueError
+            The message is not cached.
+        """
+        if self._messages.get(message.id) is not message:
+            raise ValueError(f'{message!r} is not in the message cache')
+        del self._messages[message.id]
+
+
+class CacheStorage:
+    """Creates the containers that a :class:`Client` caches Discord models in.
+
+    Every method is called once per container, when the cache is created or
+    cleared or, for the containers of a guild, when the guild is created. The
+    library only uses the :class:`~collections.abc.MutableMapping` interface of
+    the returned mappings, keyed by ID, so they can be replaced by bounded,
+    compacted or externally-backed implementations.
+
+    Items missing from a container are treated the same way as models that were
+    never cached, e.g. events referencing them are discarded or only dispatched
+    as their raw variant.
+
+    The base class returns what the library uses by default: dictionaries,
+    except for users which are only kept while they are referenced elsewhere.
+
+    .. versionadded:: 2.8
+    """
+
+    def users(self) -> MutableMapping[int, User]:
+        """Returns the mapping of cached users, used by :meth:`Client.get_user`."""
+        return weakref.WeakValueDictionary()
+
+    def guilds(self) -> MutableMapping[int, Guild]:
+        """Returns the mapping of cached guilds, used by :meth:`Client.get_guild`."""
+        return {}
+
+    def emojis(self) -> MutableMapping[int, Emoji]:
+        """Returns the mapping of cached emojis, used by :meth:`Client.get_emoji`."""
+        return {}
+
+    def stickers(self) -> MutableMapping[int, GuildSticker]:
+        """Returns the mapping of cached stickers, used by :meth:`Client.get_sticker`."""
+        return {}
+
+    def messages(self, max_messages: int) -> MessageCache:
+        """Returns the message cache, used by :attr:`Client.cached_messages`.
+
+        This is not called if ``max_messages`` is ``None``.
+
+        Parameters
+        -----------
+        max_messages: :class:`int`
+            The ``max_messages`` passed to the :class:`Client`.
+        """
+        return MessageCache(maxlen=max_messages)
+
+    def members(self, guild: Guild) -> MutableMapping[int, Member]:
+        """Returns the mapping of the cached members of a guild, used by :meth:`Guild.get_member`.
+
+        Parameters
+        -----------
+        guild: :class:`Guild`
+            The guild. It is still being created, only a reference to it should be kept.
+        """
+        return {}
+
+    def channels(self, guild: Guild) -> MutableMapping[int, GuildChannel]:
+        """Returns the mapping of the channels of a guild, used by :meth:`Guild.get_channel`.
+
+        Parameters
+        -----------
+        guild: :class:`Guild`
+            The guild. It is still being created, only a reference to it should be kept.
+        """
+        return {}
+
+
+class LRUCacheStorage(CacheStorage):
+    """A :class:`CacheStorage` that caps the number of cached users, members,
+    emojis and stickers with :class:`LRUCache`, to bound the memory used per process.
+
+    Guilds and channels are not bounded since Discord only sends them when a guild
+    becomes available, an evicted guild or channel would be unknown until then.
+    The number of messages is already bounded by ``max_messages``.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    users: Optional[:class:`int`]
+        The maximum number of users to keep. Unlike the default, users are kept even if
+        they are not referenced elsewhere. ``None`` keeps the default behaviour.
+    members: Optional[:class:`int`]
+        The maximum number of members to keep per guild. The client's own member is
+        never evicted. Guilds with more members than this are never considered
+        :attr:`~Guild.chunked`. ``None`` means no limit.
+    emojis: Optional[:class:`int`]
+        The maximum number of emojis to keep. ``None`` means no limit.
+    stickers: Optional[:class:`int`]
+        The maximum number of stickers to keep. ``None`` means no limit.
+    """
+
+    def __init__(
+        self,
+        *,
+        users: Optional[int] = None,
+        members: Optional[int] = None,
+        emojis: Optional[int] = None,
+        stickers: Optional[int] = None,
+    ) -> None:
+        self.max_users: Optional[int] = users
+        self.max_members: Optional[int] = members
+        self.max_emojis: Optional[int] = emojis
+        self.max_stickers: Optional[int] = stickers
+
+    def __repr__(self) -> str:
+        return (
+            f'<LRUCacheStorage users={self.max_users} members={self.max_members} '
+            f'emojis={self.max_emojis} stickers={self.max_stickers}>'
+        )
+
+    def users(self) -> MutableMapping[int, User]:
+        if self.max_users is None:
+            return super().users()
+        return LRUCache(self.max_users)
+
+    def emojis(self) -> MutableMapping[int, Emoji]:
+        if self.max_emojis is None:
+            return super().emojis()
+        return LRUCache(self.max_emojis)
+
+    def stickers(self) -> MutableMapping[int, GuildSticker]:
+        if self.max_stickers is None:
+            return super().stickers()
+        return LRUCache(self.max_stickers)
+
+    def members(self, guild: Guild) -> MutableMapping[int, Member]:
+        if self.max_members is None:
+            return super().members(guild)
+
+        self_id = guild._state.self_id
+        return LRUCache(self.max_members, pinned=() if self_id is None else (self_id,))
+
+
+def _to_microseconds(value: Optional[datetime.datetime]) -> int:
+    if value is None:
+        return _NO_TIME
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_microseconds(value: int) -> Optional[datetime.datetime]:
+    if value == _NO_TIME:
+        return None
+    return _EPOCH + datetime.timedelta(microseconds=value)
+
+
+class CompactMemberStore(MutableMapping[int, Member]):
+    """A mapping of the members of a guild that stores them in columns instead
+    of keeping a :class:`Member` per member.
+
+    Member IDs, join, boost and timeout timestamps and flags are kept in arrays,
+    roles as an index into the distinct role sets of the guild and nicknames as
+    interned strings. Avatars, banners, activities and statuses are only stored
+    for the members that have them. The :class:`User` of each member is kept as is,
+    since it is shared with other guilds and models.
+
+    Getting a member creates a new :class:`Member` from the columns every time, so
+    modifying it does not change the stored member until it is stored again.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    guild: :class:`Guild`
+        The guild the members belong to.
+    """
+
+    def __init__(self, guild: Guild) -> None:
+        self.guild: Guild = guild
+        # Member ID -> Row
+        self._rows: Dict[int, int] = {}
+        # Rows of removed members, reused by the next members stored
+        self._free: List[int] = []
+        self._users: List[Optional[User]] = []
+        self._nicks: List[Optional[str]] = []
+        self._joined_at: array[int] = array('q')
+        self._premium_since: array[int] = array('q')
+        self._timed_out_until: array[int] = array('q')
+        self._flags: array[int] = array('Q')
+        self._pending: bytearray = bytearray()
+        # Index into _role_sets
+        self._roles: array[int] = array('I')
+        self._role_sets: List[Tuple[int, ...]] = [()]
+        self._role_set_indexes: Dict[Tuple[int, ...], int] = {(): 0}
+        # Number of members with each role set, the empty one is never removed
+        self._role_set_counts: List[int] = [0]
+        # Indexes of role sets no member has anymore, reused by the next new role sets
+        self._free_role_sets: List[int] = []
+        # Row -> Extras, only for members that have any of them
+        self._extras: Dict[int, _MemberExtras] = {}
+
+    def __repr__(self) -> str:
+        return f'<CompactMemberStore guild_id={self.guild.id} size={len(self)} role_sets={len(self._role_set_indexes)}>'
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._rows)
+
+    def __getitem__(self, key: int) -> Member:
+        row = self._rows[key]
+        member = Member.__new__(Member)
+        member._state = self.guild._state
+        member.guild = self.guild
+        member._user = self._users[row]  # type: ignore # Only removed rows are None
+        member.nick = self._nicks[row]
+        member.joined_at = _from_microseconds(self._joined_at[row])
+        member.premium_since = _from_microseconds(self._premium_since[row])
+        member.timed_out_until = _from_microseconds(self._timed_out_until[row])
+        member._flags = self._flags[row]
+        member.pending = bool(self._pending[row])
+        member._roles = utils.SnowflakeList(self._role_sets[self._roles[row]], is_sorted=True)
+
+        extras = self._extras.get(row)
+        if extras is None:
+            member._avatar = member._banner = member._permissions = member._avatar_decoration_data = None
+            member.activities = ()
+            member.client_status = ClientStatus()
+        else:
+            (
+                member._avatar,
+                member._banner,
+                member._permissions,
+                member._avatar_decoration_data,
+                member.activities,
+                member.client_status,
+            ) = extras
+        return member
+
+    def __setitem__(self, key: int, member: Member) -> None:
+        try:
+            row = self._rows[key]
+        except KeyError:
+            row = self._new_row()
+            self._rows[key] = row
+
+        self._users[row] = member._user
+        nick = member.nick
+        self._nicks[row] = None if nick is None else sys.intern(nick)
+        self._joined_at[row] = _to_microseconds(member.joined_at)
+        self._premium_since[row] = _to_microseconds(member.premium_since)
+        self._timed_out_until[row] = _to_microseconds(member.timed_out_until)
+        self._flags[row] = member._flags
+        self._pending[row] = member.pending
+        index = self._role_set_index(tuple(member._roles))
+        self._release_role_set(self._roles[row])
+        self._roles[row] = index
+
+        status = member.client_status
+        if (
+            member._avatar is None
+            and member._banner is None
+            and member._permissions is None
+            and member._avatar_decoration_data is None
+            and not member.activities
+            and status._status == 'offline'
+            and status.desktop is None
+            and status.mobile is None
+            and status.web is None
+        ):
+            self._extras.pop(row, None)
+        else:
+            self._extras[row] = (
+                member._avatar,
+                member._banner,
+                member._permissions,
+                member._avatar_decoration_data,
+                member.activities,
+                status,
+            )
+
+    def __delitem__(self, key: int) -> None:
+        row = self._rows.pop(key)
+        self._users[row] = None
+        self._nicks[row] = None
+        self._extras.pop(row, None)
+        self._release_role_set(self._roles[row])
+        self._roles[row] = 0
+        self._free.append(row)
+
+    def clear(self) -> None:
+        self.__init__(self.guild)
+
+    def _new_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+
+        self._users.append(None)
+        self._nicks.append(None)
+        self._joined_at.append(_NO_TIME)
+        self._premium_since.append(_NO_TIME)
+        self._timed_out_until.append(_NO_TIME)
+        self._flags.append(0)
+        self._pending.append(0)
+        self._roles.append(0)
+        return len(self._users) - 1
+
+    def _role_set_index(self, roles: Tuple[int, ...]) -> int:
+        # Most members of a guild share one of a few combinations of roles
+        try:
+            index = self._role_set_indexes[roles]
+        except KeyError:
+            if self._free_role_sets:
+                index = self._free_role_sets.pop()
+                self._role_sets[index] = roles
+            else:
+                index = len(self._role_sets)
+                self._role_sets.append(roles)
+                self._role_set_counts.append(0)
+            self._role_set_indexes[roles] = index
+
+        if index:
+            self._role_set_counts[index] += 1
+        return index
+
+    def _release_role_set(self, index: int) -> None:
+        if not index:
+            return
+
+        count = self._role_set_counts[index] - 1
+        self._role_set_counts[index] = count
+        if not count:
+            del self._role_set_indexes[self._role_sets[index]]
+            self._role_sets[index] = ()
+            self._free_role_sets.append(index)
+
+
+class CompactCacheStorage(CacheStorage):
+    """A :class:`CacheStorage` that stores the members of every guild in a
+    :class:`CompactMemberStore`, which uses a fraction of the memory of the
+    default at the cost of creating a :class:`Member` whenever one is accessed.
+
+    This includes :attr:`Guild.me`, so the members returned are not the same object
+    between calls. Compare them with ``==`` instead of ``is``.
+
+    .. versionadded:: 2.8
+    """
+
+    def members(self, guild: Guild) -> MutableMapping[int, Member]:
+        return CompactMemberStore(guild)
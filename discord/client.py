@@ -25,6 +25,7 @@ DEALINGS IN THE SOFTWARE.
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import datetime
 import logging
 from typing import (
@@ -48,6 +49,7 @@ from typing import (
 )
 
 import aiohttp
+import yarl
 
 from .sku import SKU, Entitlement
 from .user import User, ClientUser
@@ -57,7 +59,7 @@ from .widget import Widget
 from .guild import Guild, GuildPreview
 from .emoji import Emoji
 from .channel import _threaded_channel_factory, PartialMessageable
-from .enums import ChannelType, EntitlementOwnerType
+from .enums import ChannelType, EntitlementOwnerType, RequestPriority
 from .mentions import AllowedMentions
 from .errors import *
 from .enums import Status
@@ -65,7 +67,7 @@ from .flags import ApplicationFlags, Intents
 from .gateway import *
 from .activity import ActivityTypes, BaseActivity, create_activity
 from .voice_client import VoiceClient
-from .http import HTTPClient
+from .http import HTTPClient, _request_priority
 from .state import ConnectionState
 from . import utils
 from .utils import MISSING, time_snowflake, deprecated, _iscoroutinefunction
@@ -79,6 +81,7 @@ from .stage_instance import StageInstance
 from .threads import Thread
 from .sticker import GuildSticker, StandardSticker, StickerPack, _sticker_factory
 from .soundboard import SoundboardDefaultSound, SoundboardSound
+from .sessions import GatewaySession, SessionStore
 
 if TYPE_CHECKING:
     from types import TracebackType
@@ -122,9 +125,17 @@ if TYPE_CHECKING:
     from .poll import PollAnswer
     from .subscription import Subscription
     from .flags import MemberCacheFlags
+    from .replay import GatewayRecorder
+    from .ratelimits import RateLimitBackend
+    from .response_cache import ResponseCache
+    from .asset_cache import AssetCache
+    from .metrics import HTTPMetrics
+    from .cache_storage import CacheStorage
 
     class _ClientOptions(TypedDict, total=False):
         max_messages: Optional[int]
+        cache_storage: Optional[CacheStorage]
+        lazy_guilds: bool
         proxy: Optional[str]
         proxy_auth: Optional[aiohttp.BasicAuth]
         shard_id: Optional[int]
@@ -132,17 +143,31 @@ if TYPE_CHECKING:
         application_id: int
         member_cache_flags: MemberCacheFlags
         chunk_guilds_at_startup: bool
+        coalesce_chunk_requests: bool
         status: Optional[Status]
         activity: Optional[BaseActivity]
         allowed_mentions: Optional[AllowedMentions]
         heartbeat_timeout: float
+        heartbeat_mode: Literal['thread', 'asyncio']
+        heartbeat_watchdog: bool
         guild_ready_timeout: float
         assume_unsync_clock: bool
         enable_debug_events: bool
         enable_raw_presences: bool
+        enable_lazy_dispatch: bool
+        gateway_offload_threshold: Optional[int]
+        gateway_recorder: Optional[GatewayRecorder]
         http_trace: aiohttp.TraceConfig
         max_ratelimit_timeout: Optional[float]
+        ratelimit_backend: Optional[RateLimitBackend]
+        coalesce_get_requests: bool
+        response_cache: Optional[ResponseCache]
+        global_request_rate: Optional[int]
+        bulk_request_concurrency: Optional[int]
+        asset_cache: Optional[AssetCache]
+        http_metrics: Optional[HTTPMetrics]
         connector: Optional[aiohttp.BaseConnector]
+        session_store: Optional[SessionStore]
 
 
 # fmt: off
@@ -195,6 +220,20 @@ class Client:
 
         .. versionchanged:: 1.3
             Allow disabling the message cache and change the default size to ``1000``.
+    cache_storage: Optional[:class:`CacheStorage`]
+        Creates the containers that users, guilds, members, channels, messages, emojis
+        and stickers are cached in, e.g. :class:`LRUCacheStorage` to cap the number of
+        cached members. Defaults to ``None``, which caches them in dictionaries.
+
+        .. versionadded:: 2.8
+    lazy_guilds: :class:`bool`
+        Whether to keep the payloads of the channels, threads, roles, stage instances and
+        scheduled events of a guild and only create them once they are first accessed,
+        instead of creating all of them when the guild becomes available. This reduces
+        startup time and memory usage for bots in many guilds whose data is rarely used.
+        Gateway events for them are still applied. Defaults to ``False``.
+
+        .. versionadded:: 2.8
     proxy: Optional[:class:`str`]
         Proxy URL.
     proxy_auth: Optional[:class:`aiohttp.BasicAuth`]
@@ -226,6 +265,13 @@ class Client:
         is ``True``.
 
         .. versionadded:: 1.5
+    coalesce_chunk_requests: :class:`bool`
+        Whether member chunk requests for different guilds of the same shard that are
+        waiting for the gateway rate limit should be merged into a single request with
+        a list of guild IDs. This helps when chunking many guilds at once. Requests
+        for specific user IDs are never merged. Defaults to ``False``.
+
+        .. versionadded:: 2.8
     status: Optional[:class:`.Status`]
         A status to start your presence with upon logging on to Discord.
     activity: Optional[:class:`.BaseActivity`]
@@ -239,6 +285,19 @@ class Client:
         WebSocket in the case of not receiving a HEARTBEAT_ACK. Useful if
         processing the initial packets take too long to the point of disconnecting
         you. The default timeout is 60 seconds.
+    heartbeat_mode: :class:`str`
+        How heartbeats are sent to the gateway. With ``'thread'``, the default, every
+        shard and voice connection runs its own heartbeat thread. With ``'asyncio'`` all
+        of them are scheduled from a single timer on the event loop instead, which avoids
+        spawning one OS thread per connection when running many shards.
+
+        .. versionadded:: 2.8
+    heartbeat_watchdog: :class:`bool`
+        Whether a single background thread should warn when the event loop is blocked
+        and heartbeats are being delayed. This only applies when ``heartbeat_mode`` is
+        ``'asyncio'``. Defaults to ``True``.
+
+        .. versionadded:: 2.8
     guild_ready_timeout: :class:`float`
         The maximum number of seconds to wait for the GUILD_CREATE stream to end before
         preparing the member cache and firing READY. The default timeout is 2 seconds.
@@ -269,6 +328,30 @@ class Client:
         is disabled, otherwise it's set to ``False``.
 
         .. versionadded:: 2.5
+    enable_lazy_dispatch: :class:`bool`
+        Whether to drop gateway events that nothing is listening to before they are decoded.
+
+        This only applies to events that do not affect the internal cache in a meaningful
+        way, such as :func:`on_typing` or :func:`on_presence_update`. An event is kept if there
+        is an event handler, listener or :meth:`wait_for` call for any of the events it could
+        dispatch. Note that member presence information goes stale while presence updates are
+        being dropped. The number of events parsed and skipped can be retrieved through
+        :attr:`lazy_dispatch_stats`. Defaults to ``False``.
+
+        .. versionadded:: 2.8
+    gateway_offload_threshold: Optional[:class:`int`]
+        The size in bytes of a received gateway frame at which decompressing and decoding
+        it is done in a small shared thread pool instead of on the event loop. This keeps
+        large ``GUILD_CREATE`` and ``GUILD_MEMBERS_CHUNK`` payloads from delaying heartbeats
+        and other shards. Events are still processed in the order they were received.
+        Defaults to ``None``, which disables this.
+
+        .. versionadded:: 2.8
+    gateway_recorder: Optional[:class:`GatewayRecorder`]
+        A recorder that every decompressed gateway frame received is written to, so the
+        traffic can later be replayed with :class:`GatewayReplayer`. Defaults to ``None``.
+
+        .. versionadded:: 2.8
     http_trace: :class:`aiohttp.TraceConfig`
         The trace configuration to use for tracking HTTP requests the library does using ``aiohttp``.
         This allows you to check requests the library is using. For more information, check the
@@ -283,11 +366,70 @@ class Client:
         set to is ``30.0`` seconds.
 
         .. versionadded:: 2.0
+    ratelimit_backend: Optional[:class:`RateLimitBackend`]
+        Where the REST rate limits are tracked. By default, they are tracked in memory
+        which assumes this client is the only one using its token. Pass a
+        :class:`SharedRateLimitBackend` to share them with other processes using the same
+        token so that they do not collectively hit rate limits. The learned rate limits can
+        also be persisted across restarts through the backend's ``snapshot`` parameter.
+        Defaults to ``None``.
+
+        .. versionadded:: 2.8
+    coalesce_get_requests: :class:`bool`
+        Whether concurrent identical ``GET`` requests, such as many :meth:`fetch_user` calls
+        for the same user at once, should share a single HTTP request and its response instead
+        of each spending the route's rate limit. See :attr:`coalesced_request_stats`.
+        Defaults to ``False``.
+
+        .. versionadded:: 2.8
+    response_cache: Optional[:class:`ResponseCache`]
+        A cache for the responses of frequently fetched objects, such as users, members
+        and channels, which is invalidated by the matching gateway events. Defaults to
+        ``None``, in which case every fetch sends a request.
+
+        .. versionadded:: 2.8
+    global_request_rate: Optional[:class:`int`]
+        The maximum number of requests sent per second. Requests waiting for this budget
+        are sent by priority, see :meth:`request_priority`. Interaction responses are not
+        limited since they are exempt from Discord's global rate limit. Defaults to ``None``,
+        which only reacts to global rate limits once Discord reports them.
+
+        .. versionadded:: 2.8
+    bulk_request_concurrency: Optional[:class:`int`]
+        The maximum number of :attr:`RequestPriority.bulk` requests in flight at once, so
+        that background jobs do not take every connection. ``None`` disables the limit.
+        Defaults to ``4``.
+
+        .. versionadded:: 2.8
+    asset_cache: Optional[:class:`AssetCache`]
+        A cache for CDN content such as avatars, icons and attachments, so that
+        :meth:`Asset.read` and :meth:`Attachment.read` only download the same URL
+        once. Saving or streaming content that is already cached does not download
+        it either. Defaults to ``None``, in which case every read downloads the content.
+
+        .. versionadded:: 2.8
+    http_metrics: Optional[:class:`HTTPMetrics`]
+        Receives measurements of every REST request, such as retries, 429 responses, the
+        time spent waiting for rate limits and the response latency, by route and rate
+        limit bucket. See :class:`HTTPMetricsCollector` for the built-in implementation.
+        Defaults to ``None``.
+
+        .. versionadded:: 2.8
     connector: Optional[:class:`aiohttp.BaseConnector`]
         The aiohttp connector to use for this client. This can be used to control underlying aiohttp
         behavior, such as setting a dns resolver or sslcontext.
 
         .. versionadded:: 2.5
+    session_store: Optional[:class:`SessionStore`]
+        Where to persist the gateway session when the client is closed, so that the next
+        start can RESUME it instead of IDENTIFYing again. Since Discord does not send the
+        guilds again on RESUME, the payloads of the guilds, their channels, active threads
+        and roles are kept up to date while connected and saved with the session, so that
+        the guild cache is restored from them before resuming. Members other than the
+        client's own are not restored. See :class:`FileSessionStore` for the built-in
+        implementation. Defaults to ``None``.
+
+        .. versionadded:: 2.8
 
     Attributes
     -----------
@@ -309,6 +451,14 @@ class Client:
         unsync_clock: bool = options.pop('assume_unsync_clock', True)
         http_trace: Optional[aiohttp.TraceConfig] = options.pop('http_trace', None)
         max_ratelimit_timeout: Optional[float] = options.pop('max_ratelimit_timeout', None)
+        ratelimit_backend: Optional[RateLimitBackend] = options.pop('ratelimit_backend', None)
+        coalesce_get_requests: bool = options.pop('coalesce_get_requests', False)
+        response_cache: Optional[ResponseCache] = options.pop('response_cache', None)
+        global_request_rate: Optional[int] = options.pop('global_request_rate', None)
+        bulk_request_concurrency: Optional[int] = options.pop('bulk_request_concurrency', 4)
+        asset_cache: Optional[AssetCache] = options.pop('asset_cache', None)
+        http_metrics: Optional[HTTPMetrics] = options.pop('http_metrics', None)
+        self._session_store: Optional[SessionStore] = options.get('session_store', None)
         self.http: HTTPClient = HTTPClient(
             self.loop,
             connector,
@@ -317,6 +467,13 @@ class Client:
             unsync_clock=unsync_clock,
             http_trace=http_trace,
             max_ratelimit_timeout=max_ratelimit_timeout,
+            ratelimit_backend=ratelimit_backend,
+            coalesce_get_requests=coalesce_get_requests,
+            response_cache=response_cache,
+            global_request_rate=global_request_rate,
+            bulk_request_concurrency=bulk_request_concurrency,
+            asset_cache=asset_cache,
+            metrics=http_metrics,
         )
 
         self._handlers: Dict[str, Callable[..., None]] = {
@@ -335,6 +492,7 @@ class Client:
         self._application: Optional[AppInfo] = None
         self._connection._get_websocket = self._get_websocket
         self._connection._get_client = lambda: self
+        self._connection._has_listeners = self._has_listeners
 
         if VoiceClient.warn_nacl:
             VoiceClient.warn_nacl = False
@@ -371,6 +529,48 @@ class Client:
     def _handle_ready(self) -> None:
         self._ready.set()
 
+    async def _load_session(self, shard_id: Optional[int]) -> Optional[GatewaySession]:
+        if self._session_store is None:
+            return None
+
+        try:
+            session = await self._session_store.load(shard_id)
+            if session is not None:
+                # A session can only be resumed once
+                await self._session_store.delete(shard_id)
+                self._connection._restore_session(session)
+        except Exception:
+            _log.exception('Failed to load the saved session for shard ID %s. Ignoring.', shard_id)
+            return None
+
+        if session is not None:
+            _log.info('Shard ID %s is attempting to RESUME saved session %s.', shard_id, session.session_id)
+        return session
+
+    async def _save_session(self, ws: DiscordWebSocket) -> bool:
+        if self._session_store is None or ws.session_id is None:
+            return False
+
+        shard_id = ws.shard_id
+        guild_ids = [guild.id for guild in self._connection.guilds if shard_id is None or guild.shard_id == shard_id]
+        session = GatewaySession(
+            shard_id=shard_id,
+            session_id=ws.session_id,
+            sequence=ws.sequence,
+            resume_gateway_url=str(ws.gateway),
+            guilds=self._connection._guild_snapshots.to_list(guild_ids),
+        )
+
+        try:
+            await self._session_store.save(session)
+        except Exception:
+            _log.exception('Failed to save the session for shard ID %s. Ignoring.', shard_id)
+            return False
+        return True
+
+    def _has_listeners(self, event: str, /) -> bool:
+        return event in self._listeners or hasattr(self, 'on_' + event)
+
     @property
     def latency(self) -> float:
         """:class:`float`: Measures latency between a HEARTBEAT and a HEARTBEAT_ACK in seconds.
@@ -392,6 +592,80 @@ class Client:
             return self.ws.is_ratelimited()
         return False
 
+    @property
+    def gateway_ratelimit_stats(self) -> Dict[Optional[int], GatewayRatelimitStats]:
+        """Dict[Optional[:class:`int`], :class:`~discord.gateway.GatewayRatelimitStats`]: A mapping of shard IDs
+        to the state of their gateway send rate limit, such as the number of queued sends and how
+        long sends waited.
+
+        Presence updates, voice state updates and IDENTIFYs are sent ahead of queued member
+        chunk requests.
+
+        .. versionadded:: 2.8
+        """
+        ws = self.ws
+        if not ws:
+            return {}
+        return {ws.shard_id: ws._rate_limiter.get_stats()}
+
+    @property
+    def lazy_dispatch_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Dict[:class:`str`, Tuple[:class:`int`, :class:`int`]]: A mapping of gateway event names
+        to the number of times they were parsed and skipped respectively.
+
+        This is only populated if ``enable_lazy_dispatch`` is set to ``True``.
+
+        .. versionadded:: 2.8
+        """
+        return {event: (parsed, skipped) for event, (parsed, skipped) in self._connection._dispatch_counts.items()}
+
+    @property
+    def coalesced_request_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Dict[:class:`str`, Tuple[:class:`int`, :class:`int`]]: A mapping of routes, such as
+        ``GET /users/{user_id}``, to the number of requests that shared an identical in-flight
+        request and the number of requests that were actually sent respectively.
+
+        This is only populated if ``coalesce_get_requests`` is set to ``True``.
+
+        .. versionadded:: 2.8
+        """
+        return {route: (hits, misses) for route, (hits, misses) in self.http._coalesce_counts.items()}
+
+    @contextlib.contextmanager
+    def request_priority(self, priority: RequestPriority, /) -> Generator[None, None, None]:
+        """A context manager that sets the priority of the API requests made inside of it,
+        including those made by tasks created inside of it.
+
+        Requests waiting for ``global_request_rate`` are sent by priority and only
+        ``bulk_request_concurrency`` requests with :attr:`RequestPriority.bulk` are sent
+        at once, so that background jobs do not delay the rest of the bot.
+
+        Interaction responses sent through :class:`InteractionResponse` and
+        :attr:`Interaction.followup` never wait behind other requests regardless of
+        the priority.
+
+        .. versionadded:: 2.8
+
+        Example
+        --------
+
+        .. code-block:: python3
+
+            with client.request_priority(discord.RequestPriority.bulk):
+                for member in guild.members:
+                    await member.add_roles(role)
+
+        Parameters
+        -----------
+        priority: :class:`RequestPriority`
+            The priority of the requests.
+        """
+        token = _request_priority.set(priority)
+        try:
+            yield
+        finally:
+            _request_priority.reset(token)
+
     @property
     def user(self) -> Optional[ClientUser]:
         """Optional[:class:`.ClientUser`]: Represents the connected client. ``None`` if not logged in."""
@@ -606,6 +880,11 @@ class Client:
             The shard ID that requested being IDENTIFY'd
         initial: :class:`bool`
             Whether this IDENTIFY is the first initial IDENTIFY.
+
+            .. versionchanged:: 2.8
+
+                :class:`AutoShardedClient` passes ``True`` for the first IDENTIFY
+                of every ``max_concurrency`` rate limit bucket.
         """
 
         if not initial:
@@ -722,6 +1001,16 @@ class Client:
             'initial': True,
             'shard_id': self.shard_id,
         }
+
+        session = await self._load_session(self.shard_id)
+        if session is not None:
+            ws_params.update(
+                resume=True,
+                session=session.session_id,
+                sequence=session.sequence,
+                gateway=yarl.URL(session.resume_gateway_url),
+            )
+
         while not self.is_closed():
             try:
                 coro = DiscordWebSocket.from_client(self, **ws_params)
@@ -802,7 +1091,9 @@ class Client:
             await self._connection.close()
 
             if self.ws is not None and self.ws.open:
-                await self.ws.close(code=1000)
+                # Closing with 1000 invalidates the session, so it can't be resumed later
+                saved = await self._save_session(self.ws)
+                await self.ws.close(code=4000 if saved else 1000)
 
             await self.http.close()
 
@@ -2166,6 +2457,7 @@ class Client:
                 me.activities = ()
 
             me.status = status
+            guild._store_member(me)
 
     # Guild stuff
 
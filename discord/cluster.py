@@ -0,0 +1,647 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, Dict, List, Optional, Sequence, Tuple
+
+from .activity import create_activity
+from .enums import Status, try_enum
+from ._ipc import STREAM_LIMIT, Channel
+from .errors import ClusterError
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+    from .activity import BaseActivity
+    from .shard import AutoShardedClient
+
+__all__ = (
+    'ClusterGuild',
+    'ClusterClient',
+    'ClusterCoordinator',
+    'ShardCluster',
+)
+
+_log = logging.getLogger(__name__)
+
+
+# The ops sent over the IPC connections, see _ipc.py for the framing.
+#
+# Worker -> coordinator:
+#   hello     {"cluster_id": int, "shard_ids": [int]}
+#   identify  {"shard_id": int}, answered once the shard may IDENTIFY
+#   query     {"name": str, "args": list, "shard_id": int | null}, answered with
+#             the result of the cluster owning shard_id, or a list of every
+#             cluster's result when shard_id is null
+# Coordinator -> worker:
+#   request   {"name": str, "args": list}, answered by the worker with a response
+# Both directions:
+#   response  the result, with an "error" key instead when the request failed
+
+
+class ClusterGuild:
+    """Represents a snapshot of a guild that may live in another cluster.
+
+    These are returned by :meth:`ClusterClient.query_guild` since :class:`Guild`
+    objects cannot be shared between processes.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    id: :class:`int`
+        The guild's ID.
+    name: :class:`str`
+        The guild's name.
+    member_count: Optional[:class:`int`]
+        The guild's member count, if known.
+    shard_id: :class:`int`
+        The shard the guild belongs to.
+    cluster_id: :class:`int`
+        The cluster that owns the guild's shard.
+    """
+
+    __slots__ = ('id', 'name', 'member_count', 'shard_id', 'cluster_id')
+
+    def __init__(self, *, data: Dict[str, Any]) -> None:
+        self.id: int = data['id']
+        self.name: str = data['name']
+        self.member_count: Optional[int] = data.get('member_count')
+        self.shard_id: int = data['shard_id']
+        self.cluster_id: int = data['cluster_id']
+
+    def __repr__(self) -> str:
+        return f'<ClusterGuild id={self.id} name={self.name!r} shard_id={self.shard_id} cluster_id={self.cluster_id}>'
+
+
+class ClusterClient:
+    """The IPC connection of a single cluster of a :class:`ShardCluster`.
+
+    Clients launched by :class:`ShardCluster` have an instance of this class
+    assigned to :attr:`AutoShardedClient.cluster`. It is used to query the
+    other clusters and to coordinate IDENTIFYs with them.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    cluster_id: :class:`int`
+        The ID of this cluster.
+    cluster_count: :class:`int`
+        The total number of clusters.
+    path: :class:`str`
+        The path of the coordinator's Unix socket.
+    timeout: Optional[:class:`float`]
+        The number of seconds to wait for the other clusters to answer a request.
+    """
+
+    def __init__(
+        self,
+        client: AutoShardedClient,
+        path: str,
+        *,
+        cluster_id: int,
+        cluster_count: int,
+        timeout: Optional[float] = 30.0,
+    ) -> None:
+        self.client: AutoShardedClient = client
+        self.path: str = path
+        self.cluster_id: int = cluster_id
+        self.cluster_count: int = cluster_count
+        self.timeout: Optional[float] = timeout
+        self._channel: Optional[Channel] = None
+        self._reader_task: Optional[asyncio.Task[None]] = None
+        self._handlers: Dict[str, Callable[..., Coroutine[Any, Any, Any]]] = {
+            'guild_count': self._handle_guild_count,
+            'latencies': self._handle_latencies,
+            'guild': self._handle_guild,
+            'change_presence': self._handle_change_presence,
+        }
+
+    def is_connected(self) -> bool:
+        """:class:`bool`: Whether the cluster is connected to its coordinator."""
+        return self._channel is not None
+
+    async def connect(self) -> None:
+        """|coro|
+
+        Connects to the coordinator and registers the client's shards.
+
+        This is called by :meth:`AutoShardedClient.launch_shards`.
+        """
+        if self._channel is not None:
+            return
+
+        reader, writer = await asyncio.open_unix_connection(self.path, limit=STREAM_LIMIT)
+        self._channel = channel = Channel(reader, writer)
+        self._reader_task = asyncio.create_task(self._read_loop(channel))
+        await channel.request('hello', {'cluster_id': self.cluster_id, 'shard_ids': list(self.client.shard_ids or [])})
+
+    async def close(self) -> None:
+        """|coro|
+
+        Closes the connection to the coordinator.
+        """
+        channel = self._channel
+        if channel is None:
+            return
+
+        self._channel = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        channel.close()
+
+    async def _read_loop(self, channel: Channel) -> None:
+        try:
+            while True:
+                payload = await channel.read()
+                if payload is None:
+                    break
+
+                if payload['op'] == 'request':
+                    asyncio.create_task(self._answer(channel, payload))
+                else:
+                    channel.resolve(payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if self._channel is channel:
+                _log.warning('Cluster %s lost its connection to the coordinator.', self.cluster_id)
+                self._channel = None
+                channel.close()
+
+    async def _answer(self, channel: Channel, payload: Dict[str, Any]) -> None:
+        nonce = payload['nonce']
+        name = payload['d']['name']
+        try:
+            handler = self._handlers[name]
+            result = await handler(*payload['d']['args'])
+        except Exception as exc:
+            _log.exception('Cluster %s failed to answer a %r request.', self.cluster_id, name)
+            channel.send('response', nonce=nonce, error=f'{exc.__class__.__name__}: {exc}')
+        else:
+            channel.send('response', result, nonce=nonce)
+
+    def _get_channel(self) -> Channel:
+        if self._channel is None:
+            raise ClusterError('The cluster is not connected to its coordinator')
+        return self._channel
+
+    async def _query(self, name: str, *args: Any, shard_id: Optional[int] = None) -> Any:
+        data = {'name': name, 'args': list(args), 'shard_id': shard_id}
+        return await self._get_channel().request('query', data, timeout=self.timeout)
+
+    async def identify(self, shard_id: int) -> None:
+        """|coro|
+
+        Waits until the coordinator allows the given shard to IDENTIFY.
+
+        The coordinator shares the ``max_concurrency`` rate limit buckets between every cluster.
+        """
+        await self._get_channel().request('identify', {'shard_id': shard_id})
+
+    async def guild_count(self) -> int:
+        """|coro|
+
+        Returns the number of guilds across every cluster.
+
+        Raises
+        -------
+        ClusterError
+            A cluster failed to answer or did not answer in time.
+        """
+        counts = await self._query('guild_count')
+        return sum(counts)
+
+    async def latencies(self) -> List[Tuple[int, float]]:
+        """|coro|
+
+        Returns the latencies of every shard across every cluster.
+
+        This returns a list of tuples with elements ``(shard_id, latency)``, sorted by shard ID.
+
+        Raises
+        -------
+        ClusterError
+            A cluster failed to answer or did not answer in time.
+        """
+        results = await self._query('latencies')
+        return sorted((shard_id, latency) for latencies in results for shard_id, latency in latencies)
+
+    async def query_guild(self, guild_id: int, /) -> Optional[ClusterGuild]:
+        """|coro|
+
+        Retrieves a guild from the cluster that owns its shard.
+
+        Parameters
+        -----------
+        guild_id: :class:`int`
+            The ID of the guild to look up.
+
+        Raises
+        -------
+        ClusterError
+            The owning cluster failed to answer or did not answer in time, or
+            the client's shard count is not known.
+
+        Returns
+        --------
+        Optional[:class:`ClusterGuild`]
+            The guild or ``None`` if it was not found.
+        """
+        shard_count = self.client.shard_count
+        if shard_count is None:
+            raise ClusterError('The shard count of the client is not known')
+
+        shard_id = (guild_id >> 22) % shard_count
+        data = await self._query('guild', guild_id, shard_id=shard_id)
+        return ClusterGuild(data=data) if data is not None else None
+
+    async def change_presence(self, *, activity: Optional[BaseActivity] = None, status: Optional[Status] = None) -> None:
+        """|coro|
+
+        Changes the client's presence in every cluster.
+
+        The parameters are the same as :meth:`AutoShardedClient.change_presence`.
+
+        Raises
+        -------
+        ClusterError
+            A cluster failed to answer or did not answer in time.
+        """
+        data = activity.to_dict() if activity is not None else None
+        await self._query('change_presence', data, status.value if status is not None else None)
+
+    async def _handle_guild_count(self) -> int:
+        return len(self.client.guilds)
+
+    async def _handle_latencies(self) -> List[Tuple[int, float]]:
+        return self.client.latencies
+
+    async def _handle_guild(self, guild_id: int) -> Optional[Dict[str, Any]]:
+        guild = self.client.get_guild(guild_id)
+        if guild is None:
+            return None
+
+        return {
+            'id': guild.id,
+            'name': guild.name,
+            'member_count': guild.member_count,
+            'shard_id': guild.shard_id,
+            'cluster_id': self.cluster_id,
+        }
+
+    async def _handle_change_presence(self, activity: Optional[Dict[str, Any]], status: Optional[str]) -> None:
+        await self.client.change_presence(
+            activity=create_activity(activity, self.client._connection),  # type: ignore
+            status=try_enum(Status, status) if status is not None else None,
+        )
+
+
+class _Worker:
+    __slots__ = ('channel', 'cluster_id', 'shard_ids')
+
+    def __init__(self, channel: Channel) -> None:
+        self.channel: Channel = channel
+        self.cluster_id: Optional[int] = None
+        self.shard_ids: List[int] = []
+
+
+class ClusterCoordinator:
+    """The IPC server shared by every cluster of a :class:`ShardCluster`.
+
+    It routes requests between the clusters and makes sure that shards of
+    every cluster respect the ``max_concurrency`` IDENTIFY rate limit.
+
+    This is started by :class:`ShardCluster`, it is only useful on its own
+    when the clusters are launched manually.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    path: :class:`str`
+        The path of the Unix socket to listen on.
+    max_concurrency: :class:`int`
+        The number of IDENTIFY rate limit buckets, as returned by
+        :meth:`AutoShardedClient.fetch_session_start_limits`.
+    identify_delay: :class:`float`
+        The number of seconds between two IDENTIFYs in the same bucket.
+    timeout: Optional[:class:`float`]
+        The number of seconds to wait for a cluster to answer a request routed to it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_concurrency: int = 1,
+        identify_delay: float = 5.0,
+        timeout: Optional[float] = 30.0,
+    ) -> None:
+        self.path: str = path
+        self.max_concurrency: int = max(max_concurrency, 1)
+        self.identify_delay: float = identify_delay
+        self.timeout: Optional[float] = timeout
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._workers: List[_Worker] = []
+        self._identify_locks: Dict[int, asyncio.Lock] = {}
+        self._last_identify: Dict[int, float] = {}
+
+    async def start(self) -> None:
+        """|coro|
+
+        Starts listening on the Unix socket.
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, self.path, limit=STREAM_LIMIT)
+
+    async def close(self) -> None:
+        """|coro|
+
+        Stops the server and closes every cluster connection.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        for worker in self._workers:
+            worker.channel.close()
+        self._workers.clear()
+
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        worker = _Worker(Channel(reader, writer))
+        self._workers.append(worker)
+        try:
+            while True:
+                payload = await worker.channel.read()
+                if payload is None:
+                    break
+
+                op = payload['op']
+                if op == 'response':
+                    worker.channel.resolve(payload)
+                elif op == 'hello':
+                    worker.cluster_id = payload['d']['cluster_id']
+                    worker.shard_ids = payload['d']['shard_ids']
+                    worker.channel.send('response', nonce=payload['nonce'])
+                    _log.info('Cluster %s connected with shards %s.', worker.cluster_id, worker.shard_ids)
+                else:
+                    asyncio.create_task(self._answer(worker, payload))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if worker in self._workers:
+                self._workers.remove(worker)
+                _log.info('Cluster %s disconnected.', worker.cluster_id)
+            worker.channel.close()
+
+    async def _answer(self, worker: _Worker, payload: Dict[str, Any]) -> None:
+        nonce = payload['nonce']
+        try:
+            if payload['op'] == 'identify':
+                result = await self._identify(payload['d']['shard_id'])
+            elif payload['op'] == 'query':
+                result = await self._route(payload['d'])
+            else:
+                raise ClusterError(f'Unknown op {payload["op"]!r}')
+        except Exception as exc:
+            worker.channel.send('response', nonce=nonce, error=str(exc))
+        else:
+            worker.channel.send('response', result, nonce=nonce)
+
+    async def _identify(self, shard_id: int) -> None:
+        bucket = shard_id % self.max_concurrency
+        lock = self._identify_locks.setdefault(bucket, asyncio.Lock())
+        loop = asyncio.get_running_loop()
+        async with lock:
+            last = self._last_identify.get(bucket)
+            if last is not None:
+                delay = last + self.identify_delay - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._last_identify[bucket] = loop.time()
+
+    async def _route(self, data: Dict[str, Any]) -> Any:
+        request = {'name': data['name'], 'args': data['args']}
+        shard_id = data['shard_id']
+        if shard_id is None:
+            workers = list(self._workers)
+            return await asyncio.gather(*(self._request(worker, request) for worker in workers))
+
+        for worker in self._workers:
+            if shard_id in worker.shard_ids:
+                return await self._request(worker, request)
+
+        raise ClusterError(f'No cluster owns shard ID {shard_id}')
+
+    async def _request(self, worker: _Worker, request: Dict[str, Any]) -> Any:
+        try:
+            return await worker.channel.request('request', request, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise ClusterError(f'Cluster {worker.cluster_id} did not answer in time') from None
+
+
+def _run_cluster(
+    factory: Callable[[], AutoShardedClient],
+    token: str,
+    path: str,
+    cluster_id: int,
+    cluster_count: int,
+    shard_ids: List[int],
+    shard_count: int,
+    max_concurrency: int,
+) -> None:
+    client = factory()
+    client.shard_ids = shard_ids
+    client.shard_count = shard_count
+    client.identify_concurrency = max_concurrency
+    client.cluster = ClusterClient(client, path, cluster_id=cluster_id, cluster_count=cluster_count)
+    client.run(token)
+
+
+class ShardCluster:
+    """Runs the shards of an :class:`AutoShardedClient` across multiple processes.
+
+    The shards are split into ``clusters`` contiguous ranges and every range is run
+    by its own process with its own event loop, so a large bot is no longer limited
+    to a single core. A :class:`ClusterCoordinator` running in the parent process
+    coordinates IDENTIFYs between the clusters and routes requests made through
+    :attr:`AutoShardedClient.cluster`.
+
+    Example: ::
+
+        def create_client():
+            return discord.AutoShardedClient(intents=discord.Intents.default())
+
+        if __name__ == '__main__':
+            discord.ShardCluster(create_client, token, clusters=4).run()
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    factory: Callable[[], :class:`AutoShardedClient`]
+        A picklable callable, such as a module level function or the class itself,
+        that creates the client in every cluster process. The cluster assigns
+        :attr:`AutoShardedClient.shard_ids` and :attr:`AutoShardedClient.shard_count`.
+    token: :class:`str`
+        The authentication token.
+    clusters: :class:`int`
+        The number of processes to run.
+    shard_count: Optional[:class:`int`]
+        The total number of shards. If ``None``, the recommended shard count is fetched.
+    shard_ids: Optional[Sequence[:class:`int`]]
+        The shards to run across the clusters. Defaults to every shard.
+    max_concurrency: Optional[:class:`int`]
+        The number of IDENTIFY rate limit buckets. If ``None``, the value from the
+        session start limits is fetched.
+    path: Optional[:class:`str`]
+        The path of the coordinator's Unix socket. Defaults to a temporary file.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], AutoShardedClient],
+        token: str,
+        *,
+        clusters: int,
+        shard_count: Optional[int] = None,
+        shard_ids: Optional[Sequence[int]] = None,
+        max_concurrency: Optional[int] = None,
+        path: Optional[str] = None,
+    ) -> None:
+        if clusters < 1:
+            raise ValueError('clusters must be at least 1')
+
+        if shard_ids is not None and shard_count is None:
+            raise ValueError('When passing manual shard_ids, you must provide a shard_count.')
+
+        self.factory: Callable[[], AutoShardedClient] = factory
+        self.token: str = token
+        self.clusters: int = clusters
+        self.shard_count: Optional[int] = shard_count
+        self.shard_ids: Optional[List[int]] = list(shard_ids) if shard_ids is not None else None
+        self.max_concurrency: Optional[int] = max_concurrency
+        self.path: str = path or os.path.join(tempfile.gettempdir(), f'discord-cluster-{os.getpid()}.sock')
+        self.coordinator: Optional[ClusterCoordinator] = None
+        self._processes: List[BaseProcess] = []
+
+    def _split_shards(self, shard_ids: List[int]) -> List[List[int]]:
+        size, remainder = divmod(len(shard_ids), self.clusters)
+        ranges: List[List[int]] = []
+        start = 0
+        for cluster_id in range(self.clusters):
+            end = start + size + (cluster_id < remainder)
+            if end > start:
+                ranges.append(shard_ids[start:end])
+            start = end
+        return ranges
+
+    async def _fetch_gateway_info(self) -> Tuple[int, int]:
+        from .http import HTTPClient
+
+        http = HTTPClient(asyncio.get_running_loop())
+        try:
+            await http.static_login(self.token.strip())
+            shard_count, _, limits = await http.get_bot_gateway()
+        finally:
+            await http.close()
+        return shard_count, limits['max_concurrency']
+
+    async def start(self) -> None:
+        """|coro|
+
+        Starts the coordinator and the cluster processes, then waits for every process to exit.
+        """
+        shard_count = self.shard_count
+        max_concurrency = self.max_concurrency
+        if shard_count is None or max_concurrency is None:
+            recommended, fetched_concurrency = await self._fetch_gateway_info()
+            shard_count = shard_count or recommended
+            max_concurrency = max_concurrency or fetched_concurrency
+
+        shard_ids = self.shard_ids if self.shard_ids is not None else list(range(shard_count))
+
+        self.coordinator = coordinator = ClusterCoordinator(self.path, max_concurrency=max_concurrency)
+        await coordinator.start()
+
+        ranges = self._split_shards(shard_ids)
+        context = multiprocessing.get_context('spawn')
+        loop = asyncio.get_running_loop()
+        try:
+            for cluster_id, cluster_shards in enumerate(ranges):
+                process = context.Process(
+                    target=_run_cluster,
+                    args=(
+                        self.factory,
+                        self.token,
+                        self.path,
+                        cluster_id,
+                        len(ranges),
+                        cluster_shards,
+                        shard_count,
+                        max_concurrency,
+                    ),
+                    name=f'discord.py-cluster-{cluster_id}',
+                    daemon=False,
+                )
+                process.start()
+                self._processes.append(process)
+                _log.info('Started cluster %s with shards %s (pid %s).', cluster_id, cluster_shards, process.pid)
+
+            await asyncio.gather(*(loop.run_in_executor(None, process.join) for process in self._processes))
+        finally:
+            for process in self._processes:
+                # Give the clusters a chance to close their shards cleanly first
+                process.join(10.0)
+                if process.is_alive():
+                    process.terminate()
+            self._processes.clear()
+            await coordinator.close()
+
+    def run(self) -> None:
+        """Starts the cluster and blocks until every cluster process has exited.
+
+        This takes care of the event loop of the parent process, similar to :meth:`Client.run`.
+        """
+        try:
+            asyncio.run(self.start())
+        except KeyboardInterrupt:
+            # The cluster processes receive the interrupt as well and close themselves
+            pass
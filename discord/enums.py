@@ -87,6 +87,7 @@ __all__ = (
     'MediaItemLoadingState',
     'CollectibleType',
     'NameplatePalette',
+    'RequestPriority',
 )
 
 
@@ -1006,6 +1007,12 @@ class NameplatePalette(Enum):
     white = 'white'
 
 
+class RequestPriority(Enum, comparable=True):
+    interaction = 0
+    normal = 1
+    bulk = 2
+
+
 def create_unknown_value(cls: Type[E], val: Any) -> E:
     value_cls = cls._enum_value_cls_  # type: ignore # This is narrowed below
     name = f'unknown_{val}'
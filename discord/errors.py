@@ -49,6 +49,7 @@ __all__ = (
     'InteractionResponded',
     'MissingApplicationID',
     'FFmpegProcessError',
+    'ClusterError',
 )
 
 APP_ID_NOT_FOUND = (
@@ -313,3 +314,12 @@ class MissingApplicationID(ClientException):
 
     def __init__(self, message: Optional[str] = None):
         super().__init__(message or APP_ID_NOT_FOUND)
+
+
+class ClusterError(DiscordException):
+    """An exception that is thrown when a cross-cluster request fails.
+
+    .. versionadded:: 2.8
+    """
+
+    pass
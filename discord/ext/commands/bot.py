@@ -240,6 +240,9 @@ class BotBase(GroupMixin[None]):
         for event in self.extra_events.get(ev, []):
             self._schedule_event(event, ev, *args, **kwargs)  # type: ignore
 
+    def _has_listeners(self, event_name: str, /) -> bool:
+        return super()._has_listeners(event_name) or bool(self.extra_events.get('on_' + event_name))  # type: ignore
+
     @discord.utils.copy_doc(discord.Client.close)
     async def close(self) -> None:
         for extension in tuple(self.__extensions):
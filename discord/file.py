@@ -23,16 +23,23 @@ DEALINGS IN THE SOFTWARE.
 """
 
 from __future__ import annotations
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional, Tuple, Union
 
 import os
 import io
+import mmap
+import tempfile
+import threading
 
 from .utils import MISSING
 
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
 # fmt: off
 __all__ = (
     'File',
+    'FileSource',
 )
 # fmt: on
 
@@ -171,3 +178,225 @@ class File:
             payload['description'] = self.description
 
         return payload
+
+
+class _SourceReader(io.RawIOBase):
+    # A read only view of a FileSource with its own position.
+    # Any number of these can read the same source concurrently since
+    # they never move a shared file offset.
+
+    def __init__(self, source: FileSource) -> None:
+        super().__init__()
+        self._source: FileSource = source
+        self._pos: int = 0
+        self.name: str = source.path
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        # aiohttp uses this to compute the Content-Length
+        return self._source._fd
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._source.size
+        if offset < 0:
+            raise ValueError(f'negative seek position {offset}')
+        self._pos = offset
+        return offset
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        end = self._source.size
+        if size is not None and size >= 0:
+            end = min(end, self._pos + size)
+        if end <= self._pos:
+            return b''
+
+        data = self._source._read(self._pos, end - self._pos)
+        self._pos += len(data)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer: Any) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class FileSource:
+    """Represents a file on disk that is sent many times, e.g. to multiple channels.
+
+    Unlike creating a :class:`File` from the path for every send, the file is opened
+    once and every :class:`File` made by :meth:`to_file` streams the contents from it
+    in chunks when it is uploaded, including when the upload is retried. The file is
+    never fully read into memory, unlike wrapping its contents in :class:`io.BytesIO`,
+    which is copied by every upload.
+
+    This can be used as a context manager to close the file afterwards.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    path: Union[:class:`str`, :class:`os.PathLike`]
+        The path of the file.
+    mmap: :class:`bool`
+        Whether to memory map the file instead of reading it with system calls.
+        The mapped pages are shared by every upload and can be reclaimed by the
+        operating system at any time, which makes it cheaper to send the same
+        file many times concurrently. Defaults to ``False``.
+
+    Attributes
+    -----------
+    path: :class:`str`
+        The path of the file.
+    size: :class:`int`
+        The size of the file in bytes.
+    """
+
+    __slots__ = ('path', 'size', '_fd', '_mmap', '_lock')
+
+    def __init__(self, path: Union[str, os.PathLike[Any]], *, mmap: bool = False) -> None:
+        self.path: str = os.fspath(path)
+        self._fd: int = os.open(self.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        self.size: int = os.fstat(self._fd).st_size
+        # Empty files cannot be mapped
+        self._mmap: Optional[mmap.mmap] = _map_file(self._fd) if mmap and self.size else None
+        # Only used on platforms without os.pread
+        self._lock: threading.Lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f'<FileSource path={self.path!r} size={self.size} mmap={self._mmap is not None}>'
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _read(self, offset: int, size: int) -> bytes:
+        # This is called from aiohttp's executor threads
+        if self._mmap is not None:
+            return self._mmap[offset : offset + size]
+
+        if hasattr(os, 'pread'):
+            return os.pread(self._fd, size, offset)
+
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.read(self._fd, size)
+
+    def to_file(
+        self,
+        filename: Optional[str] = None,
+        *,
+        spoiler: bool = MISSING,
+        description: Optional[str] = None,
+    ) -> File:
+        """Creates a :class:`File` that streams the contents of this source.
+
+        Parameters
+        -----------
+        filename: Optional[:class:`str`]
+            The filename to display when uploading to Discord. Defaults to the
+            name of the file.
+        spoiler: :class:`bool`
+            Whether the attachment is a spoiler. See :class:`File`.
+        description: Optional[:class:`str`]
+            The file description to display, currently only supported for images.
+
+        Returns
+        --------
+        :class:`File`
+            The file to send.
+        """
+        if filename is None:
+            filename = os.path.basename(self.path)
+        return File(_SourceReader(self), filename, spoiler=spoiler, description=description)  # type: ignore
+
+    def close(self) -> None:
+        """Closes the file.
+
+        Files created by :meth:`to_file` can no longer be sent afterwards.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._fd != -1:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _map_file(fd: int) -> mmap.mmap:
+    return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+
+# Downloads bigger than this are spooled to a temporary file instead of memory
+_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+async def _spool(
+    chunks: AsyncIterator[bytes],
+    *,
+    filename: Optional[str],
+    description: Optional[str] = None,
+    spoiler: bool = MISSING,
+) -> File:
+    fp: io.BufferedIOBase = io.BytesIO()
+    async for chunk in chunks:
+        # Windows only has named temporary files which aren't io.IOBase instances
+        if isinstance(fp, io.BytesIO) and fp.tell() + len(chunk) > _SPOOL_MAX_SIZE and os.name == 'posix':
+            spilled: io.BufferedIOBase = tempfile.TemporaryFile()  # type: ignore
+            spilled.write(fp.getbuffer())
+            fp = spilled
+        fp.write(chunk)
+
+    fp.seek(0)
+    file = File(fp, filename=filename, description=description, spoiler=spoiler)
+    # The buffer was made for this file alone, so close it (and remove the spill) with it
+    file._owner = True
+    return file
+
+
+async def _save(
+    chunks: AsyncIterator[bytes],
+    fp: Union[str, bytes, os.PathLike[Any], io.BufferedIOBase],
+    *,
+    seek_begin: bool = True,
+) -> int:
+    written = 0
+    if isinstance(fp, io.BufferedIOBase):
+        async for chunk in chunks:
+            written += fp.write(chunk)
+        if seek_begin:
+            fp.seek(0)
+        return written
+
+    # The download goes to a file next to the destination that is only moved into
+    # place once it is complete, so a failed download leaves the destination untouched
+    path = os.fsdecode(fp)
+    partial = f'{path}.{os.urandom(4).hex()}.part'
+    f = open(partial, 'xb')
+    try:
+        with f:
+            async for chunk in chunks:
+                written += f.write(chunk)
+        os.replace(partial, path)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    return written
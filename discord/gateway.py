@@ -27,14 +27,31 @@ from __future__ import annotations
 import asyncio
 from collections import deque
 import concurrent.futures
+import heapq
+import itertools
 import logging
+import re
 import struct
 import sys
 import time
 import threading
 import traceback
 
-from typing import Any, Callable, Coroutine, Deque, Dict, List, TYPE_CHECKING, NamedTuple, Optional, TypeVar, Tuple
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    TYPE_CHECKING,
+    NamedTuple,
+    Optional,
+    Set,
+    TypeVar,
+    Tuple,
+    Union,
+)
 
 import aiohttp
 import yarl
@@ -43,6 +60,7 @@ from . import utils
 from .activity import BaseActivity
 from .enums import SpeakingState
 from .errors import ConnectionClosed
+from .ratelimits import _PriorityLimiter
 
 try:
     import davey  # type: ignore
@@ -55,6 +73,8 @@ __all__ = (
     'DiscordWebSocket',
     'KeepAliveHandler',
     'VoiceKeepAliveHandler',
+    'HeartbeatScheduler',
+    'GatewayRatelimitStats',
     'DiscordVoiceWebSocket',
     'ReconnectWebSocket',
 )
@@ -63,10 +83,19 @@ if TYPE_CHECKING:
     from typing_extensions import Self
 
     from .client import Client
+    from .replay import GatewayRecorder
     from .state import ConnectionState
     from .voice_state import VoiceConnectionState
 
 
+# Discord serialises dispatch frames with the event name and sequence first,
+# which lets lazy dispatch read them without decoding the whole payload.
+_DISPATCH_PEEK = re.compile(r'\{"t":"([A-Z_]+)","s":(\d+),"op":0,')
+
+# Keeps merged member chunk requests well below the 4096 byte gateway payload limit
+_MAX_COALESCED_GUILDS = 100
+
+
 class ReconnectWebSocket(Exception):
     """Signals to safely reconnect the websocket."""
 
@@ -89,16 +118,79 @@ class EventListener(NamedTuple):
     future: asyncio.Future[Any]
 
 
-class GatewayRatelimiter:
+class GatewayRatelimitStats:
+    """A snapshot of the gateway send rate limit state of a shard.
+
+    You can retrieve this via :attr:`Client.gateway_ratelimit_stats` or
+    :attr:`ShardInfo.ratelimit_stats`.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    shard_id: Optional[:class:`int`]
+        The shard ID these statistics are for.
+    queue_depth: :class:`int`
+        The number of sends currently waiting for the rate limit.
+    remaining: :class:`int`
+        The number of sends left in the current rate limit window.
+    sent: :class:`int`
+        The number of sends that went through the rate limit.
+    delayed: :class:`int`
+        How many of those sends had to wait for the rate limit.
+    total_wait: :class:`float`
+        The total number of seconds sends spent waiting for the rate limit.
+    max_wait: :class:`float`
+        The longest a single send waited for the rate limit, in seconds.
+    coalesced: :class:`int`
+        The number of member chunk requests that were merged into another pending request.
+    """
+
+    __slots__ = ('shard_id', 'queue_depth', 'remaining', 'sent', 'delayed', 'total_wait', 'max_wait', 'coalesced')
+
+    def __init__(self, limiter: GatewayRatelimiter) -> None:
+        self.shard_id: Optional[int] = limiter.shard_id
+        self.queue_depth: int = limiter.queue_depth
+        self.remaining: int = limiter.remaining
+        self.sent: int = limiter.sent
+        self.delayed: int = limiter.delayed
+        self.total_wait: float = limiter.total_wait
+        self.max_wait: float = limiter.max_wait
+        self.coalesced: int = limiter.coalesced
+
+    def __repr__(self) -> str:
+        return (
+            f'<GatewayRatelimitStats shard_id={self.shard_id} queue_depth={self.queue_depth} '
+            f'sent={self.sent} delayed={self.delayed} max_wait={self.max_wait:.2f}>'
+        )
+
+    @property
+    def average_wait(self) -> float:
+        """:class:`float`: The average number of seconds a send waited for the rate limit."""
+        return self.total_wait / self.sent if self.sent else 0.0
+
+
+class GatewayRatelimiter(_PriorityLimiter):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
     def __init__(self, count: int = 110, per: float = 60.0) -> None:
+        super().__init__()
         # The default is 110 to give room for at least 10 heartbeats per minute
         self.max: int = count
         self.remaining: int = count
         self.window: float = 0.0
         self.per: float = per
-        self.lock: asyncio.Lock = asyncio.Lock()
         self.shard_id: Optional[int] = None
 
+        # metrics
+        self.sent: int = 0
+        self.delayed: int = 0
+        self.total_wait: float = 0.0
+        self.max_wait: float = 0.0
+        self.coalesced: int = 0
+
     def is_ratelimited(self) -> bool:
         current = time.time()
         if current > self.window + self.per:
@@ -120,12 +212,128 @@ class GatewayRatelimiter:
         self.remaining -= 1
         return 0.0
 
-    async def block(self) -> None:
-        async with self.lock:
-            delta = self.get_delay()
-            if delta:
-                _log.warning('WebSocket in shard ID %s is ratelimited, waiting %.2f seconds', self.shard_id, delta)
-                await asyncio.sleep(delta)
+    def get_stats(self) -> GatewayRatelimitStats:
+        return GatewayRatelimitStats(self)
+
+    async def block(self, priority: int = NORMAL) -> None:
+        start = time.perf_counter()
+        delayed = await self._wait(priority)
+        self.sent += 1
+        if delayed:
+            waited = time.perf_counter() - start
+            self.delayed += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def _on_delay(self, delay: float) -> None:
+        _log.warning('WebSocket in shard ID %s is ratelimited, waiting %.2f seconds', self.shard_id, delay)
+
+
+class HeartbeatWatchdog(threading.Thread):
+    """Warns when the event loop running the heartbeats stops responding.
+
+    This replaces the blocking checks each :class:`KeepAliveHandler` thread does
+    when heartbeats are run from a :class:`HeartbeatScheduler`.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, *, interval: float = 10.0) -> None:
+        super().__init__(daemon=True, name='heartbeat-watchdog')
+        self.loop: asyncio.AbstractEventLoop = loop
+        self.interval: float = interval
+        self._main_thread_id: int = threading.get_ident()
+        self._stop_ev: threading.Event = threading.Event()
+        self.block_msg: str = 'Heartbeat loop blocked for more than %s seconds.'
+
+    def run(self) -> None:
+        while not self._stop_ev.wait(self.interval):
+            pong = threading.Event()
+            try:
+                self.loop.call_soon_threadsafe(pong.set)
+            except RuntimeError:
+                # the loop has been closed
+                return
+
+            total = 0
+            while not pong.wait(10):
+                if self._stop_ev.is_set():
+                    return
+
+                total += 10
+                try:
+                    frame = sys._current_frames()[self._main_thread_id]
+                except KeyError:
+                    msg = self.block_msg
+                else:
+                    stack = ''.join(traceback.format_stack(frame))
+                    msg = f'{self.block_msg}\nLoop thread traceback (most recent call last):\n{stack}'
+                _log.warning(msg, total)
+
+    def stop(self) -> None:
+        self._stop_ev.set()
+
+
+class HeartbeatScheduler:
+    """Runs the heartbeats of many :class:`KeepAliveHandler` from a single timer heap
+    on the event loop instead of one thread per connection.
+
+    This must be created from within the event loop's thread.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, *, watchdog: bool = True) -> None:
+        self.loop: asyncio.AbstractEventLoop = loop
+        self._heap: List[Tuple[float, int, KeepAliveHandler]] = []
+        self._counter = itertools.count()
+        self._wakeup: asyncio.Event = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._beats: Set[asyncio.Task[None]] = set()
+        self._watchdog: Optional[HeartbeatWatchdog] = HeartbeatWatchdog(loop) if watchdog else None
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, handler in self._heap if not handler.is_stopped())
+
+    def schedule(self, handler: KeepAliveHandler) -> None:
+        heapq.heappush(self._heap, (time.perf_counter() + (handler.interval or 0.0), next(self._counter), handler))
+        self._wakeup.set()
+
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run(), name='discord.py: heartbeat-scheduler')
+
+        if self._watchdog is not None and not self._watchdog.is_alive():
+            self._watchdog.start()
+
+    async def _run(self) -> None:
+        while self._heap:
+            deadline, _, handler = self._heap[0]
+            if handler.is_stopped():
+                # stopped handlers are removed lazily
+                heapq.heappop(self._heap)
+                continue
+
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heapreplace(self._heap, (time.perf_counter() + (handler.interval or 0.0), next(self._counter), handler))
+            task = self.loop.create_task(handler._beat())
+            self._beats.add(task)
+            task.add_done_callback(self._beats.discard)
+
+    def close(self) -> None:
+        for _, _, handler in self._heap:
+            handler.stop()
+
+        self._heap.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        if self._watchdog is not None:
+            self._watchdog.stop()
 
 
 class KeepAliveHandler(threading.Thread):
@@ -135,12 +343,15 @@ class KeepAliveHandler(threading.Thread):
         ws: DiscordWebSocket,
         interval: Optional[float] = None,
         shard_id: Optional[int] = None,
+        scheduler: Optional[HeartbeatScheduler] = None,
         **kwargs: Any,
     ) -> None:
         daemon: bool = kwargs.pop('daemon', True)
         name: str = kwargs.pop('name', f'keep-alive-handler:shard-{shard_id}')
         super().__init__(*args, daemon=daemon, name=name, **kwargs)
         self.ws: DiscordWebSocket = ws
+        # If a scheduler is given the heartbeats are sent from the loop and this thread is never started
+        self.scheduler: Optional[HeartbeatScheduler] = scheduler
         self._main_thread_id: int = ws.thread_id
         self.interval: Optional[float] = interval
         self.shard_id: Optional[int] = shard_id
@@ -195,6 +406,31 @@ class KeepAliveHandler(threading.Thread):
             except Exception:
                 self.stop()
 
+    def start(self) -> None:
+        if self.scheduler is None:
+            super().start()
+        else:
+            self.scheduler.schedule(self)
+
+    async def _beat(self) -> None:
+        # The scheduler equivalent of a single iteration of run()
+        if self._last_recv + self.heartbeat_timeout < time.perf_counter():
+            _log.warning('Shard ID %s has stopped responding to the gateway. Closing and restarting.', self.shard_id)
+            try:
+                await self.ws.close(4000)
+            except Exception:
+                _log.exception('An error occurred while stopping the gateway. Ignoring.')
+            finally:
+                self.stop()
+            return
+
+        data = self.get_payload()
+        _log.debug(self.msg, self.shard_id, data['d'])
+        try:
+            await self._send_heartbeat(data)
+        except Exception:
+            self.stop()
+
     def get_payload(self) -> Dict[str, Any]:
         return {
             'op': self.ws.HEARTBEAT,
@@ -204,6 +440,9 @@ class KeepAliveHandler(threading.Thread):
     def stop(self) -> None:
         self._stop_ev.set()
 
+    def is_stopped(self) -> bool:
+        return self._stop_ev.is_set()
+
     def tick(self) -> None:
         self._last_recv = time.perf_counter()
 
@@ -334,8 +573,8 @@ class DiscordWebSocket:
 
         # an empty dispatcher to prevent crashes
         self._dispatch: Callable[..., Any] = lambda *args: None
-        # generic event listeners
-        self._dispatch_listeners: List[EventListener] = []
+        # generic event listeners, keyed by event name then by their future
+        self._dispatch_listeners: Dict[str, Dict[asyncio.Future[Any], EventListener]] = {}
         # the keep alive
         self._keep_alive: Optional[KeepAliveHandler] = None
         self.thread_id: int = threading.get_ident()
@@ -346,6 +585,18 @@ class DiscordWebSocket:
         self._decompressor: utils._DecompressionContext = utils._ActiveDecompressionContext()
         self._close_code: Optional[int] = None
         self._rate_limiter: GatewayRatelimiter = GatewayRatelimiter()
+        self._lazy_dispatch: bool = False
+        self._offload_threshold: Optional[int] = None
+        self._offload_executor: Optional[concurrent.futures.Executor] = None
+        self._heartbeat_scheduler: Optional[HeartbeatScheduler] = None
+        self._recorder: Optional[GatewayRecorder] = None
+        self._coalesce_chunk_requests: bool = False
+        # (query, limit, presences, has nonce) -> (payload waiting for the rate limit, future for when it's sent)
+        self._pending_chunk_requests: Dict[
+            Tuple[Optional[str], int, bool, bool], Tuple[Dict[str, Any], asyncio.Future[None]]
+        ] = {}
+
+        self._send_frame: Callable[[str], Coroutine[Any, Any, None]] = socket.send_str
 
     @property
     def open(self) -> bool:
@@ -354,10 +605,10 @@ class DiscordWebSocket:
     def is_ratelimited(self) -> bool:
         return self._rate_limiter.is_ratelimited()
 
-    def debug_log_receive(self, data: Dict[str, Any], /) -> None:
+    def debug_log_receive(self, data: str, /) -> None:
         self._dispatch('socket_raw_receive', data)
 
-    def log_receive(self, _: Dict[str, Any], /) -> None:
+    def log_receive(self, _: str, /) -> None:
         pass
 
     @classmethod
@@ -391,6 +642,38 @@ class DiscordWebSocket:
             )
 
         socket = await client.http.ws_connect(str(url))
+        ws = cls._from_socket(
+            client,
+            socket,
+            initial=initial,
+            gateway=gateway,
+            shard_id=shard_id,
+            session=session,
+            sequence=sequence,
+        )
+
+        # poll event for OP Hello
+        await ws.poll_event()
+
+        if not resume:
+            await ws.identify()
+            return ws
+
+        await ws.resume()
+        return ws
+
+    @classmethod
+    def _from_socket(
+        cls,
+        client: Client,
+        socket: aiohttp.ClientWebSocketResponse,
+        *,
+        initial: bool,
+        gateway: yarl.URL,
+        shard_id: Optional[int],
+        session: Optional[str],
+        sequence: Optional[int],
+    ) -> Self:
         ws = cls(socket, loop=client.loop)
 
         # dynamically add attributes needed
@@ -407,23 +690,25 @@ class DiscordWebSocket:
         ws.session_id = session
         ws.sequence = sequence
         ws._max_heartbeat_timeout = client._connection.heartbeat_timeout
+        ws._lazy_dispatch = client._connection.lazy_dispatch
+
+        ws._heartbeat_scheduler = client._connection._get_heartbeat_scheduler()
+
+        threshold = client._connection.gateway_offload_threshold
+        if threshold is not None:
+            ws._offload_threshold = threshold
+            ws._offload_executor = client._connection._get_gateway_executor()
 
         if client._enable_debug_events:
             ws.send = ws.debug_send
             ws.log_receive = ws.debug_log_receive
 
+        ws._recorder = client._connection.gateway_recorder
+        ws._coalesce_chunk_requests = client._connection.coalesce_chunk_requests
+
         client._connection._update_references(ws)
 
         _log.debug('Created websocket connected to %s', gateway)
-
-        # poll event for OP Hello
-        await ws.poll_event()
-
-        if not resume:
-            await ws.identify()
-            return ws
-
-        await ws.resume()
         return ws
 
     def wait_for(
@@ -453,9 +738,20 @@ class DiscordWebSocket:
 
         future = self.loop.create_future()
         entry = EventListener(event=event, predicate=predicate, result=result, future=future)
-        self._dispatch_listeners.append(entry)
+        self._dispatch_listeners.setdefault(event, {})[future] = entry
+        future.add_done_callback(lambda f: self._remove_cancelled_listener(event, f))
         return future
 
+    def _remove_cancelled_listener(self, event: str, future: asyncio.Future[Any]) -> None:
+        # Resolved listeners are removed while dispatching, this only cleans up
+        # waiters that were cancelled (e.g. timed out) before their event arrived
+        if not future.cancelled():
+            return
+
+        listeners = self._dispatch_listeners.get(event)
+        if listeners is not None and listeners.pop(future, None) is not None and not listeners:
+            del self._dispatch_listeners[event]
+
     async def identify(self) -> None:
         """Sends the IDENTIFY packet."""
         payload = {
@@ -488,7 +784,7 @@ class DiscordWebSocket:
             payload['d']['intents'] = state._intents.value
 
         await self.call_hooks('before_identify', self.shard_id, initial=self._initial_identify)
-        await self.send_as_json(payload)
+        await self.send_as_json(payload, priority=GatewayRatelimiter.HIGH)
         _log.debug('Shard ID %s has sent the IDENTIFY payload.', self.shard_id)
 
     async def resume(self) -> None:
@@ -502,19 +798,64 @@ class DiscordWebSocket:
             },
         }
 
-        await self.send_as_json(payload)
+        await self.send_as_json(payload, priority=GatewayRatelimiter.HIGH)
         _log.debug('Shard ID %s has sent the RESUME payload.', self.shard_id)
 
-    async def received_message(self, msg: Any, /) -> None:
+    def _try_skip_dispatch(self, msg: str) -> bool:
+        match = _DISPATCH_PEEK.match(msg)
+        if match is None:
+            return False
+
+        event = match.group(1)
+        state = self._connection
+        if state._is_event_wanted(event) or event in self._dispatch_listeners:
+            return False
+
+        self.sequence = int(match.group(2))
+        if self._keep_alive:
+            self._keep_alive.tick()
+
+        self._dispatch('socket_event_type', event)
+        state._record_dispatch(event, skipped=True)
+        return True
+
+    def _decode_frame(self, msg: Union[str, bytes], /) -> Tuple[Optional[str], Any]:
         if type(msg) is bytes:
             msg = self._decompressor.decompress(msg)
 
             # Received a partial gateway message
             if msg is None:
+                return None, None
+
+        return msg, utils._from_json(msg)
+
+    async def received_message(self, msg: Any, /) -> None:
+        if self._offload_threshold is not None and len(msg) >= self._offload_threshold:
+            # Large frames (e.g. GUILD_CREATE) are decompressed and decoded in a worker
+            # thread so the loop is not blocked. The next frame is only read once this
+            # returns, so the decompression context and sequence ordering are unaffected.
+            raw, msg = await self.loop.run_in_executor(self._offload_executor, self._decode_frame, msg)
+            if raw is None:
                 return
 
-        self.log_receive(msg)
-        msg = utils._from_json(msg)
+            self.log_receive(raw)
+            if self._recorder is not None:
+                self._recorder.record(self.shard_id, raw)
+        else:
+            if type(msg) is bytes:
+                msg = self._decompressor.decompress(msg)
+
+                # Received a partial gateway message
+                if msg is None:
+                    return
+
+            self.log_receive(msg)
+            if self._recorder is not None:
+                self._recorder.record(self.shard_id, msg)
+            if self._lazy_dispatch and self._try_skip_dispatch(msg):
+                return
+
+            msg = utils._from_json(msg)
 
         _log.debug('For Shard ID %s: WebSocket Event: %s', self.shard_id, msg)
         event = msg.get('t')
@@ -552,7 +893,9 @@ class DiscordWebSocket:
 
             if op == self.HELLO:
                 interval = data['heartbeat_interval'] / 1000.0
-                self._keep_alive = KeepAliveHandler(ws=self, interval=interval, shard_id=self.shard_id)
+                self._keep_alive = KeepAliveHandler(
+                    ws=self, interval=interval, shard_id=self.shard_id, scheduler=self._heartbeat_scheduler
+                )
                 # send a heartbeat immediately
                 await self.send_as_json(self._keep_alive.get_payload())
                 self._keep_alive.start()
@@ -589,32 +932,33 @@ class DiscordWebSocket:
         except KeyError:
             _log.debug('Unknown event %s.', event)
         else:
+            if self._lazy_dispatch:
+                self._connection._record_dispatch(event, skipped=False)
             func(data)
 
-        # remove the dispatched listeners
-        removed = []
-        for index, entry in enumerate(self._dispatch_listeners):
-            if entry.event != event:
-                continue
+        listeners = self._dispatch_listeners.get(event)
+        if not listeners:
+            return
 
-            future = entry.future
+        # resolve and remove the matching listeners
+        for future, entry in list(listeners.items()):
             if future.cancelled():
-                removed.append(index)
+                listeners.pop(future, None)
                 continue
 
             try:
                 valid = entry.predicate(data)
             except Exception as exc:
                 future.set_exception(exc)
-                removed.append(index)
+                listeners.pop(future, None)
             else:
                 if valid:
                     ret = data if entry.result is None else entry.result(data)
                     future.set_result(ret)
-                    removed.append(index)
+                    listeners.pop(future, None)
 
-        for index in reversed(removed):
-            del self._dispatch_listeners[index]
+        if not listeners:
+            self._dispatch_listeners.pop(event, None)
 
     @property
     def latency(self) -> float:
@@ -668,18 +1012,18 @@ class DiscordWebSocket:
                 _log.debug('Websocket closed with %s, cannot reconnect.', code)
                 raise ConnectionClosed(self.socket, shard_id=self.shard_id, code=code) from None
 
-    async def debug_send(self, data: str, /) -> None:
-        await self._rate_limiter.block()
+    async def debug_send(self, data: str, /, *, priority: int = GatewayRatelimiter.NORMAL) -> None:
+        await self._rate_limiter.block(priority)
         self._dispatch('socket_raw_send', data)
-        await self.socket.send_str(data)
+        await self._send_frame(data)
 
-    async def send(self, data: str, /) -> None:
-        await self._rate_limiter.block()
-        await self.socket.send_str(data)
+    async def send(self, data: str, /, *, priority: int = GatewayRatelimiter.NORMAL) -> None:
+        await self._rate_limiter.block(priority)
+        await self._send_frame(data)
 
-    async def send_as_json(self, data: Any) -> None:
+    async def send_as_json(self, data: Any, *, priority: int = GatewayRatelimiter.NORMAL) -> None:
         try:
-            await self.send(utils._to_json(data))
+            await self.send(utils._to_json(data), priority=priority)
         except RuntimeError as exc:
             if not self._can_handle_close():
                 raise ConnectionClosed(self.socket, shard_id=self.shard_id) from exc
@@ -687,7 +1031,7 @@ class DiscordWebSocket:
     async def send_heartbeat(self, data: Any) -> None:
         # This bypasses the rate limit handling code since it has a higher priority
         try:
-            await self.socket.send_str(utils._to_json(data))
+            await self._send_frame(utils._to_json(data))
         except RuntimeError as exc:
             if not self._can_handle_close():
                 raise ConnectionClosed(self.socket, shard_id=self.shard_id) from exc
@@ -721,7 +1065,7 @@ class DiscordWebSocket:
 
         sent = utils._to_json(payload)
         _log.debug('Sending "%s" to change status', sent)
-        await self.send(sent)
+        await self.send(sent, priority=GatewayRatelimiter.HIGH)
 
     async def request_chunks(
         self,
@@ -751,7 +1095,73 @@ class DiscordWebSocket:
         if query is not None:
             payload['d']['query'] = query
 
-        await self.send_as_json(payload)
+        if not self._coalesce_chunk_requests or user_ids:
+            await self.send_as_json(payload, priority=GatewayRatelimiter.LOW)
+            return
+
+        # While waiting for the rate limit, requests for other guilds with the same
+        # parameters are merged into this one by sending a list of guild IDs.
+        key = (query, limit, presences, nonce is None)
+        pending = self._pending_chunk_requests.get(key)
+        if pending is not None:
+            pending_payload, sent = pending
+            guild_ids = pending_payload['d']['guild_id']
+            if len(guild_ids) < _MAX_COALESCED_GUILDS:
+                guild_ids.append(guild_id)
+                if nonce:
+                    self._connection._merge_chunk_nonce(guild_id, nonce, pending_payload['d']['nonce'])
+                self._rate_limiter.coalesced += 1
+                await asyncio.shield(sent)
+                return
+
+        payload['d']['guild_id'] = guild_ids = [guild_id]
+        sent = self.loop.create_future()
+        entry = (payload, sent)
+        self._pending_chunk_requests[key] = entry
+        try:
+            try:
+                await self._rate_limiter.block(GatewayRatelimiter.LOW)
+            finally:
+                if self._pending_chunk_requests.get(key) is entry:
+                    del self._pending_chunk_requests[key]
+
+            await self._send_chunk_request(payload, sent)
+        except asyncio.CancelledError:
+            guild_ids.remove(guild_id)
+            if guild_ids and not sent.done():
+                # The requests merged into this one are sent without it
+                self.loop.create_task(self._resend_chunk_request(payload, sent))
+            raise
+        except Exception as exc:
+            if len(guild_ids) > 1 and not sent.done():
+                sent.set_exception(exc)
+            raise
+
+    async def _send_chunk_request(self, payload: Dict[str, Any], sent: asyncio.Future[None]) -> None:
+        guild_ids = payload['d']['guild_id']
+        if len(guild_ids) == 1:
+            payload = {**payload, 'd': {**payload['d'], 'guild_id': guild_ids[0]}}
+
+        try:
+            await self._send_frame(utils._to_json(payload))
+        except RuntimeError as exc:
+            if not self._can_handle_close():
+                raise ConnectionClosed(self.socket, shard_id=self.shard_id) from exc
+
+        sent.set_result(None)
+
+    async def _resend_chunk_request(self, payload: Dict[str, Any], sent: asyncio.Future[None]) -> None:
+        try:
+            await self._rate_limiter.block(GatewayRatelimiter.LOW)
+            await self._send_chunk_request(payload, sent)
+        except asyncio.CancelledError:
+            if not sent.done():
+                sent.set_exception(ConnectionClosed(self.socket, shard_id=self.shard_id))
+            raise
+        except Exception as exc:
+            # The merged requests receive the error instead
+            if not sent.done():
+                sent.set_exception(exc)
 
     async def voice_state(
         self,
@@ -771,7 +1181,7 @@ class DiscordWebSocket:
         }
 
         _log.debug('Updating our voice state to %s.', payload)
-        await self.send_as_json(payload)
+        await self.send_as_json(payload, priority=GatewayRatelimiter.HIGH)
 
     async def close(self, code: int = 4000) -> None:
         if self._keep_alive:
@@ -859,6 +1269,7 @@ class DiscordVoiceWebSocket:
         self.ws: aiohttp.ClientWebSocketResponse = socket
         self.loop: asyncio.AbstractEventLoop = loop
         self._keep_alive: Optional[VoiceKeepAliveHandler] = None
+        self._heartbeat_scheduler: Optional[HeartbeatScheduler] = None
         self._close_code: Optional[int] = None
         self.secret_key: Optional[List[int]] = None
         # defaulting to -1
@@ -926,6 +1337,7 @@ class DiscordVoiceWebSocket:
         ws._connection = state
         ws._max_heartbeat_timeout = 60.0
         ws.thread_id = threading.get_ident()
+        ws._heartbeat_scheduler = client._state._get_heartbeat_scheduler()
 
         if resume:
             await ws.resume()
@@ -1002,7 +1414,9 @@ class DiscordVoiceWebSocket:
                 await self._connection.reinit_dave_session()
         elif op == self.HELLO:
             interval = data['heartbeat_interval'] / 1000.0
-            self._keep_alive = VoiceKeepAliveHandler(ws=self, interval=min(interval, 5.0))
+            self._keep_alive = VoiceKeepAliveHandler(
+                ws=self, interval=min(interval, 5.0), scheduler=self._heartbeat_scheduler
+            )
             self._keep_alive.start()
         elif self._connection.dave_session:
             state = self._connection
@@ -36,6 +36,7 @@ from typing import (
     Iterable,
     List,
     Mapping,
+    MutableMapping,
     NamedTuple,
     Sequence,
     Set,
@@ -460,17 +461,29 @@ class Guild(Hashable):
     }
 
     def __init__(self, *, data: GuildPayload, state: ConnectionState) -> None:
-        self._channels: Dict[int, GuildChannel] = {}
-        self._members: Dict[int, Member] = {}
+        self._state: ConnectionState = state
+        self._channels: MutableMapping[int, GuildChannel] = state.cache_storage.channels(self)
+        self._members: MutableMapping[int, Member] = state.cache_storage.members(self)
         self._voice_states: Dict[int, VoiceState] = {}
-        self._threads: Dict[int, Thread] = {}
-        self._stage_instances: Dict[int, StageInstance] = {}
-        self._scheduled_events: Dict[int, ScheduledEvent] = {}
+        self._threads: MutableMapping[int, Thread] = {}
+        self._stage_instances: MutableMapping[int, StageInstance] = {}
+        self._scheduled_events: MutableMapping[int, ScheduledEvent] = {}
         self._soundboard_sounds: Dict[int, SoundboardSound] = {}
-        self._state: ConnectionState = state
         self._member_count: Optional[int] = None
+        if state.lazy_guilds:
+            # These are only created from their payload once they are accessed
+            self._channels = utils.LazyMapping(self._channels, self._channel_from_data)
+            self._threads = utils.LazyMapping(self._threads, lambda d: Thread(guild=self, state=state, data=d))
+            self._stage_instances = utils.LazyMapping(
+                self._stage_instances, lambda d: StageInstance(guild=self, state=state, data=d)
+            )
+            self._scheduled_events = utils.LazyMapping(self._scheduled_events, lambda d: ScheduledEvent(state=state, data=d))
         self._from_data(data)
 
+    def _channel_from_data(self, data: GuildChannelPayload) -> GuildChannel:
+        factory, _ = _guild_channel_factory(data['type'])
+        return factory(guild=self, data=data, state=self._state)  # type: ignore # Only known channel types are stored
+
     def _add_channel(self, channel: GuildChannel, /) -> None:
         self._channels[channel.id] = channel
 
@@ -483,6 +496,12 @@ class Guild(Hashable):
     def _add_member(self, member: Member, /) -> None:
         self._members[member.id] = member
 
+    def _store_member(self, member: Member, /) -> None:
+        # Cached members are updated in place, but a member cache such as a
+        # CompactMemberStore may only keep a copy of them, so they are stored again
+        if member.id in self._members:
+            self._members[member.id] = member
+
     def _store_thread(self, payload: ThreadPayload, /) -> Thread:
         thread = Thread(guild=self, state=self._state, data=payload)
         self._threads[thread.id] = thread
@@ -591,11 +610,18 @@ class Guild(Hashable):
         self._banner: Optional[str] = guild.get('banner')
         self.unavailable: bool = guild.get('unavailable', False)
         self.id: int = int(guild['id'])
-        self._roles: Dict[int, Role] = {}
         state = self._state  # speed up attribute access
-        for r in guild.get('roles', []):
-            role = Role(guild=self, data=r, state=state)
-            self._roles[role.id] = role
+        lazy = state.lazy_guilds
+        if lazy:
+            roles = utils.LazyMapping({}, lambda d: Role(guild=self, data=d, state=state))
+            for r in guild.get('roles', []):
+                roles.add_raw(int(r['id']), r)
+        else:
+            roles = {}
+            for r in guild.get('roles', []):
+                role = Role(guild=self, data=r, state=state)
+                roles[role.id] = role
+        self._roles: MutableMapping[int, Role] = roles
 
         self.emojis: Tuple[Emoji, ...] = (
             tuple(map(lambda d: state.store_emoji(self, d), guild.get('emojis', [])))
@@ -640,7 +666,11 @@ class Guild(Hashable):
             channels = guild['channels']
             for c in channels:
                 factory, ch_type = _guild_channel_factory(c['type'])
-                if factory:
+                if factory is None:
+                    continue
+                if lazy:
+                    self._channels.add_raw(int(c['id']), c)  # type: ignore # A LazyMapping in lazy mode
+                else:
                     self._add_channel(factory(guild=self, data=c, state=self._state))  # type: ignore
 
         for obj in guild.get('voice_states', []):
@@ -661,21 +691,31 @@ class Guild(Hashable):
 
             if member is not None:
                 member._presence_update(raw_presence, empty_tuple)  # type: ignore
+                self._store_member(member)
 
         if 'threads' in guild:
             threads = guild['threads']
             for thread in threads:
-                self._add_thread(Thread(guild=self, state=self._state, data=thread))
+                if lazy:
+                    self._threads.add_raw(int(thread['id']), thread)  # type: ignore # A LazyMapping in lazy mode
+                else:
+                    self._add_thread(Thread(guild=self, state=self._state, data=thread))
 
         if 'stage_instances' in guild:
             for s in guild['stage_instances']:
-                stage_instance = StageInstance(guild=self, data=s, state=self._state)
-                self._stage_instances[stage_instance.id] = stage_instance
+                if lazy:
+                    self._stage_instances.add_raw(int(s['id']), s)  # type: ignore # A LazyMapping in lazy mode
+                else:
+                    stage_instance = StageInstance(guild=self, data=s, state=self._state)
+                    self._stage_instances[stage_instance.id] = stage_instance
 
         if 'guild_scheduled_events' in guild:
             for s in guild['guild_scheduled_events']:
-                scheduled_event = ScheduledEvent(data=s, state=self._state)
-                self._scheduled_events[scheduled_event.id] = scheduled_event
+                if lazy:
+                    self._scheduled_events.add_raw(int(s['id']), s)  # type: ignore # A LazyMapping in lazy mode
+                else:
+                    scheduled_event = ScheduledEvent(data=s, state=self._state)
+                    self._scheduled_events[scheduled_event.id] = scheduled_event
 
         if 'soundboard_sounds' in guild and state.cache_guild_expressions:
             for s in guild['soundboard_sounds']:
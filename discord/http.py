@@ -25,10 +25,14 @@ DEALINGS IN THE SOFTWARE.
 from __future__ import annotations
 
 import asyncio
+import copy
 import logging
 import sys
+import time
+from contextvars import ContextVar
 from typing import (
     Any,
+    AsyncIterator,
     ClassVar,
     Coroutine,
     Dict,
@@ -53,14 +57,22 @@ import aiohttp
 
 from .errors import HTTPException, RateLimited, Forbidden, NotFound, LoginFailure, DiscordServerError, GatewayNotFound
 from .gateway import DiscordClientWebSocketResponse
+from .ratelimits import RateLimitBackend, _PriorityLimiter
+from .response_cache import ResponseCache
+from .asset_cache import AssetCache
+from .metrics import HTTPMetrics
 from .file import File
 from .mentions import AllowedMentions
 from . import __version__, utils
 from .utils import MISSING
 from .flags import MessageFlags
+from .enums import RequestPriority
 
 _log = logging.getLogger(__name__)
 
+# The priority of requests that don't pass one explicitly, see Client.request_priority
+_request_priority: ContextVar[RequestPriority] = ContextVar('_request_priority', default=RequestPriority.normal)
+
 if TYPE_CHECKING:
     from typing_extensions import Self
 
@@ -360,24 +372,34 @@ class Ratelimit:
         'limit',
         'remaining',
         'outgoing',
+        'key',
         'reset_after',
         'expires',
         'dirty',
         '_last_request',
         '_max_ratelimit_timeout',
+        '_backend',
         '_loop',
         '_pending_requests',
         '_sleeping',
     )
 
-    def __init__(self, max_ratelimit_timeout: Optional[float]) -> None:
+    def __init__(
+        self,
+        max_ratelimit_timeout: Optional[float],
+        *,
+        key: str = '',
+        backend: Optional[RateLimitBackend] = None,
+    ) -> None:
         self.limit: int = 1
         self.remaining: int = self.limit
         self.outgoing: int = 0
         self.reset_after: float = 0.0
         self.expires: Optional[float] = None
         self.dirty: bool = False
+        self.key: str = key
         self._max_ratelimit_timeout: Optional[float] = max_ratelimit_timeout
+        self._backend: Optional[RateLimitBackend] = backend
         self._loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
         self._pending_requests: deque[asyncio.Future[Any]] = deque()
         # Only a single rate limit object should be sleeping at a time.
@@ -452,9 +474,11 @@ class Ratelimit:
     def is_expired(self) -> bool:
         return self.expires is not None and self._loop.time() > self.expires
 
+    def is_idle(self) -> bool:
+        return self._loop.time() - self._last_request >= 300
+
     def is_inactive(self) -> bool:
-        delta = self._loop.time() - self._last_request
-        return delta >= 300 and self.outgoing == 0 and len(self._pending_requests) == 0
+        return self.is_idle() and self.outgoing == 0 and len(self._pending_requests) == 0
 
     async def acquire(self) -> None:
         self._last_request = self._loop.time()
@@ -486,6 +510,28 @@ class Ratelimit:
         self.remaining -= 1
         self.outgoing += 1
 
+        if self._backend is not None:
+            try:
+                await self._acquire_shared(self._backend)
+            except:
+                # The request is not going to be sent so give the token back
+                self.remaining += 1
+                self.outgoing -= 1
+                raise
+
+    async def _acquire_shared(self, backend: RateLimitBackend) -> None:
+        # Other processes may be using the same bucket, wait until the backend allows it
+        while True:
+            delay = await backend.acquire(self.key)
+            if delay <= 0:
+                return
+
+            if self._max_ratelimit_timeout is not None and delay > self._max_ratelimit_timeout:
+                raise RateLimited(delay)
+
+            _log.debug('Rate limit bucket %s is exhausted by another process. Retrying in %.2f seconds.', self.key, delay)
+            await asyncio.sleep(delay)
+
     async def __aenter__(self) -> Self:
         await self.acquire()
         return self
@@ -507,6 +553,86 @@ class Ratelimit:
                 self._wake(tokens, exception=exception)
 
 
+class _RequestScheduler(_PriorityLimiter):
+    # Requests waiting for the global budget are released by priority, most urgent first.
+    # Interaction responses are exempt from Discord's global rate limit so they never wait.
+
+    def __init__(self, rate: Optional[int], bulk_concurrency: Optional[int]) -> None:
+        super().__init__()
+        self.rate: Optional[int] = rate
+        self.remaining: int = rate or 0
+        self.window: float = 0.0
+        self.bulk_concurrency: Optional[int] = bulk_concurrency
+        self._bulk: Optional[asyncio.Semaphore] = None
+
+    def get_delay(self) -> float:
+        if self.rate is None:
+            return 0.0
+
+        current = asyncio.get_running_loop().time()
+        if current >= self.window + 1.0:
+            self.window = current
+            self.remaining = self.rate
+
+        if self.remaining == 0:
+            return self.window + 1.0 - current
+
+        self.remaining -= 1
+        return 0.0
+
+    async def acquire(self, priority: RequestPriority) -> None:
+        # Bulk requests are capped so that they cannot take every connection
+        if priority is RequestPriority.bulk and self.bulk_concurrency:
+            if self._bulk is None:
+                self._bulk = asyncio.Semaphore(self.bulk_concurrency)
+            await self._bulk.acquire()
+
+    def release(self, priority: RequestPriority) -> None:
+        if priority is RequestPriority.bulk and self._bulk is not None:
+            self._bulk.release()
+
+    async def block(self, priority: RequestPriority) -> None:
+        if priority is not RequestPriority.interaction:
+            await self._wait(priority.value)
+
+
+class _RequestTimings:
+    # Measurements of a request for HTTPMetrics, also passed to aiohttp's tracing
+    # as the trace_request_ctx to measure how long getting a connection took.
+
+    __slots__ = ('bucket', 'status', 'retries', 'blocked', 'connect', '_connect_start')
+
+    def __init__(self) -> None:
+        self.bucket: Optional[str] = None
+        self.status: Optional[int] = None
+        self.retries: int = 0
+        self.blocked: float = 0.0
+        self.connect: float = 0.0
+        self._connect_start: float = 0.0
+
+
+async def _on_connection_start(session: aiohttp.ClientSession, context: Any, params: Any) -> None:
+    timings = context.trace_request_ctx
+    if isinstance(timings, _RequestTimings):
+        timings._connect_start = time.perf_counter()
+
+
+async def _on_connection_end(session: aiohttp.ClientSession, context: Any, params: Any) -> None:
+    timings = context.trace_request_ctx
+    if isinstance(timings, _RequestTimings):
+        timings.connect += time.perf_counter() - timings._connect_start
+
+
+def _metrics_trace_config() -> aiohttp.TraceConfig:
+    # Waiting for a free connection in the pool and opening a new one happen one after the other
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_queued_start.append(_on_connection_start)
+    trace.on_connection_queued_end.append(_on_connection_end)
+    trace.on_connection_create_start.append(_on_connection_start)
+    trace.on_connection_create_end.append(_on_connection_end)
+    return trace
+
+
 # For some reason, the Discord voice websocket expects this header to be
 # completely lowercase while aiohttp respects spec and does it as case-insensitive
 aiohttp.hdrs.WEBSOCKET = 'websocket'  # type: ignore
@@ -525,20 +651,30 @@ class HTTPClient:
         unsync_clock: bool = True,
         http_trace: Optional[aiohttp.TraceConfig] = None,
         max_ratelimit_timeout: Optional[float] = None,
+        ratelimit_backend: Optional[RateLimitBackend] = None,
+        coalesce_get_requests: bool = False,
+        response_cache: Optional[ResponseCache] = None,
+        global_request_rate: Optional[int] = None,
+        bulk_request_concurrency: Optional[int] = 4,
+        asset_cache: Optional[AssetCache] = None,
+        metrics: Optional[HTTPMetrics] = None,
     ) -> None:
         self.loop: asyncio.AbstractEventLoop = loop
         self.connector: aiohttp.BaseConnector = connector or MISSING
         self.__session: aiohttp.ClientSession = MISSING  # filled in static_login
-        # Route key -> Bucket hash
-        self._bucket_hashes: Dict[str, str] = {}
-        # Bucket Hash + Major Parameters -> Rate limit
-        # or
-        # Route key + Major Parameters -> Rate limit
-        # When the key is the latter, it is used for temporary
-        # one shot requests that don't have a bucket hash
-        # When this reaches 256 elements, it will try to evict based off of expiry
-        self._buckets: Dict[str, Ratelimit] = {}
-        self._global_over: asyncio.Event = MISSING
+        # Holds the bucket hashes, the rate limits and the global rate limit
+        self.ratelimit_backend: RateLimitBackend = ratelimit_backend or RateLimitBackend()
+        self.coalesce_get_requests: bool = coalesce_get_requests
+        self.response_cache: Optional[ResponseCache] = response_cache
+        self._scheduler: _RequestScheduler = _RequestScheduler(global_request_rate, bulk_request_concurrency)
+        # (URL, query parameters) -> Pending GET request shared by identical concurrent requests
+        self._inflight: Dict[Tuple[str, str], asyncio.Task[Any]] = {}
+        # Route key -> [Hits, Misses]
+        self._coalesce_counts: Dict[str, List[int]] = {}
+        self.asset_cache: Optional[AssetCache] = asset_cache
+        # Asset cache key -> Pending CDN download shared by concurrent downloads
+        self._cdn_inflight: Dict[str, asyncio.Task[bytes]] = {}
+        self.metrics: Optional[HTTPMetrics] = metrics
         self.token: Optional[str] = None
         self.proxy: Optional[str] = proxy
         self.proxy_auth: Optional[aiohttp.BasicAuth] = proxy_auth
@@ -573,26 +709,115 @@ class HTTPClient:
 
         return await self.__session.ws_connect(url, **kwargs)  # pyright: ignore[reportReturnType]
 
-    def _try_clear_expired_ratelimits(self) -> None:
-        if len(self._buckets) < 256:
-            return
+    def get_ratelimit(self, key: str) -> Ratelimit:
+        return self.ratelimit_backend.get_ratelimit(key, max_ratelimit_timeout=self.max_ratelimit_timeout)
+
+    async def request(
+        self,
+        route: Route,
+        *,
+        files: Optional[Sequence[File]] = None,
+        form: Optional[Iterable[Dict[str, Any]]] = None,
+        priority: Optional[RequestPriority] = None,
+        **kwargs: Any,
+    ) -> Any:
+        if priority is not None:
+            # Shared requests and retries started from here inherit the priority
+            token = _request_priority.set(priority)
+            try:
+                return await self.request(route, files=files, form=form, **kwargs)
+            finally:
+                _request_priority.reset(token)
+
+        cache = self.response_cache
+        if cache is not None and route.method != 'GET':
+            try:
+                return await self._request(route, files=files, form=form, **kwargs)
+            finally:
+                cache._invalidate_modified(route)
 
-        keys = [key for key, bucket in self._buckets.items() if bucket.is_inactive()]
-        for key in keys:
-            del self._buckets[key]
+        # Only requests without a body or headers of their own can be shared
+        if route.method != 'GET' or files or form or not kwargs.keys() <= {'params'}:
+            return await self._request(route, files=files, form=form, **kwargs)
 
-    def get_ratelimit(self, key: str) -> Ratelimit:
+        params = kwargs.get('params')
+        if cache is None or not cache.is_cached(route):
+            if self.coalesce_get_requests:
+                return await self._coalesced_request(route, params)
+            return await self._request(route, **kwargs)
+
+        data = cache.get(route, params)
+        if data is not None:
+            return data
+
+        generation = cache._begin(route)
+        try:
+            if self.coalesce_get_requests:
+                data = await self._coalesced_request(route, params)
+            else:
+                data = await self._request(route, **kwargs)
+        finally:
+            cacheable = cache._finish(route, generation)
+        if cacheable:
+            cache.set(route, params, data)
+        return data
+
+    async def _coalesced_request(self, route: Route, params: Optional[Dict[str, Any]]) -> Any:
+        key = (route.url, '' if not params else repr(sorted(params.items())))
+        counts = self._coalesce_counts.setdefault(route.key, [0, 0])
         try:
-            value = self._buckets[key]
+            task = self._inflight[key]
         except KeyError:
-            self._buckets[key] = value = Ratelimit(self.max_ratelimit_timeout)
-            self._try_clear_expired_ratelimits()
-        return value
+            counts[1] += 1
+            kwargs = {} if params is None else {'params': params}
+            task = asyncio.create_task(self._request(route, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            counts[0] += 1
+
+        # Cancelling one of the waiters must not cancel the request for the others
+        data = await asyncio.shield(task)
+        # Models may mutate the data they are created from so each waiter gets its own copy,
+        # including the one that sent the request since it may resume before the others
+        return copy.deepcopy(data)
+
+    async def _request(self, route: Route, **kwargs: Any) -> Any:
+        priority = _request_priority.get()
+        metrics = self.metrics
+        if metrics is None:
+            await self._scheduler.acquire(priority)
+            try:
+                return await self._send(route, priority=priority, **kwargs)
+            finally:
+                self._scheduler.release(priority)
 
-    async def request(
+        timings = _RequestTimings()
+        start = time.perf_counter()
+        try:
+            await self._scheduler.acquire(priority)
+            try:
+                timings.blocked = time.perf_counter() - start
+                return await self._send(route, priority=priority, metrics=metrics, timings=timings, **kwargs)
+            finally:
+                self._scheduler.release(priority)
+        finally:
+            metrics.on_request(
+                route.key,
+                timings.bucket,
+                timings.status,
+                retries=timings.retries,
+                blocked=timings.blocked,
+                elapsed=time.perf_counter() - start,
+            )
+
+    async def _send(
         self,
         route: Route,
         *,
+        priority: RequestPriority,
+        metrics: Optional[HTTPMetrics] = None,
+        timings: Optional[_RequestTimings] = None,
         files: Optional[Sequence[File]] = None,
         form: Optional[Iterable[Dict[str, Any]]] = None,
         **kwargs: Any,
@@ -600,16 +825,18 @@ class HTTPClient:
         method = route.method
         url = route.url
         route_key = route.key
+        ratelimits = self.ratelimit_backend
 
-        bucket_hash = None
-        try:
-            bucket_hash = self._bucket_hashes[route_key]
-        except KeyError:
+        bucket_hash = await ratelimits.get_bucket_hash(route_key)
+        if bucket_hash is None:
             key = f'{route_key}:{route.major_parameters}'
         else:
             key = f'{bucket_hash}:{route.major_parameters}'
 
         ratelimit = self.get_ratelimit(key)
+        if timings is not None:
+            timings.bucket = bucket_hash
+            kwargs['trace_request_ctx'] = timings
 
         # header creation
         headers: Dict[str, str] = {
@@ -639,14 +866,26 @@ class HTTPClient:
         if self.proxy_auth is not None:
             kwargs['proxy_auth'] = self.proxy_auth
 
-        if not self._global_over.is_set():
-            # wait until the global lock is complete
-            await self._global_over.wait()
+        # wait until the global lock is complete
+        start = time.perf_counter()
+        await ratelimits.wait_global()
 
         response: Optional[aiohttp.ClientResponse] = None
         data: Optional[Union[Dict[str, Any], str]] = None
         async with ratelimit:
+            if timings is not None:
+                timings.blocked += time.perf_counter() - start
+
             for tries in range(5):
+                # Wait for the global budget, more urgent requests go first
+                start = time.perf_counter()
+                await self._scheduler.block(priority)
+                if timings is not None:
+                    timings.retries = tries
+                    timings.connect = 0.0
+                    timings.blocked += time.perf_counter() - start
+                    start = time.perf_counter()
+
                 if files:
                     for f in files:
                         f.reset(seek=tries)
@@ -670,6 +909,17 @@ class HTTPClient:
                         # I am unsure if X-Ratelimit-Bucket is always available
                         # However, X-Ratelimit-Remaining has been a consistent cornerstone that worked
                         has_ratelimit_headers = 'X-Ratelimit-Remaining' in response.headers
+                        if timings is not None:
+                            timings.status = response.status
+                            timings.bucket = discord_hash or bucket_hash
+                            if metrics is not None:
+                                metrics.on_response(
+                                    route_key,
+                                    timings.bucket,
+                                    response.status,
+                                    connect_time=timings.connect,
+                                    response_time=time.perf_counter() - start - timings.connect,
+                                )
                         if discord_hash is not None:
                             # If the hash Discord has provided is somehow different from our current hash something changed
                             if bucket_hash != discord_hash:
@@ -687,18 +937,24 @@ class HTTPClient:
                                     fmt = 'A route (%s) has changed hashes: %s -> %s.'
                                     _log.debug(fmt, route_key, bucket_hash, discord_hash)
 
-                                    self._bucket_hashes[route_key] = discord_hash
-                                    self._buckets[f'{discord_hash}:{route.major_parameters}'] = ratelimit
-                                    self._buckets.pop(key, None)
-                                elif route_key not in self._bucket_hashes:
+                                    await ratelimits.set_bucket_hash(route_key, discord_hash)
+                                    ratelimits.set_ratelimit(f'{discord_hash}:{route.major_parameters}', ratelimit)
+                                    ratelimits.remove_ratelimit(key)
+                                elif await ratelimits.get_bucket_hash(route_key) is None:
                                     fmt = '%s has found its initial rate limit bucket hash (%s).'
                                     _log.debug(fmt, route_key, discord_hash)
-                                    self._bucket_hashes[route_key] = discord_hash
-                                    self._buckets[f'{discord_hash}:{route.major_parameters}'] = ratelimit
+                                    await ratelimits.set_bucket_hash(route_key, discord_hash)
+                                    ratelimits.set_ratelimit(f'{discord_hash}:{route.major_parameters}', ratelimit)
 
                         if has_ratelimit_headers:
                             if response.status != 429:
                                 ratelimit.update(response, use_clock=self.use_clock)
+                                await ratelimits.update(
+                                    ratelimit.key,
+                                    limit=ratelimit.limit,
+                                    remaining=ratelimit.remaining,
+                                    reset_after=ratelimit.reset_after,
+                                )
                                 if ratelimit.remaining == 0:
                                     _log.debug(
                                         'A rate limit bucket (%s) has been exhausted. Pre-emptively rate limiting...',
@@ -714,6 +970,8 @@ class HTTPClient:
                         if response.status == 429:
                             if not response.headers.get('Via') or isinstance(data, str):
                                 # Banned by Cloudflare more than likely.
+                                if metrics is not None and timings is not None:
+                                    metrics.on_ratelimited(route_key, timings.bucket, 'cloudflare', None)
                                 raise HTTPException(response, data)
 
                             if ratelimit.remaining > 0:
@@ -730,6 +988,9 @@ class HTTPClient:
                                 )
 
                             retry_after: float = data['retry_after']
+                            if metrics is not None and timings is not None:
+                                scope = 'global' if data.get('global', False) else 'bucket'
+                                metrics.on_ratelimited(route_key, timings.bucket, scope, retry_after)
                             if self.max_ratelimit_timeout and retry_after > self.max_ratelimit_timeout:
                                 _log.warning(
                                     'We are being rate limited. %s %s responded with 429. Timeout of %.2f was too long, erroring instead.',
@@ -752,17 +1013,17 @@ class HTTPClient:
                             is_global = data.get('global', False)
                             if is_global:
                                 _log.warning('Global rate limit has been hit. Retrying in %.2f seconds.', retry_after)
-                                self._global_over.clear()
+                                # the backend releases the global lock once the global rate limit has passed
+                                await ratelimits.set_global(retry_after)
+                            else:
+                                # let other processes sharing the bucket know it is exhausted
+                                await ratelimits.update(
+                                    ratelimit.key, limit=ratelimit.limit, remaining=0, reset_after=retry_after
+                                )
 
                             await asyncio.sleep(retry_after)
                             _log.debug('Done sleeping for the rate limit. Retrying...')
 
-                            # release the global lock now that the
-                            # global rate limit has passed
-                            if is_global:
-                                self._global_over.set()
-                                _log.debug('Global rate limit is now over.')
-
                             continue
 
                         # we've received a 500, 502, 504, or 524, unconditional retry
@@ -798,6 +1059,32 @@ class HTTPClient:
             raise RuntimeError('Unreachable code in HTTP handling')
 
     async def get_from_cdn(self, url: str) -> bytes:
+        cache = self.asset_cache
+        if cache is None:
+            return await self._get_from_cdn(url)
+
+        key = cache.key(url)
+        task = self._cdn_inflight.get(key)
+        if task is None:
+            data = await cache.get(url)
+            if data is not None:
+                return data
+
+            task = self._cdn_inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._cache_from_cdn(cache, url))
+                self._cdn_inflight[key] = task
+                task.add_done_callback(lambda _: self._cdn_inflight.pop(key, None))
+
+        # Cancelling one of the waiters must not cancel the download for the others
+        return await asyncio.shield(task)
+
+    async def _cache_from_cdn(self, cache: AssetCache, url: str) -> bytes:
+        data = await self._get_from_cdn(url)
+        await cache.set(url, data)
+        return data
+
+    async def _get_from_cdn(self, url: str) -> bytes:
         kwargs = {}
 
         # Proxy support
@@ -818,11 +1105,75 @@ class HTTPClient:
 
         raise RuntimeError('Unreachable')
 
+    async def stream_from_cdn(self, url: str, *, chunk_size: int = 65536, offset: int = 0) -> AsyncIterator[bytes]:
+        if self.asset_cache is not None:
+            data = await self.asset_cache.get(url)
+            if data is not None:
+                for start in range(offset, len(data), chunk_size):
+                    yield data[start : start + chunk_size]
+                return
+
+        kwargs: Dict[str, Any] = {}
+
+        # Proxy support
+        if self.proxy is not None:
+            kwargs['proxy'] = self.proxy
+        if self.proxy_auth is not None:
+            kwargs['proxy_auth'] = self.proxy_auth
+
+        received = offset
+        tries = 0
+        while True:
+            headers = {'Range': f'bytes={received}-'} if received else {}
+            start = received
+            try:
+                async with self.__session.get(url, headers=headers, **kwargs) as resp:
+                    if resp.status == 206:
+                        skip = 0
+                    elif resp.status == 200:
+                        # The range was ignored so the part we already have is sent again
+                        skip = received
+                    elif resp.status == 416 and received:
+                        # There is nothing past the requested offset
+                        return
+                    elif resp.status == 404:
+                        raise NotFound(resp, 'asset not found')
+                    elif resp.status == 403:
+                        raise Forbidden(resp, 'cannot retrieve asset')
+                    else:
+                        raise HTTPException(resp, 'failed to get asset')
+
+                    async for chunk in resp.content.iter_chunked(chunk_size):
+                        if skip:
+                            if len(chunk) <= skip:
+                                skip -= len(chunk)
+                                continue
+                            chunk = chunk[skip:]
+                            skip = 0
+
+                        received += len(chunk)
+                        yield chunk
+                    return
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # A connection that made progress is resumed right away,
+                # one that keeps failing is given up on after a few tries.
+                if received > start:
+                    tries = 0
+                    _log.debug('Download of %s dropped after %d bytes, resuming.', url, received)
+                    continue
+
+                if tries >= 4:
+                    raise
+                _log.debug('Download of %s failed (%s), retrying in %d seconds.', url, e, 1 + tries * 2)
+                await asyncio.sleep(1 + tries * 2)
+                tries += 1
+
     # state management
 
     async def close(self) -> None:
         if self.__session:
             await self.__session.close()
+        await self.ratelimit_backend.close()
 
     # login management
 
@@ -831,14 +1182,17 @@ class HTTPClient:
         if self.connector is MISSING:
             self.connector = aiohttp.TCPConnector(limit=0)
 
+        trace_configs = [] if self.http_trace is None else [self.http_trace]
+        if self.metrics is not None:
+            trace_configs.append(_metrics_trace_config())
+
         self.__session = aiohttp.ClientSession(
             connector=self.connector,
             ws_response_class=DiscordClientWebSocketResponse,
-            trace_configs=None if self.http_trace is None else [self.http_trace],
+            trace_configs=trace_configs or None,
             cookie_jar=aiohttp.DummyCookieJar(),
         )
-        self._global_over = asyncio.Event()
-        self._global_over.set()
+        await self.ratelimit_backend.start()
 
         old_token = self.token
         self.token = token
@@ -38,6 +38,7 @@ from typing import (
     List,
     Optional,
     Any,
+    AsyncIterator,
     Callable,
     Tuple,
     ClassVar,
@@ -56,7 +57,7 @@ from .components import _component_factory
 from .embeds import Embed
 from .member import Member
 from .flags import MessageFlags, AttachmentFlags
-from .file import File
+from .file import File, _save, _spool
 from .utils import escape_mentions, MISSING, deprecated
 from .http import handle_message_parameters
 from .guild import Guild
@@ -277,6 +278,11 @@ class Attachment(Hashable):
 
         Saves this attachment into a file-like object.
 
+        .. versionchanged:: 2.8
+
+            The attachment is written in chunks as it is downloaded
+            instead of being read into memory first.
+
         Parameters
         -----------
         fp: Union[:class:`io.BufferedIOBase`, :class:`os.PathLike`]
@@ -306,15 +312,53 @@ class Attachment(Hashable):
         :class:`int`
             The number of bytes written.
         """
-        data = await self.read(use_cached=use_cached)
-        if isinstance(fp, io.BufferedIOBase):
-            written = fp.write(data)
-            if seek_begin:
-                fp.seek(0)
-            return written
-        else:
-            with open(fp, 'wb') as f:
-                return f.write(data)
+        return await _save(self.stream(use_cached=use_cached), fp, seek_begin=seek_begin)
+
+    def stream(self, *, use_cached: bool = False, chunk_size: int = 65536, offset: int = 0) -> AsyncIterator[bytes]:
+        """Returns an :term:`asynchronous iterator` over the content of this attachment.
+
+        The attachment is downloaded in chunks of at most ``chunk_size`` bytes so
+        it never has to be held in memory as a whole. If the connection drops
+        part way through, the download is resumed where it stopped using a
+        ranged request.
+
+        .. versionadded:: 2.8
+
+        Examples
+        ---------
+
+        Usage ::
+
+            async for chunk in attachment.stream():
+                digest.update(chunk)
+
+        Parameters
+        -----------
+        use_cached: :class:`bool`
+            Whether to use :attr:`proxy_url` rather than :attr:`url` when downloading
+            the attachment. See :meth:`read` for more information.
+        chunk_size: :class:`int`
+            The maximum number of bytes to yield at a time.
+        offset: :class:`int`
+            The number of bytes to skip at the start of the attachment. This can
+            be used to resume a download that was interrupted earlier.
+
+        Raises
+        ------
+        HTTPException
+            Downloading the attachment failed.
+        Forbidden
+            You do not have permissions to access this attachment
+        NotFound
+            The attachment was deleted.
+
+        Yields
+        -------
+        :class:`bytes`
+            The next chunk of the attachment.
+        """
+        url = self.proxy_url if use_cached else self.url
+        return self._http.stream_from_cdn(url, chunk_size=chunk_size, offset=offset)
 
     async def read(self, *, use_cached: bool = False) -> bytes:
         """|coro|
@@ -366,6 +410,10 @@ class Attachment(Hashable):
 
         .. versionadded:: 1.3
 
+        .. versionchanged:: 2.8
+
+            Large attachments are kept in a temporary file rather than in memory.
+
         Parameters
         -----------
         filename: Optional[:class:`str`]
@@ -407,10 +455,11 @@ class Attachment(Hashable):
             The attachment as a file suitable for sending.
         """
 
-        data = await self.read(use_cached=use_cached)
         file_filename = filename if filename is not MISSING else self.filename
         file_description = description if description is not MISSING else self.description
-        return File(io.BytesIO(data), filename=file_filename, description=file_description, spoiler=spoiler)
+        return await _spool(
+            self.stream(use_cached=use_cached), filename=file_filename, description=file_description, spoiler=spoiler
+        )
 
     def to_dict(self) -> AttachmentPayload:
         result: AttachmentPayload = {
@@ -2469,6 +2518,8 @@ class Message(PartialMessage, Hashable):
         except AttributeError:
             # It's a user here
             self.author = Member._from_message(message=self, data=member)
+        else:
+            self.guild._store_member(author)  # type: ignore # Only guild messages have a member
 
     def _handle_mentions(self, mentions: List[UserWithMemberPayload]) -> None:
         self.mentions = r = []
@@ -0,0 +1,387 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import bisect
+import copy
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+__all__ = (
+    'HTTPMetrics',
+    'HTTPMetricsCollector',
+    'RouteMetrics',
+    'LatencyHistogram',
+)
+
+# Upper bounds of the latency histogram buckets in seconds
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class HTTPMetrics:
+    """The interface for receiving measurements of the REST requests sent by a :class:`Client`.
+
+    Every method does nothing by default. Subclasses override the ones they need,
+    for example to forward the measurements to a metrics exporter. The methods are
+    called from the event loop and must not block. See :class:`HTTPMetricsCollector`
+    for the built-in implementation.
+
+    Routes are identified by their :attr:`Route.key <discord.http.Route.key>`, such as
+    ``POST /channels/{channel_id}/messages``, and buckets by the rate limit bucket hash
+    Discord sent for the route, or ``None`` if it is not known yet.
+
+    .. versionadded:: 2.8
+    """
+
+    def on_response(
+        self,
+        route: str,
+        bucket: Optional[str],
+        status: int,
+        *,
+        connect_time: float,
+        response_time: float,
+    ) -> None:
+        """Called for every response received, including the ones that are retried.
+
+        Parameters
+        -----------
+        route: :class:`str`
+            The route of the request.
+        bucket: Optional[:class:`str`]
+            The rate limit bucket of the route.
+        status: :class:`int`
+            The status code of the response.
+        connect_time: :class:`float`
+            The number of seconds spent waiting for a connection from the pool
+            and opening it.
+        response_time: :class:`float`
+            The number of seconds between sending the request and receiving the
+            response, excluding ``connect_time``.
+        """
+        pass
+
+    def on_ratelimited(
+        self,
+        route: str,
+        bucket: Optional[str],
+        scope: Literal['global', 'bucket', 'cloudflare'],
+        retry_after: Optional[float],
+    ) -> None:
+        """Called for every 429 response.
+
+        Parameters
+        -----------
+        route: :class:`str`
+            The route of the request.
+        bucket: Optional[:class:`str`]
+            The rate limit bucket of the route.
+        scope: :class:`str`
+            ``global`` if the global rate limit was hit, ``bucket`` if the rate limit of
+            the route's bucket was hit and ``cloudflare`` if the request was blocked by
+            Cloudflare, usually because of too many invalid requests.
+        retry_after: Optional[:class:`float`]
+            The number of seconds to wait before retrying, ``None`` for ``cloudflare``.
+        """
+        pass
+
+    def on_request(
+        self,
+        route: str,
+        bucket: Optional[str],
+        status: Optional[int],
+        *,
+        retries: int,
+        blocked: float,
+        elapsed: float,
+    ) -> None:
+        """Called once a request is done, either successfully or by raising an exception.
+
+        Parameters
+        -----------
+        route: :class:`str`
+            The route of the request.
+        bucket: Optional[:class:`str`]
+            The rate limit bucket of the route.
+        status: Optional[:class:`int`]
+            The status code of the last response, ``None`` if no response was received.
+        retries: :class:`int`
+            The number of times the request was sent again after the first try.
+        blocked: :class:`float`
+            The number of seconds the request waited for the rate limits before it
+            could be sent, including the global rate limit and :attr:`Client.global_request_rate`.
+        elapsed: :class:`float`
+            The total number of seconds the request took.
+        """
+        pass
+
+
+class LatencyHistogram:
+    """A histogram of durations with fixed buckets.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    bounds: Tuple[:class:`float`, ...]
+        The inclusive upper bounds of the buckets in seconds, in ascending order.
+        Durations longer than the last bound are counted in an extra bucket.
+    counts: List[:class:`int`]
+        The number of durations in each bucket. It has one more element than :attr:`bounds`.
+    count: :class:`int`
+        The number of durations observed.
+    total: :class:`float`
+        The sum of the durations observed, in seconds.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'total')
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.bounds: Tuple[float, ...] = tuple(bounds)
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+
+    def __repr__(self) -> str:
+        return f'<LatencyHistogram count={self.count} mean={self.mean:.3f}>'
+
+    @property
+    def mean(self) -> float:
+        """:class:`float`: The mean duration in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def observe(self, value: float) -> None:
+        """Adds a duration to the histogram.
+
+        Parameters
+        -----------
+        value: :class:`float`
+            The duration in seconds.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile of the durations from the buckets.
+
+        Parameters
+        -----------
+        q: :class:`float`
+            The quantile between 0 and 1, e.g. ``0.99`` for the 99th percentile.
+
+        Returns
+        --------
+        :class:`float`
+            The upper bound of the bucket containing the quantile. ``inf`` if it is
+            in the extra bucket and ``0.0`` if nothing was observed.
+        """
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class RouteMetrics:
+    """The measurements of a route collected by :class:`HTTPMetricsCollector`.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    route: :class:`str`
+        The route, such as ``POST /channels/{channel_id}/messages``.
+    bucket: Optional[:class:`str`]
+        The rate limit bucket hash last seen for the route.
+    requests: :class:`int`
+        The number of requests made, regardless of how many times each was sent.
+    retries: :class:`int`
+        The number of times requests were sent again after their first try.
+    errors: :class:`int`
+        The number of requests that raised an exception.
+    responses: Dict[:class:`int`, :class:`int`]
+        The number of responses received by status code, including retried ones.
+    global_ratelimits: :class:`int`
+        The number of 429 responses caused by the global rate limit.
+    bucket_ratelimits: :class:`int`
+        The number of 429 responses caused by the bucket's rate limit.
+    cloudflare_ratelimits: :class:`int`
+        The number of 429 responses sent by Cloudflare.
+    blocked: :class:`float`
+        The total number of seconds requests waited for the rate limits before being sent.
+    connect_time: :class:`float`
+        The total number of seconds spent getting connections.
+    latency: :class:`LatencyHistogram`
+        The time between sending requests and receiving their responses.
+    """
+
+    __slots__ = (
+        'route',
+        'bucket',
+        'requests',
+        'retries',
+        'errors',
+        'responses',
+        'global_ratelimits',
+        'bucket_ratelimits',
+        'cloudflare_ratelimits',
+        'blocked',
+        'connect_time',
+        'latency',
+    )
+
+    def __init__(self, route: str, *, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.route: str = route
+        self.bucket: Optional[str] = None
+        self.requests: int = 0
+        self.retries: int = 0
+        self.errors: int = 0
+        self.responses: Dict[int, int] = {}
+        self.global_ratelimits: int = 0
+        self.bucket_ratelimits: int = 0
+        self.cloudflare_ratelimits: int = 0
+        self.blocked: float = 0.0
+        self.connect_time: float = 0.0
+        self.latency: LatencyHistogram = LatencyHistogram(latency_buckets)
+
+    def __repr__(self) -> str:
+        return f'<RouteMetrics route={self.route!r} bucket={self.bucket!r} requests={self.requests} retries={self.retries}>'
+
+    @property
+    def ratelimits(self) -> int:
+        """:class:`int`: The number of 429 responses received."""
+        return self.global_ratelimits + self.bucket_ratelimits + self.cloudflare_ratelimits
+
+
+class HTTPMetricsCollector(HTTPMetrics):
+    """An :class:`HTTPMetrics` that keeps counters and latency histograms for every route in memory.
+
+    Exporters can read the measurements with :meth:`snapshot`, for example periodically
+    from a task.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    latency_buckets: Sequence[:class:`float`]
+        The upper bounds of the latency histogram buckets in seconds. Defaults to
+        buckets from 25 milliseconds to 10 seconds.
+    """
+
+    def __init__(self, *, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self._latency_buckets: Tuple[float, ...] = tuple(sorted(latency_buckets))
+        self._routes: Dict[str, RouteMetrics] = {}
+
+    def __repr__(self) -> str:
+        return f'<HTTPMetricsCollector routes={len(self._routes)}>'
+
+    def _get(self, route: str, bucket: Optional[str]) -> RouteMetrics:
+        try:
+            metrics = self._routes[route]
+        except KeyError:
+            metrics = self._routes[route] = RouteMetrics(route, latency_buckets=self._latency_buckets)
+        if bucket is not None:
+            metrics.bucket = bucket
+        return metrics
+
+    def on_response(
+        self,
+        route: str,
+        bucket: Optional[str],
+        status: int,
+        *,
+        connect_time: float,
+        response_time: float,
+    ) -> None:
+        metrics = self._get(route, bucket)
+        metrics.responses[status] = metrics.responses.get(status, 0) + 1
+        metrics.connect_time += connect_time
+        metrics.latency.observe(response_time)
+
+    def on_ratelimited(
+        self,
+        route: str,
+        bucket: Optional[str],
+        scope: Literal['global', 'bucket', 'cloudflare'],
+        retry_after: Optional[float],
+    ) -> None:
+        metrics = self._get(route, bucket)
+        if scope == 'global':
+            metrics.global_ratelimits += 1
+        elif scope == 'bucket':
+            metrics.bucket_ratelimits += 1
+        else:
+            metrics.cloudflare_ratelimits += 1
+
+    def on_request(
+        self,
+        route: str,
+        bucket: Optional[str],
+        status: Optional[int],
+        *,
+        retries: int,
+        blocked: float,
+        elapsed: float,
+    ) -> None:
+        metrics = self._get(route, bucket)
+        metrics.requests += 1
+        metrics.retries += retries
+        metrics.blocked += blocked
+        if status is None or status >= 400:
+            metrics.errors += 1
+
+    def snapshot(self) -> Dict[str, RouteMetrics]:
+        """Returns a copy of the measurements collected so far.
+
+        Returns
+        --------
+        Dict[:class:`str`, :class:`RouteMetrics`]
+            The measurements of every route that was requested, keyed by route.
+        """
+        return copy.deepcopy(self._routes)
+
+    def by_bucket(self) -> Dict[Optional[str], List[RouteMetrics]]:
+        """Returns a copy of the measurements grouped by rate limit bucket.
+
+        Routes whose bucket is not known are grouped under ``None``.
+
+        Returns
+        --------
+        Dict[Optional[:class:`str`], List[:class:`RouteMetrics`]]
+            The measurements of the routes sharing each bucket.
+        """
+        ret: Dict[Optional[str], List[RouteMetrics]] = {}
+        for metrics in self.snapshot().values():
+            ret.setdefault(metrics.bucket, []).append(metrics)
+        return ret
+
+    def reset(self) -> None:
+        """Discards the measurements collected so far."""
+        self._routes.clear()
@@ -24,7 +24,7 @@ DEALINGS IN THE SOFTWARE.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, TYPE_CHECKING, Union
+from typing import Any, AsyncIterator, Dict, Optional, TYPE_CHECKING, Union
 import re
 
 from .asset import Asset, AssetMixin
@@ -283,3 +283,36 @@ class PartialEmoji(_EmojiTag, AssetMixin):
             raise ValueError('PartialEmoji is not a custom emoji')
 
         return await super().read()
+
+    def stream(self, *, chunk_size: int = 65536, offset: int = 0) -> AsyncIterator[bytes]:
+        """Returns an :term:`asynchronous iterator` over the content of this asset.
+
+        .. versionadded:: 2.8
+
+        Parameters
+        ----------
+        chunk_size: :class:`int`
+            The maximum number of bytes to yield at a time.
+        offset: :class:`int`
+            The number of bytes to skip at the start of the asset.
+
+        Raises
+        ------
+        DiscordException
+            There was no internal connection state.
+        HTTPException
+            Downloading the asset failed.
+        NotFound
+            The asset was deleted.
+        ValueError
+            The PartialEmoji is not a custom emoji.
+
+        Yields
+        -------
+        :class:`bytes`
+            The next chunk of the asset.
+        """
+        if self.is_unicode_emoji():
+            raise ValueError('PartialEmoji is not a custom emoji')
+
+        return super().stream(chunk_size=chunk_size, offset=offset)
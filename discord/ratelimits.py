@@ -0,0 +1,632 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from ._ipc import STREAM_LIMIT, Channel
+
+if TYPE_CHECKING:
+    from .http import Ratelimit
+
+__all__ = (
+    'RateLimitBackend',
+    'SharedRateLimitBackend',
+    'RateLimitBroker',
+)
+
+_log = logging.getLogger(__name__)
+
+# How long a route the broker has no bucket hash for is not asked about again
+_UNKNOWN_HASH_EXPIRY = 60.0
+
+
+class RateLimitBackend:
+    """Stores the REST rate limit state of a :class:`Client`.
+
+    The base class keeps everything in the memory of the current process, which
+    is what is used by default. Subclasses can share the rate limits between
+    processes that use the same bot token by overriding the coroutines that
+    coordinate requests, see :class:`SharedRateLimitBackend`.
+
+    Regardless of the backend, every process still tracks its own buckets to
+    queue its own requests, the backend only decides whether a request may be
+    sent across processes.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    snapshot: Optional[Union[:class:`str`, :class:`os.PathLike`]]
+        A JSON file to persist the learned bucket hashes and bucket limits in. It is
+        loaded when the client logs in and saved when it is closed, so that requests
+        made right after a restart can use the full bucket limits instead of being
+        sent one at a time until Discord's rate limit headers are seen. Defaults to ``None``.
+
+    Attributes
+    -----------
+    expired_buckets: :class:`int`
+        The number of process local buckets removed after being unused for 5 minutes.
+    """
+
+    def __init__(self, *, snapshot: Optional[Union[str, os.PathLike[str]]] = None) -> None:
+        self.snapshot: Optional[str] = None if snapshot is None else os.fspath(snapshot)
+        self.expired_buckets: int = 0
+        # Bucket Hash + Major Parameters -> Rate limit
+        # or
+        # Route key + Major Parameters -> Rate limit
+        # When the key is the latter, it is used for temporary
+        # one shot requests that don't have a bucket hash
+        # Least recently used first, so that the inactive buckets are always at the front
+        self._buckets: OrderedDict[str, Ratelimit] = OrderedDict()
+        # Route key -> Bucket hash
+        self._bucket_hashes: Dict[str, str] = {}
+        # Bucket hash or Route key -> Last seen limit
+        self._limits: Dict[str, int] = {}
+        self._global_over: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        """|coro|
+
+        Called when the HTTP client logs in, with a running event loop.
+        """
+        self._global_over = asyncio.Event()
+        self._global_over.set()
+        if self.snapshot is not None:
+            self.load_snapshot()
+
+    async def close(self) -> None:
+        """|coro|
+
+        Called when the HTTP client is closed.
+        """
+        if self.snapshot is not None:
+            self.save_snapshot()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the learned bucket hashes and bucket limits as a JSON serialisable dict.
+
+        Returns
+        --------
+        Dict[:class:`str`, Any]
+            The rate limit data.
+        """
+        return {
+            'bucket_hashes': dict(self._bucket_hashes),
+            'limits': dict(self._limits),
+            'saved_at': time.time(),
+        }
+
+    def update_from_dict(self, data: Dict[str, Any]) -> None:
+        """Adds the bucket hashes and bucket limits returned by :meth:`to_dict`.
+
+        Anything learned since the client started takes precedence.
+
+        Parameters
+        -----------
+        data: Dict[:class:`str`, Any]
+            The rate limit data.
+        """
+        for route_key, bucket_hash in data.get('bucket_hashes', {}).items():
+            self._bucket_hashes.setdefault(route_key, str(bucket_hash))
+        for key, limit in data.get('limits', {}).items():
+            self._limits.setdefault(key, int(limit))
+
+    def load_snapshot(self) -> None:
+        """Loads the :attr:`snapshot` file, if it exists."""
+        if self.snapshot is None:
+            return
+
+        try:
+            with open(self.snapshot, 'r', encoding='utf-8') as fp:
+                self.update_from_dict(json.load(fp))
+        except FileNotFoundError:
+            return
+        except (ValueError, TypeError, AttributeError):
+            _log.warning('Ignoring corrupted rate limit snapshot at %s.', self.snapshot)
+            return
+
+        _log.debug('Loaded %d bucket hashes from the rate limit snapshot.', len(self._bucket_hashes))
+
+    def save_snapshot(self) -> None:
+        """Saves the learned bucket hashes and bucket limits to the :attr:`snapshot` file."""
+        if self.snapshot is None:
+            return
+
+        tmp = f'{self.snapshot}.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as fp:
+                json.dump(self.to_dict(), fp)
+            os.replace(tmp, self.snapshot)
+        except OSError as exc:
+            _log.warning('Could not save the rate limit snapshot to %s: %s', self.snapshot, exc)
+
+    @property
+    def bucket_count(self) -> int:
+        """:class:`int`: The number of process local buckets currently kept."""
+        return len(self._buckets)
+
+    def _try_clear_expired_ratelimits(self) -> None:
+        # Only the front of the buckets has to be checked since they are ordered by last use.
+        # Buckets that are still in use despite their age are moved to the back, at most
+        # once per call so that this is bounded even if every bucket is busy.
+        buckets = self._buckets
+        for _ in range(len(buckets)):
+            key, bucket = next(iter(buckets.items()))
+            if bucket.is_inactive():
+                del buckets[key]
+                self.expired_buckets += 1
+            elif bucket.is_idle():
+                buckets.move_to_end(key)
+            else:
+                break
+
+    def get_ratelimit(self, key: str, *, max_ratelimit_timeout: Optional[float] = None) -> Ratelimit:
+        """Returns the process local bucket for the given rate limit key, creating it if needed."""
+        try:
+            value = self._buckets[key]
+            self._buckets.move_to_end(key)
+        except KeyError:
+            # Circular import
+            from .http import Ratelimit
+
+            self._buckets[key] = value = Ratelimit(max_ratelimit_timeout, key=key, backend=self)
+            limit = self._limits.get(key.partition(':')[0])
+            if limit is not None:
+                # The limit is known from a previous bucket or a snapshot so there is
+                # no need to wait for the first response before sending more requests
+                value.limit = value.remaining = limit
+                # The first response must not give back the requests sent meanwhile
+                value.dirty = True
+        self._try_clear_expired_ratelimits()
+        return value
+
+    def set_ratelimit(self, key: str, ratelimit: Ratelimit) -> None:
+        """Stores a bucket under a new rate limit key, e.g. once its bucket hash is known."""
+        self._buckets[key] = ratelimit
+        self._buckets.move_to_end(key)
+        ratelimit.key = key
+
+    def remove_ratelimit(self, key: str) -> None:
+        """Removes the bucket stored under the given rate limit key, if any."""
+        self._buckets.pop(key, None)
+
+    async def get_bucket_hash(self, route_key: str) -> Optional[str]:
+        """|coro|
+
+        Returns the bucket hash Discord sent for a route, if it is known.
+
+        Parameters
+        -----------
+        route_key: :class:`str`
+            The method and the unformatted path of the route, e.g. ``GET /channels/{channel_id}``.
+        """
+        return self._bucket_hashes.get(route_key)
+
+    async def set_bucket_hash(self, route_key: str, bucket_hash: str) -> None:
+        """|coro|
+
+        Stores the bucket hash Discord sent for a route.
+        """
+        self._bucket_hashes[route_key] = bucket_hash
+
+    async def acquire(self, key: str) -> float:
+        """|coro|
+
+        Asks whether a request for the given rate limit key may be sent, after the
+        process local bucket allowed it.
+
+        The base class always allows it.
+
+        Returns
+        --------
+        :class:`float`
+            ``0.0`` if the request may be sent, otherwise the number of seconds to wait
+            before asking again.
+        """
+        return 0.0
+
+    async def update(self, key: str, *, limit: int, remaining: int, reset_after: float) -> None:
+        """|coro|
+
+        Records the rate limit Discord reported for the given rate limit key.
+
+        The base class only remembers the limit since the process local bucket already
+        tracks the rest.
+        """
+        self._limits[key.partition(':')[0]] = limit
+
+    async def wait_global(self) -> None:
+        """|coro|
+
+        Waits until the global rate limit, if any, is over.
+        """
+        if self._global_over is not None and not self._global_over.is_set():
+            await self._global_over.wait()
+
+    async def set_global(self, retry_after: float) -> None:
+        """|coro|
+
+        Records that the global rate limit was hit and is over in ``retry_after`` seconds.
+        """
+        if self._global_over is None:
+            return
+
+        event = self._global_over
+        event.clear()
+        asyncio.get_running_loop().call_later(retry_after, event.set)
+
+
+class SharedRateLimitBackend(RateLimitBackend):
+    """A rate limit backend that shares the rate limits with other processes
+    through a :class:`RateLimitBroker`.
+
+    Every process using the same bot token, such as the clusters of a
+    :class:`ShardCluster` or separate worker processes, should use an instance
+    connected to the same broker so that they split the rate limits instead of
+    each assuming they own them.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    path: :class:`str`
+        The path of the broker's Unix socket.
+    timeout: :class:`float`
+        The number of seconds to wait for the broker to answer. If the broker is
+        unreachable, requests fall back to the process local rate limits.
+    snapshot: Optional[Union[:class:`str`, :class:`os.PathLike`]]
+        See :class:`RateLimitBackend`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        timeout: float = 5.0,
+        snapshot: Optional[Union[str, os.PathLike[str]]] = None,
+    ) -> None:
+        super().__init__(snapshot=snapshot)
+        self.path: str = path
+        self.timeout: float = timeout
+        self._channel: Optional[Channel] = None
+        self._reader_task: Optional[asyncio.Task[None]] = None
+        self._connecting: Optional[asyncio.Lock] = None
+        self._next_attempt: float = 0.0
+        # Route key -> When the broker may be asked for its bucket hash again
+        self._unknown_hashes: Dict[str, float] = {}
+
+    async def start(self) -> None:
+        await super().start()
+        await self._get_channel()
+
+    async def close(self) -> None:
+        await super().close()
+        channel = self._channel
+        self._channel = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if channel is not None:
+            channel.close()
+
+    async def _read_loop(self, channel: Channel) -> None:
+        try:
+            while True:
+                payload = await channel.read()
+                if payload is None:
+                    break
+                channel.resolve(payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if self._channel is channel:
+                _log.warning('Lost the connection to the rate limit broker at %s.', self.path)
+                self._channel = None
+                channel.close()
+
+    async def _get_channel(self) -> Optional[Channel]:
+        if self._channel is not None:
+            return self._channel
+
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._next_attempt:
+            return None
+
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+
+        async with self._connecting:
+            if self._channel is None:
+                try:
+                    reader, writer = await asyncio.open_unix_connection(self.path, limit=STREAM_LIMIT)
+                except OSError as exc:
+                    # Don't try again for every request while the broker is down
+                    self._next_attempt = loop.time() + self.timeout
+                    _log.warning('Could not connect to the rate limit broker at %s: %s', self.path, exc)
+                    return None
+
+                self._channel = channel = Channel(reader, writer)
+                self._reader_task = asyncio.create_task(self._read_loop(channel))
+        return self._channel
+
+    async def _request(self, op: str, data: Dict[str, Any], default: Any) -> Any:
+        channel = await self._get_channel()
+        if channel is None:
+            return default
+
+        try:
+            return await channel.request(op, data, timeout=self.timeout)
+        except Exception as exc:
+            _log.warning('Rate limit broker request %r failed: %s', op, exc)
+            return default
+
+    async def _notify(self, op: str, data: Dict[str, Any]) -> None:
+        channel = await self._get_channel()
+        if channel is not None:
+            channel.send(op, data)
+
+    async def get_bucket_hash(self, route_key: str) -> Optional[str]:
+        try:
+            return self._bucket_hashes[route_key]
+        except KeyError:
+            pass
+
+        # Routes without a bucket hash would otherwise ask the broker on every request
+        current = time.monotonic()
+        if self._unknown_hashes.get(route_key, 0.0) > current:
+            return None
+
+        bucket_hash = await self._request('get_hash', {'route': route_key}, None)
+        if bucket_hash is None:
+            self._unknown_hashes[route_key] = current + _UNKNOWN_HASH_EXPIRY
+        else:
+            self._bucket_hashes[route_key] = bucket_hash
+        return bucket_hash
+
+    async def set_bucket_hash(self, route_key: str, bucket_hash: str) -> None:
+        self._unknown_hashes.pop(route_key, None)
+        self._bucket_hashes[route_key] = bucket_hash
+        await self._notify('set_hash', {'route': route_key, 'hash': bucket_hash})
+
+    async def acquire(self, key: str) -> float:
+        return await self._request('acquire', {'key': key}, 0.0)
+
+    async def update(self, key: str, *, limit: int, remaining: int, reset_after: float) -> None:
+        await super().update(key, limit=limit, remaining=remaining, reset_after=reset_after)
+        await self._notify('update', {'key': key, 'limit': limit, 'remaining': remaining, 'reset_after': reset_after})
+
+    async def set_global(self, retry_after: float) -> None:
+        await super().set_global(retry_after)
+        await self._notify('set_global', {'retry_after': retry_after})
+
+
+class _Bucket:
+    __slots__ = ('limit', 'remaining', 'expires', 'period')
+
+    def __init__(self, limit: int, remaining: int, expires: float, period: float) -> None:
+        self.limit: int = limit
+        self.remaining: int = remaining
+        self.expires: float = expires
+        # The longest reset after seen, used to guess when a window started by this broker ends
+        self.period: float = period
+
+
+class RateLimitBroker:
+    """The server that :class:`SharedRateLimitBackend` instances connect to.
+
+    It tracks the remaining requests of every bucket as reported by Discord,
+    minus the requests granted since, along with the global rate limit. Run it
+    in the parent process of the processes sharing a bot token.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    path: :class:`str`
+        The path of the Unix socket to listen on.
+    global_limit: Optional[:class:`int`]
+        The number of requests per second allowed across every process, matching
+        Discord's global rate limit. ``None`` disables pre-emptively enforcing it.
+    """
+
+    def __init__(self, path: str, *, global_limit: Optional[int] = 50) -> None:
+        self.path: str = path
+        self.global_limit: Optional[int] = global_limit
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._channels: Dict[int, Channel] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._bucket_hashes: Dict[str, str] = {}
+        self._global_until: float = 0.0
+        self._global_window: float = 0.0
+        self._global_remaining: int = global_limit or 0
+
+    async def start(self) -> None:
+        """|coro|
+
+        Starts listening on the Unix socket.
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, self.path, limit=STREAM_LIMIT)
+
+    async def close(self) -> None:
+        """|coro|
+
+        Stops the server and closes every connection.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        for channel in self._channels.values():
+            channel.close()
+        self._channels.clear()
+
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        channel = Channel(reader, writer)
+        self._channels[id(channel)] = channel
+        try:
+            while True:
+                payload = await channel.read()
+                if payload is None:
+                    break
+
+                # Everything is answered synchronously so that concurrent acquires
+                # from different processes are serialised by the event loop
+                result = self._handle(payload['op'], payload['d'])
+                if payload['nonce'] is not None:
+                    channel.send('response', result, nonce=payload['nonce'])
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._channels.pop(id(channel), None)
+            channel.close()
+
+    def _handle(self, op: str, data: Dict[str, Any]) -> Any:
+        now = asyncio.get_running_loop().time()
+        if op == 'acquire':
+            return self._acquire(data['key'], now)
+        if op == 'update':
+            self._update(data['key'], data['limit'], data['remaining'], data['reset_after'], now)
+        elif op == 'set_global':
+            self._global_until = max(self._global_until, now + data['retry_after'])
+        elif op == 'get_hash':
+            return self._bucket_hashes.get(data['route'])
+        elif op == 'set_hash':
+            self._bucket_hashes[data['route']] = data['hash']
+        return None
+
+    def _acquire(self, key: str, now: float) -> float:
+        if self._global_until > now:
+            return self._global_until - now
+
+        if self.global_limit is not None:
+            if now >= self._global_window + 1.0:
+                self._global_window = now
+                self._global_remaining = self.global_limit
+            if self._global_remaining <= 0:
+                return self._global_window + 1.0 - now
+
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            if now >= bucket.expires:
+                # Discord starts the next window with the first request, which is this one
+                bucket.remaining = bucket.limit
+                bucket.expires = now + bucket.period
+            if bucket.remaining <= 0:
+                return bucket.expires - now
+            bucket.remaining -= 1
+
+        if self.global_limit is not None:
+            self._global_remaining -= 1
+        return 0.0
+
+    def _update(self, key: str, limit: int, remaining: int, reset_after: float, now: float) -> None:
+        expires = now + reset_after
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = _Bucket(limit, remaining, expires, reset_after)
+            return
+
+        bucket.limit = limit
+        bucket.period = max(bucket.period, reset_after)
+        if now >= bucket.expires:
+            # This is the first response of a new window, Discord's count is authoritative
+            bucket.remaining = remaining
+            bucket.expires = expires
+        else:
+            # Requests granted to other processes may not be counted by Discord yet
+            bucket.remaining = min(bucket.remaining, remaining)
+            bucket.expires = max(bucket.expires, expires)
+
+
+class _PriorityLimiter:
+    # The queue shared by the gateway send limit and the global REST request limit.
+    # Callers waiting for the rate limit are released by priority, lowest value first,
+    # and in the order they were queued within the same priority.
+    # Subclasses implement get_delay, which either takes a slot and returns 0 or
+    # returns how long to wait until one is free.
+
+    def __init__(self) -> None:
+        self._waiters: List[Tuple[int, int, asyncio.Future[None]]] = []
+        self._counter = itertools.count()
+        self._drain_task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def get_delay(self) -> float:
+        raise NotImplementedError
+
+    def _on_delay(self, delay: float) -> None:
+        pass
+
+    async def _wait(self, priority: int) -> bool:
+        # Returns whether the caller had to wait
+        if not self._waiters and not self.get_delay():
+            return False
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = loop.create_task(self._drain())
+
+        await future
+        return True
+
+    async def _drain(self) -> None:
+        waiters = self._waiters
+        while waiters:
+            future = waiters[0][2]
+            if future.done():
+                # cancelled while waiting
+                heapq.heappop(waiters)
+                continue
+
+            delta = self.get_delay()
+            if delta:
+                self._on_delay(delta)
+                await asyncio.sleep(delta)
+                continue
+
+            heapq.heappop(waiters)
+            future.set_result(None)
@@ -0,0 +1,397 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import os
+import struct
+import time
+import tracemalloc
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Type, Union
+
+from .gateway import DiscordWebSocket, ReconnectWebSocket
+from .state import AutoShardedConnectionState
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+    from typing_extensions import Self
+
+    from .client import Client
+
+__all__ = (
+    'GatewayFrame',
+    'GatewayRecorder',
+    'GatewayReplayer',
+    'ReplayStats',
+)
+
+# A recording is a gzip stream made of a magic header followed by records of
+# (timestamp, shard ID or -1, size) and the UTF-8 encoded frame itself.
+_MAGIC = b'DPYGW\x01'
+_RECORD = struct.Struct('>dhI')
+
+
+class GatewayFrame:
+    """Represents a single gateway frame of a recording.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    timestamp: :class:`float`
+        The UNIX timestamp of when the frame was received.
+    shard_id: Optional[:class:`int`]
+        The shard that received the frame, if any.
+    data: :class:`str`
+        The decompressed frame.
+    """
+
+    __slots__ = ('timestamp', 'shard_id', 'data')
+
+    def __init__(self, timestamp: float, shard_id: Optional[int], data: str) -> None:
+        self.timestamp: float = timestamp
+        self.shard_id: Optional[int] = shard_id
+        self.data: str = data
+
+    def __repr__(self) -> str:
+        return f'<GatewayFrame timestamp={self.timestamp} shard_id={self.shard_id} size={len(self.data)}>'
+
+
+class GatewayRecorder:
+    """Records the gateway traffic received by a :class:`Client` to a file.
+
+    Frames are written after decompression, exactly as they are handed to the
+    gateway parser, along with when they were received and the shard that
+    received them. The file is gzip compressed.
+
+    Pass an instance as the ``gateway_recorder`` parameter of :class:`Client`
+    and replay the file with :class:`GatewayReplayer`.
+
+    This can be used as a context manager to close the file.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    path: Union[:class:`str`, :class:`os.PathLike`]
+        The file to write the recording to. It is overwritten if it exists.
+    compresslevel: :class:`int`
+        The gzip compression level. Defaults to ``6``, lower values take less
+        time away from the event loop.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike[str]], *, compresslevel: int = 6) -> None:
+        self.path: Union[str, os.PathLike[str]] = path
+        self._file: Optional[gzip.GzipFile] = gzip.GzipFile(path, 'wb', compresslevel=compresslevel)
+        self._file.write(_MAGIC)
+        self.frames: int = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def is_closed(self) -> bool:
+        """:class:`bool`: Whether the recording has been closed."""
+        return self._file is None
+
+    def record(self, shard_id: Optional[int], data: str, /) -> None:
+        """Writes a frame to the recording.
+
+        This is called by the gateway for every frame received. Frames
+        recorded after the recorder is closed are ignored.
+
+        Parameters
+        -----------
+        shard_id: Optional[:class:`int`]
+            The shard that received the frame.
+        data: :class:`str`
+            The decompressed frame.
+        """
+        if self._file is None:
+            return
+
+        payload = data.encode('utf-8')
+        self._file.write(_RECORD.pack(time.time(), -1 if shard_id is None else shard_id, len(payload)))
+        self._file.write(payload)
+        self.frames += 1
+
+    def flush(self) -> None:
+        """Flushes the frames written so far to the file."""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Closes the recording."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ReplayStats:
+    """The results of a :meth:`GatewayReplayer.replay`.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    frames: :class:`int`
+        The number of frames replayed.
+    events: :class:`int`
+        The number of DISPATCH events replayed, including the ones without a parser
+        and the ones skipped by lazy dispatch.
+    elapsed: :class:`float`
+        The number of seconds the replay took.
+    parser_calls: Dict[:class:`str`, :class:`int`]
+        The number of times each gateway event was parsed, keyed by event name.
+    parser_time: Dict[:class:`str`, :class:`float`]
+        The total number of seconds spent in the parser of each gateway event, keyed by event name.
+    peak_memory: Optional[:class:`int`]
+        The peak size of the memory allocated during the replay, in bytes.
+        ``None`` if memory was not traced.
+    """
+
+    __slots__ = ('frames', 'events', 'elapsed', 'parser_calls', 'parser_time', 'peak_memory')
+
+    def __init__(self) -> None:
+        self.frames: int = 0
+        self.events: int = 0
+        self.elapsed: float = 0.0
+        self.parser_calls: Dict[str, int] = {}
+        self.parser_time: Dict[str, float] = {}
+        self.peak_memory: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f'<ReplayStats frames={self.frames} events={self.events} elapsed={self.elapsed:.3f}>'
+
+    @property
+    def events_per_second(self) -> float:
+        """:class:`float`: The number of DISPATCH events replayed per second."""
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+
+class _ReplaySocket:
+    # Stands in for the aiohttp websocket, everything sent is dropped
+
+    def __init__(self) -> None:
+        self.closed: bool = False
+
+    async def send_str(self, data: str, /) -> None:
+        pass
+
+    async def close(self, *, code: int = 1000, message: bytes = b'') -> bool:
+        self.closed = True
+        return True
+
+
+class GatewayReplayer:
+    """Replays a recording made by :class:`GatewayRecorder` into a :class:`Client`.
+
+    The frames go through the same gateway and :class:`ConnectionState` code as
+    live traffic, but without any network connection: anything the client sends
+    to the gateway is dropped. This makes it possible to benchmark the parsers
+    and event listeners reproducibly.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    path: Union[:class:`str`, :class:`os.PathLike`]
+        The recording to replay.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike[str]]) -> None:
+        self.path: Union[str, os.PathLike[str]] = path
+
+    def __iter__(self) -> Iterator[GatewayFrame]:
+        return self.frames()
+
+    def frames(self) -> Iterator[GatewayFrame]:
+        """Iterates over the frames of the recording.
+
+        Raises
+        -------
+        ValueError
+            The file is not a gateway recording.
+
+        Yields
+        -------
+        :class:`GatewayFrame`
+            A frame of the recording.
+        """
+        with gzip.GzipFile(self.path, 'rb') as fp:
+            if fp.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f'{self.path} is not a gateway recording')
+
+            while True:
+                header = fp.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    # a recording that wasn't closed properly may end with a partial record
+                    return
+
+                timestamp, shard_id, size = _RECORD.unpack(header)
+                payload = fp.read(size)
+                if len(payload) < size:
+                    return
+
+                yield GatewayFrame(timestamp, None if shard_id == -1 else shard_id, payload.decode('utf-8'))
+
+    def _get_websocket(self, client: Client, frame: GatewayFrame) -> DiscordWebSocket:
+        return DiscordWebSocket._from_socket(
+            client,
+            _ReplaySocket(),  # type: ignore # Only the parts used by the gateway are implemented
+            initial=False,
+            gateway=DiscordWebSocket.DEFAULT_GATEWAY,
+            shard_id=frame.shard_id,
+            session=None,
+            sequence=None,
+        )
+
+    def _time_parsers(
+        self, parsers: Dict[str, Callable[[Any], None]], stats: ReplayStats
+    ) -> Dict[str, Callable[[Any], None]]:
+        perf_counter = time.perf_counter
+
+        def wrap(event: str, parser: Callable[[Any], None]) -> Callable[[Any], None]:
+            stats.parser_calls[event] = 0
+            stats.parser_time[event] = 0.0
+
+            def timed(data: Any) -> None:
+                start = perf_counter()
+                try:
+                    parser(data)
+                finally:
+                    stats.parser_time[event] += perf_counter() - start
+                    stats.parser_calls[event] += 1
+
+            return timed
+
+        return {event: wrap(event, parser) for event, parser in parsers.items()}
+
+    async def replay(self, client: Client, *, speed: Optional[float] = None, trace_memory: bool = False) -> ReplayStats:
+        """|coro|
+
+        Replays the recording into the client.
+
+        The client does not need to be logged in. Any listener registered to the
+        client is called as usual. Since there is no connection, chunking guilds
+        at startup should be disabled for the guilds of the recording to become
+        available, unless the recording contains the chunks.
+
+        Parameters
+        -----------
+        client: :class:`Client`
+            The client to replay the recording into.
+        speed: Optional[:class:`float`]
+            How fast to replay the recording compared to when it was recorded,
+            e.g. ``1.0`` for the original speed. If ``None``, the frames are
+            replayed as fast as possible.
+        trace_memory: :class:`bool`
+            Whether to trace the peak memory allocated during the replay with
+            :mod:`tracemalloc`. This slows the replay down considerably.
+
+        Returns
+        --------
+        :class:`ReplayStats`
+            The statistics of the replay.
+        """
+        if not isinstance(client.loop, asyncio.AbstractEventLoop):
+            await client._async_setup_hook()
+
+        frames = list(self.frames())
+        state = client._connection
+        if isinstance(state, AutoShardedConnectionState) and not state.shard_ids:
+            shard_ids = sorted({frame.shard_id for frame in frames if frame.shard_id is not None})
+            state.shard_ids = shard_ids
+            if state.shard_count is None:
+                state.shard_count = max(shard_ids, default=0) + 1
+
+        stats = ReplayStats()
+        parsers = self._time_parsers(state.parsers, stats)
+        websockets: Dict[Optional[int], DiscordWebSocket] = {}
+
+        def get_websocket(guild_id: Optional[int] = None, *, shard_id: Optional[int] = None) -> DiscordWebSocket:
+            if shard_id is None and guild_id is not None and state.shard_count:
+                shard_id = (guild_id >> 22) % state.shard_count
+            return websockets.get(shard_id) or next(iter(websockets.values()))
+
+        def dispatch(event: str, /, *args: Any, **kwargs: Any) -> None:
+            # every DISPATCH frame is announced through socket_event_type, even when it is skipped
+            if event == 'socket_event_type':
+                stats.events += 1
+            client.dispatch(event, *args, **kwargs)
+
+        original_get_websocket = state._get_websocket
+        state._get_websocket = get_websocket
+
+        if trace_memory:
+            tracemalloc.start()
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            for frame in frames:
+                if speed is not None:
+                    delay = (frame.timestamp - frames[0].timestamp) / speed - (loop.time() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                try:
+                    ws = websockets[frame.shard_id]
+                except KeyError:
+                    ws = websockets[frame.shard_id] = self._get_websocket(client, frame)
+                    ws._discord_parsers = parsers
+                    ws._dispatch = dispatch
+
+                try:
+                    await ws.received_message(frame.data)
+                except ReconnectWebSocket:
+                    pass
+
+                stats.frames += 1
+                # let the listeners scheduled by the event run
+                await asyncio.sleep(0)
+
+            stats.elapsed = loop.time() - start
+        finally:
+            if trace_memory:
+                stats.peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            state._get_websocket = original_get_websocket
+            for ws in websockets.values():
+                if ws._keep_alive:
+                    ws._keep_alive.stop()
+                    ws._keep_alive = None
+
+        return stats
@@ -0,0 +1,286 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import copy
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from .http import Route
+
+__all__ = ('ResponseCache',)
+
+# Route key -> TTL in seconds
+DEFAULT_ROUTES: Dict[str, float] = {
+    'GET /users/{user_id}': 300.0,
+    'GET /guilds/{guild_id}/members/{user_id}': 60.0,
+    'GET /channels/{channel_id}': 300.0,
+    'GET /applications/{application_id}/commands': 600.0,
+    'GET /applications/{application_id}/commands/{command_id}': 600.0,
+    'GET /applications/{application_id}/guilds/{guild_id}/commands': 600.0,
+    'GET /applications/{application_id}/guilds/{guild_id}/commands/{command_id}': 600.0,
+    'GET /guilds/{guild_id}/emojis': 300.0,
+    'GET /guilds/{guild_id}/emojis/{emoji_id}': 300.0,
+}
+
+# Route path -> paths of the collections listing the resource, which change when it is modified.
+# Each collection's path must be a prefix of the resource's path.
+PARENT_ROUTES: Dict[str, Tuple[str, ...]] = {
+    '/applications/{application_id}/commands/{command_id}': ('/applications/{application_id}/commands',),
+    '/applications/{application_id}/guilds/{guild_id}/commands/{command_id}': (
+        '/applications/{application_id}/guilds/{guild_id}/commands',
+    ),
+    '/guilds/{guild_id}/emojis/{emoji_id}': ('/guilds/{guild_id}/emojis',),
+    '/guilds/{guild_id}/members/{user_id}': ('/guilds/{guild_id}/members',),
+}
+
+# Collections that a PUT replaces as a whole, e.g. bulk overwriting application commands
+_COLLECTIONS: Set[str] = {parent for parents in PARENT_ROUTES.values() for parent in parents}
+
+
+class _Entry:
+    __slots__ = ('url', 'expires', 'data')
+
+    def __init__(self, url: str, expires: float, data: Any) -> None:
+        self.url: str = url
+        self.expires: float = expires
+        self.data: Any = data
+
+
+class ResponseCache:
+    """A bounded cache of REST API responses for :class:`Client`.
+
+    Responses of the configured ``GET`` routes are kept for the route's TTL, so that
+    repeatedly fetching the same object, e.g. with :meth:`Guild.fetch_member` in a
+    converter, does not send a request every time. The least recently used response
+    is evicted once the cache is full.
+
+    Cached responses are invalidated when the library sends a request modifying the
+    same resource and when a gateway event reports a change to it, such as
+    :func:`on_member_update` or :func:`on_guild_channel_update`.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    routes: Optional[Mapping[:class:`str`, :class:`float`]]
+        A mapping of routes, such as ``GET /users/{user_id}``, to the number of seconds
+        their responses are cached for. Defaults to users, members, channels,
+        application commands and emojis.
+    max_size: :class:`int`
+        The maximum number of responses to keep. Defaults to 1024.
+
+    Attributes
+    -----------
+    routes: Dict[:class:`str`, :class:`float`]
+        The cached routes and their TTL. This can be modified to change the routes
+        that are cached.
+    max_size: :class:`int`
+        The maximum number of responses to keep.
+    hits: :class:`int`
+        The number of requests answered from the cache.
+    misses: :class:`int`
+        The number of requests to cached routes that were sent to Discord.
+    """
+
+    def __init__(self, *, routes: Optional[Mapping[str, float]] = None, max_size: int = 1024) -> None:
+        self.routes: Dict[str, float] = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        # (URL, query parameters) -> Entry, least recently used first
+        self._entries: OrderedDict[Tuple[str, str], _Entry] = OrderedDict()
+        # URL -> Keys of the entries for every query parameters
+        self._urls: Dict[str, Set[Tuple[str, str]]] = {}
+        # Incremented when a URL with requests in flight is invalidated
+        self._generation: int = 0
+        # URL -> Number of requests in flight
+        self._in_flight: Dict[str, int] = {}
+        # URL -> Generation it was last invalidated in, only kept while requests for it are in flight
+        self._invalidated: Dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        return f'<ResponseCache size={len(self)} max_size={self.max_size} hit_rate={self.hit_rate:.2f}>'
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """:class:`float`: The fraction of requests to cached routes that were answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def is_cached(self, route: Route) -> bool:
+        """Returns whether responses for the route are cached.
+
+        Parameters
+        -----------
+        route: :class:`~discord.http.Route`
+            The route to check.
+
+        Returns
+        --------
+        :class:`bool`
+            Whether the route's responses are cached.
+        """
+        return route.method == 'GET' and route.key in self.routes
+
+    def get(self, route: Route, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """Returns a copy of the cached response for a request, counting a hit or a miss.
+
+        Parameters
+        -----------
+        route: :class:`~discord.http.Route`
+            The requested route.
+        params: Optional[Dict[:class:`str`, Any]]
+            The query parameters of the request.
+
+        Returns
+        --------
+        Optional[Any]
+            The response data, or ``None`` if it is not cached or expired.
+        """
+        key = self._key(route, params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Models may mutate the data they are created from
+                return copy.deepcopy(entry.data)
+            self._remove(key)
+
+        self.misses += 1
+        return None
+
+    def set(self, route: Route, params: Optional[Dict[str, Any]], data: Any) -> None:
+        """Caches the response of a request for the route's TTL.
+
+        Parameters
+        -----------
+        route: :class:`~discord.http.Route`
+            The requested route.
+        params: Optional[Dict[:class:`str`, Any]]
+            The query parameters of the request.
+        data: Any
+            The response data. A copy of it is cached.
+        """
+        ttl = self.routes.get(route.key)
+        if not ttl or data is None:
+            return
+
+        key = self._key(route, params)
+        self._entries[key] = _Entry(route.url, time.monotonic() + ttl, copy.deepcopy(data))
+        self._entries.move_to_end(key)
+        self._urls.setdefault(route.url, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, route: Route, *, children: bool = False) -> None:
+        """Removes the cached responses for a route's URL, regardless of their query parameters.
+
+        Parameters
+        -----------
+        route: :class:`~discord.http.Route`
+            The route to invalidate. Its method is ignored.
+        children: :class:`bool`
+            Whether responses for URLs below the route's URL, such as every emoji of a
+            guild for ``/guilds/{guild_id}/emojis``, are removed too.
+        """
+        self._invalidate_url(route.url)
+        if children:
+            prefix = route.url + '/'
+            for url in [url for url in {*self._urls, *self._in_flight} if url.startswith(prefix)]:
+                self._invalidate_url(url)
+
+    def clear(self) -> None:
+        """Removes every cached response and resets the statistics."""
+        self._entries.clear()
+        self._urls.clear()
+        for url in self._in_flight:
+            self._mark_invalidated(url)
+        self.hits = 0
+        self.misses = 0
+
+    def _begin(self, route: Route) -> int:
+        # Called before requesting a cached route, the result is passed to _finish
+        url = route.url
+        self._in_flight[url] = self._in_flight.get(url, 0) + 1
+        return self._generation
+
+    def _finish(self, route: Route, generation: int) -> bool:
+        # Returns whether the response can be cached, which it cannot if the URL
+        # was invalidated while the request was in flight since it may be stale
+        url = route.url
+        stale = self._invalidated.get(url, -1) > generation
+        count = self._in_flight[url] - 1
+        if count:
+            self._in_flight[url] = count
+        else:
+            del self._in_flight[url]
+            self._invalidated.pop(url, None)
+        return not stale
+
+    def _key(self, route: Route, params: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+        return (route.url, '' if not params else repr(sorted(params.items())))
+
+    def _invalidate_url(self, url: str) -> None:
+        if url in self._in_flight:
+            self._mark_invalidated(url)
+
+        keys = self._urls.pop(url, None)
+        if keys:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _mark_invalidated(self, url: str) -> None:
+        self._generation += 1
+        self._invalidated[url] = self._generation
+
+    def _invalidate_modified(self, route: Route) -> None:
+        # A request modifying a resource also changes the collections listing it,
+        # e.g. editing /applications/{application_id}/commands/{command_id}
+        # changes /applications/{application_id}/commands
+        path = route.path
+        if route.method == 'PUT' and path in _COLLECTIONS:
+            self.invalidate(route, children=True)
+        else:
+            self._invalidate_url(route.url)
+
+        for parent in PARENT_ROUTES.get(path, ()):
+            # Both paths have the same parameters up to the parent's end
+            depth = path.count('/') - parent.count('/')
+            self._invalidate_url(route.url.rsplit('/', depth)[0])
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        keys = self._urls.get(entry.url)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._urls[entry.url]
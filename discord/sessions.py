@@ -0,0 +1,351 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+__all__ = (
+    'GatewaySession',
+    'SessionStore',
+    'FileSessionStore',
+)
+
+_log = logging.getLogger(__name__)
+
+
+class GatewaySession:
+    """Represents the data required to resume a gateway session for a shard.
+
+    .. versionadded:: 2.8
+
+    Attributes
+    -----------
+    shard_id: Optional[:class:`int`]
+        The shard ID this session belongs to. ``None`` if the client is not sharded.
+    session_id: :class:`str`
+        The gateway session ID.
+    sequence: Optional[:class:`int`]
+        The last sequence number received by the session.
+    resume_gateway_url: :class:`str`
+        The gateway URL to resume the session with.
+    guilds: List[Dict[:class:`str`, Any]]
+        The payloads of the guilds that were available to the shard, with their channels,
+        active threads, roles and the client's own member. The guild cache is restored from
+        these before resuming, since Discord does not send the guilds again.
+    saved_at: :class:`float`
+        The UNIX timestamp of when the session was saved.
+    """
+
+    __slots__ = ('shard_id', 'session_id', 'sequence', 'resume_gateway_url', 'guilds', 'saved_at')
+
+    def __init__(
+        self,
+        *,
+        shard_id: Optional[int],
+        session_id: str,
+        sequence: Optional[int],
+        resume_gateway_url: str,
+        guilds: Optional[List[Dict[str, Any]]] = None,
+        saved_at: Optional[float] = None,
+    ) -> None:
+        self.shard_id: Optional[int] = shard_id
+        self.session_id: str = session_id
+        self.sequence: Optional[int] = sequence
+        self.resume_gateway_url: str = resume_gateway_url
+        self.guilds: List[Dict[str, Any]] = guilds or []
+        self.saved_at: float = time.time() if saved_at is None else saved_at
+
+    def __repr__(self) -> str:
+        return (
+            f'<GatewaySession shard_id={self.shard_id} session_id={self.session_id!r} '
+            f'sequence={self.sequence} guilds={len(self.guilds)}>'
+        )
+
+    @property
+    def guild_ids(self) -> List[int]:
+        """List[:class:`int`]: The IDs of the guilds that were available to the shard."""
+        return [int(guild['id']) for guild in self.guilds]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converts the session into a JSON serialisable dict.
+
+        Returns
+        --------
+        Dict[:class:`str`, Any]
+            The session data.
+        """
+        return {
+            'shard_id': self.shard_id,
+            'session_id': self.session_id,
+            'sequence': self.sequence,
+            'resume_gateway_url': self.resume_gateway_url,
+            'guilds': self.guilds,
+            'saved_at': self.saved_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> GatewaySession:
+        """Creates a session from the data returned by :meth:`to_dict`.
+
+        Parameters
+        -----------
+        data: Dict[:class:`str`, Any]
+            The session data.
+
+        Returns
+        --------
+        :class:`GatewaySession`
+            The session.
+        """
+        return cls(
+            shard_id=data['shard_id'],
+            session_id=data['session_id'],
+            sequence=data['sequence'],
+            resume_gateway_url=data['resume_gateway_url'],
+            guilds=data.get('guilds', []),
+            saved_at=data.get('saved_at'),
+        )
+
+
+# Collections of a guild payload that are not kept up to date by GuildSnapshots
+_UNTRACKED_GUILD_KEYS = frozenset(
+    (
+        'channels',
+        'threads',
+        'roles',
+        'members',
+        'presences',
+        'voice_states',
+        'stage_instances',
+        'guild_scheduled_events',
+        'soundboard_sounds',
+    )
+)
+
+
+class _GuildSnapshot:
+    __slots__ = ('data', 'channels', 'threads', 'roles', 'member')
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.data: Dict[str, Any] = {}
+        self.channels: Dict[int, Dict[str, Any]] = {}
+        self.threads: Dict[int, Dict[str, Any]] = {}
+        self.roles: Dict[int, Dict[str, Any]] = {}
+        self.member: Optional[Dict[str, Any]] = None
+        self.update(data)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        self.data.update((k, v) for k, v in data.items() if k not in _UNTRACKED_GUILD_KEYS)
+        if 'roles' in data:
+            self.roles = {int(role['id']): role for role in data['roles']}
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = dict(self.data)
+        payload['channels'] = list(self.channels.values())
+        payload['threads'] = list(self.threads.values())
+        payload['roles'] = list(self.roles.values())
+        payload['members'] = [] if self.member is None else [self.member]
+        return payload
+
+
+class GuildSnapshots:
+    """Keeps the payloads of the cached guilds up to date from gateway events, so that
+    a saved :class:`GatewaySession` can restore the guild cache without the API.
+
+    Only the guild itself, its channels, active threads, roles, emojis, stickers and the
+    client's own member are kept. When disabled, every method does nothing.
+    """
+
+    __slots__ = ('enabled', '_guilds')
+
+    def __init__(self, *, enabled: bool = True) -> None:
+        self.enabled: bool = enabled
+        self._guilds: Dict[int, _GuildSnapshot] = {}
+
+    def clear(self) -> None:
+        self._guilds.clear()
+
+    def add_guild(self, data: Dict[str, Any], self_id: Optional[int]) -> None:
+        if not self.enabled:
+            return
+
+        snapshot = self._guilds[int(data['id'])] = _GuildSnapshot(data)
+        for key in ('channels', 'threads'):
+            getattr(snapshot, key).update((int(d['id']), d) for d in data.get(key, []))
+        for member in data.get('members', []):
+            if int(member['user']['id']) == self_id:
+                snapshot.member = member
+
+    def update_guild(self, guild_id: int, data: Dict[str, Any]) -> None:
+        snapshot = self._guilds.get(guild_id)
+        if snapshot is not None:
+            snapshot.update(data)
+
+    def remove_guild(self, guild_id: int) -> None:
+        self._guilds.pop(guild_id, None)
+
+    def set(self, guild_id: int, key: str, data: Dict[str, Any]) -> None:
+        # key is one of 'channels', 'threads' or 'roles'
+        snapshot = self._guilds.get(guild_id)
+        if snapshot is not None:
+            getattr(snapshot, key)[int(data['id'])] = data
+
+    def remove(self, guild_id: int, key: str, ids: Iterable[int]) -> None:
+        snapshot = self._guilds.get(guild_id)
+        if snapshot is not None:
+            items = getattr(snapshot, key)
+            for id in ids:
+                items.pop(id, None)
+
+    def sync_threads(self, guild_id: int, channel_ids: Optional[Set[int]], threads: List[Dict[str, Any]]) -> None:
+        snapshot = self._guilds.get(guild_id)
+        if snapshot is None:
+            return
+
+        if channel_ids is None:
+            snapshot.threads = {}
+        else:
+            snapshot.threads = {k: v for k, v in snapshot.threads.items() if int(v['parent_id']) not in channel_ids}
+        snapshot.threads.update((int(d['id']), d) for d in threads)
+
+    def set_member(self, guild_id: int, data: Dict[str, Any]) -> None:
+        snapshot = self._guilds.get(guild_id)
+        if snapshot is not None:
+            snapshot.member = data
+
+    def to_list(self, guild_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        guilds = self._guilds
+        return [guilds[guild_id].to_dict() for guild_id in guild_ids if guild_id in guilds]
+
+
+class SessionStore:
+    """The base class for persisting gateway sessions between process restarts.
+
+    When a store is passed to :class:`Client` or :class:`AutoShardedClient`, the
+    session of every shard is saved when the client is closed and the next start
+    attempts to RESUME it instead of IDENTIFYing. If the session can no longer be
+    resumed then the client falls back to IDENTIFYing as usual.
+
+    Subclasses must implement :meth:`load`, :meth:`save` and :meth:`delete`.
+
+    .. versionadded:: 2.8
+    """
+
+    async def load(self, shard_id: Optional[int], /) -> Optional[GatewaySession]:
+        """|coro|
+
+        Loads the saved session for a shard.
+
+        Parameters
+        -----------
+        shard_id: Optional[:class:`int`]
+            The shard ID to load the session for, ``None`` if the client is not sharded.
+
+        Returns
+        --------
+        Optional[:class:`GatewaySession`]
+            The saved session, if any.
+        """
+        raise NotImplementedError
+
+    async def save(self, session: GatewaySession, /) -> None:
+        """|coro|
+
+        Saves the session of a shard, replacing any previous one.
+
+        Parameters
+        -----------
+        session: :class:`GatewaySession`
+            The session to save.
+        """
+        raise NotImplementedError
+
+    async def delete(self, shard_id: Optional[int], /) -> None:
+        """|coro|
+
+        Deletes the saved session for a shard, if any.
+
+        Parameters
+        -----------
+        shard_id: Optional[:class:`int`]
+            The shard ID to delete the session for.
+        """
+        raise NotImplementedError
+
+
+class FileSessionStore(SessionStore):
+    """A :class:`SessionStore` that saves every shard's session as a JSON file in a directory.
+
+    .. versionadded:: 2.8
+
+    Parameters
+    -----------
+    path: Union[:class:`str`, :class:`os.PathLike`]
+        The directory to store the sessions in. It is created if it does not exist.
+    max_age: Optional[:class:`float`]
+        The number of seconds after which a saved session is considered too old to be
+        resumed and is ignored. ``None`` disables this check. Defaults to 300 seconds.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike[str]], *, max_age: Optional[float] = 300.0) -> None:
+        self.path: str = os.fspath(path)
+        self.max_age: Optional[float] = max_age
+
+    def _get_path(self, shard_id: Optional[int]) -> str:
+        name = 'session.json' if shard_id is None else f'session-{shard_id}.json'
+        return os.path.join(self.path, name)
+
+    async def load(self, shard_id: Optional[int], /) -> Optional[GatewaySession]:
+        try:
+            with open(self._get_path(shard_id), 'r', encoding='utf-8') as fp:
+                session = GatewaySession.from_dict(json.load(fp))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            _log.warning('Ignoring corrupted saved session for shard ID %s.', shard_id)
+            return None
+
+        if self.max_age is not None and session.saved_at + self.max_age < time.time():
+            _log.info('Ignoring saved session for shard ID %s as it is too old to resume.', shard_id)
+            return None
+        return session
+
+    async def save(self, session: GatewaySession, /) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        path = self._get_path(session.shard_id)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            json.dump(session.to_dict(), fp)
+        os.replace(tmp, path)
+
+    async def delete(self, shard_id: Optional[int], /) -> None:
+        try:
+            os.remove(self._get_path(shard_id))
+        except FileNotFoundError:
+            pass
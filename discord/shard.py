@@ -45,7 +45,7 @@ from .utils import MISSING
 
 from .enums import Status
 
-from typing import TYPE_CHECKING, Any, Callable, Tuple, Type, Optional, List, Dict
+from typing import TYPE_CHECKING, Any, Callable, Sequence, Tuple, Type, Optional, List, Dict
 
 if TYPE_CHECKING:
     from typing_extensions import Unpack
@@ -54,10 +54,12 @@ if TYPE_CHECKING:
     from .flags import Intents
     from .types.gateway import SessionStartLimit
     from .client import _ClientOptions
+    from .cluster import ClusterClient
 
     class _AutoShardedClientOptions(_ClientOptions, total=False):
         shard_ids: List[int]
         shard_connect_timeout: Optional[float]
+        identify_concurrency: Optional[int]
 
 
 __all__ = (
@@ -131,9 +133,9 @@ class Shard:
         if self._task is not None and not self._task.done():
             self._task.cancel()
 
-    async def close(self) -> None:
+    async def close(self, code: int = 1000) -> None:
         self._cancel_task()
-        await self.ws.close(code=1000)
+        await self.ws.close(code=code)
 
     async def disconnect(self) -> None:
         await self.close()
@@ -302,6 +304,14 @@ class ShardInfo:
         """
         return self._parent.ws.is_ratelimited()
 
+    @property
+    def ratelimit_stats(self) -> GatewayRatelimitStats:
+        """:class:`~discord.gateway.GatewayRatelimitStats`: The state of this shard's gateway send rate limit.
+
+        .. versionadded:: 2.8
+        """
+        return self._parent.ws._rate_limiter.get_stats()
+
 
 class SessionStartLimits:
     """A class that holds info about session start limits
@@ -367,6 +377,20 @@ class AutoShardedClient(Client):
         Defaults to 180 seconds.
 
         .. versionadded:: 2.4
+    identify_concurrency: Optional[:class:`int`]
+        The number of shards that can IDENTIFY at the same time. Shards are grouped into
+        rate limit buckets by ``shard_id % identify_concurrency`` and one shard per bucket
+        is launched at a time, with :meth:`before_identify_hook` pacing the following
+        shards of each bucket. :func:`on_shard_launch` is dispatched as shards are launched.
+        If ``None``, the ``max_concurrency`` of the bot's session start limit is used.
+
+        .. versionadded:: 2.8
+    cluster: Optional[:class:`ClusterClient`]
+        The IPC connection to the other clusters when the client is run by a
+        :class:`ShardCluster`, otherwise ``None``. IDENTIFYs are coordinated
+        between the clusters instead of going through :meth:`before_identify_hook`.
+
+        .. versionadded:: 2.8
     """
 
     if TYPE_CHECKING:
@@ -376,6 +400,8 @@ class AutoShardedClient(Client):
         kwargs.pop('shard_id', None)
         self.shard_ids: Optional[List[int]] = kwargs.pop('shard_ids', None)
         self.shard_connect_timeout: Optional[float] = kwargs.pop('shard_connect_timeout', 180.0)
+        self.identify_concurrency: Optional[int] = kwargs.pop('identify_concurrency', None)
+        self.cluster: Optional[ClusterClient] = None
 
         super().__init__(*args, intents=intents, **kwargs)
 
@@ -427,6 +453,15 @@ class AutoShardedClient(Client):
         """
         return [(shard_id, shard.ws.latency) for shard_id, shard in self.__shards.items()]
 
+    @property
+    def gateway_ratelimit_stats(self) -> Dict[Optional[int], GatewayRatelimitStats]:
+        """Dict[Optional[:class:`int`], :class:`~discord.gateway.GatewayRatelimitStats`]: A mapping of shard IDs
+        to the state of their gateway send rate limit.
+
+        .. versionadded:: 2.8
+        """
+        return {shard_id: shard.ws._rate_limiter.get_stats() for shard_id, shard in self.__shards.items()}
+
     def get_shard(self, shard_id: int, /) -> Optional[ShardInfo]:
         """
         Gets the shard information at a given shard ID or ``None`` if not found.
@@ -479,9 +514,46 @@ class AutoShardedClient(Client):
         _, _, limits = await self.http.get_bot_gateway()
         return SessionStartLimits(**limits)
 
+    async def _call_before_identify_hook(self, shard_id: Optional[int], *, initial: bool = False) -> None:
+        if self.cluster is not None and shard_id is not None:
+            await self.cluster.identify(shard_id)
+        else:
+            await super()._call_before_identify_hook(shard_id, initial=initial)
+
+    def _get_identify_rounds(self, shard_ids: Sequence[int], max_concurrency: int) -> List[List[int]]:
+        # Shards sharing a rate limit key must IDENTIFY one after the other,
+        # every round launches at most one shard per key while keeping the given order
+        buckets: Dict[int, List[int]] = {}
+        for shard_id in shard_ids:
+            buckets.setdefault(shard_id % max_concurrency, []).append(shard_id)
+
+        rounds: List[List[int]] = []
+        for bucket in buckets.values():
+            for index, shard_id in enumerate(bucket):
+                if index == len(rounds):
+                    rounds.append([])
+                rounds[index].append(shard_id)
+
+        order = {shard_id: index for index, shard_id in enumerate(shard_ids)}
+        for shards in rounds:
+            shards.sort(key=order.__getitem__)
+        return rounds
+
     async def launch_shard(self, gateway: yarl.URL, shard_id: int, *, initial: bool = False) -> None:
+        session = await self._load_session(shard_id)
         try:
-            coro = DiscordWebSocket.from_client(self, initial=initial, gateway=gateway, shard_id=shard_id)
+            if session is not None:
+                coro = DiscordWebSocket.from_client(
+                    self,
+                    initial=initial,
+                    gateway=yarl.URL(session.resume_gateway_url),
+                    shard_id=shard_id,
+                    session=session.session_id,
+                    sequence=session.sequence,
+                    resume=True,
+                )
+            else:
+                coro = DiscordWebSocket.from_client(self, initial=initial, gateway=gateway, shard_id=shard_id)
             ws = await asyncio.wait_for(coro, timeout=self.shard_connect_timeout)
         except Exception:
             _log.exception('Failed to connect for shard_id: %s. Retrying...', shard_id)
@@ -496,21 +568,45 @@ class AutoShardedClient(Client):
         if self.is_closed():
             return
 
+        if self.cluster is not None:
+            await self.cluster.connect()
+
+        max_concurrency = self.identify_concurrency
         if self.shard_count is None:
             self.shard_count: int
-            self.shard_count, gateway_url, _session_start_limit = await self.http.get_bot_gateway()
+            self.shard_count, gateway_url, session_start_limit = await self.http.get_bot_gateway()
             gateway = yarl.URL(gateway_url)
+            if max_concurrency is None:
+                max_concurrency = session_start_limit['max_concurrency']
         else:
             gateway = DiscordWebSocket.DEFAULT_GATEWAY
+            if max_concurrency is None:
+                try:
+                    max_concurrency = (await self.fetch_session_start_limits()).max_concurrency
+                except (GatewayNotFound, HTTPException):
+                    _log.warning('Could not fetch the session start limits, shards will IDENTIFY one at a time.')
+                    max_concurrency = 1
 
         self._connection.shard_count = self.shard_count
 
         shard_ids = self.shard_ids or range(self.shard_count)
         self._connection.shard_ids = shard_ids
 
-        for shard_id in shard_ids:
-            initial = shard_id == shard_ids[0]
+        total = len(shard_ids)
+        launched = 0
+
+        async def launch(shard_id: int, initial: bool) -> None:
+            nonlocal launched
             await self.launch_shard(gateway, shard_id, initial=initial)
+            launched += 1
+            self.dispatch('shard_launch', shard_id, launched, total)
+
+        # The first round holds the first IDENTIFY of every bucket. Later rounds go through
+        # before_identify_hook, which by default waits 5 seconds per bucket.
+        for index, shards in enumerate(self._get_identify_rounds(shard_ids, max(max_concurrency, 1))):
+            if self.is_closed():
+                return
+            await asyncio.gather(*(launch(shard_id, index == 0) for shard_id in shards))
 
     async def _async_setup_hook(self) -> None:
         await super()._async_setup_hook()
@@ -551,10 +647,18 @@ class AutoShardedClient(Client):
         async def _close():
             await self._connection.close()
 
-            to_close = [asyncio.ensure_future(shard.close(), loop=self.loop) for shard in self.__shards.values()]
+            async def close_shard(shard: Shard) -> None:
+                # Closing with 1000 invalidates the session, so it can't be resumed later
+                saved = shard.ws.open and await self._save_session(shard.ws)
+                await shard.close(code=4000 if saved else 1000)
+
+            to_close = [asyncio.ensure_future(close_shard(shard), loop=self.loop) for shard in self.__shards.values()]
             if to_close:
                 await asyncio.wait(to_close)
 
+            if self.cluster is not None:
+                await self.cluster.close()
+
             await self.http.close()
             if self.__queue is not MISSING:
                 self.__queue.put_nowait(EventItem(EventType.clean_close, None, None))
@@ -632,6 +736,7 @@ class AutoShardedClient(Client):
             # Member.activities is typehinted as Tuple[ActivityType, ...], we may be setting it as Tuple[BaseActivity, ...]
             me.activities = activities  # type: ignore
             me.status = status_enum
+            guild._store_member(me)
 
     def is_ws_ratelimited(self) -> bool:
         """:class:`bool`: Whether the websocket is currently rate limited.
@@ -25,7 +25,8 @@ DEALINGS IN THE SOFTWARE.
 from __future__ import annotations
 
 import asyncio
-from collections import deque, OrderedDict
+from collections import OrderedDict
+import concurrent.futures
 import copy
 import logging
 from typing import (
@@ -42,11 +43,11 @@ from typing import (
     Sequence,
     Generic,
     Tuple,
-    Deque,
+    Iterable,
+    MutableMapping,
     Literal,
     overload,
 )
-import weakref
 import inspect
 
 import os
@@ -81,6 +82,10 @@ from .audit_logs import AuditLogEntry
 from ._types import ClientT
 from .soundboard import SoundboardSound
 from .subscription import Subscription
+from .http import Route
+from .gateway import HeartbeatScheduler
+from .sessions import GuildSnapshots
+from .cache_storage import CacheStorage, MessageCache
 
 
 if TYPE_CHECKING:
@@ -94,6 +99,8 @@ if TYPE_CHECKING:
     from .ui.dynamic import DynamicItem
     from .app_commands import CommandTree, Translator
     from .poll import Poll
+    from .sessions import GatewaySession
+    from .replay import GatewayRecorder
 
     from .types.automod import AutoModerationRule, AutoModerationActionExecution
     from .types.snowflake import Snowflake
@@ -163,6 +170,36 @@ class ChunkRequest:
 
 _log = logging.getLogger(__name__)
 
+# Gateway events whose parsers have no cache side effects worth keeping,
+# mapped to every event name their parser could dispatch.
+# When lazy dispatch is enabled these are dropped before decoding if nothing listens to them.
+_LAZY_DISPATCH_EVENTS: Dict[str, Tuple[str, ...]] = {
+    'TYPING_START': ('typing', 'raw_typing'),
+    'PRESENCE_UPDATE': ('presence_update', 'raw_presence_update', 'user_update'),
+    'INVITE_CREATE': ('invite_create',),
+    'INVITE_DELETE': ('invite_delete',),
+    'WEBHOOKS_UPDATE': ('webhooks_update',),
+    'GUILD_BAN_ADD': ('member_ban',),
+    'GUILD_BAN_REMOVE': ('member_unban',),
+    'GUILD_AUDIT_LOG_ENTRY_CREATE': ('audit_log_entry_create',),
+    'GUILD_INTEGRATIONS_UPDATE': ('guild_integrations_update',),
+    'INTEGRATION_CREATE': ('integration_create',),
+    'INTEGRATION_UPDATE': ('integration_update',),
+    'INTEGRATION_DELETE': ('raw_integration_delete',),
+    'AUTO_MODERATION_RULE_CREATE': ('automod_rule_create',),
+    'AUTO_MODERATION_RULE_UPDATE': ('automod_rule_update',),
+    'AUTO_MODERATION_RULE_DELETE': ('automod_rule_delete',),
+    'AUTO_MODERATION_ACTION_EXECUTION': ('automod_action',),
+    'APPLICATION_COMMAND_PERMISSIONS_UPDATE': ('raw_app_command_permissions_update',),
+    'VOICE_CHANNEL_EFFECT_SEND': ('voice_channel_effect',),
+    'ENTITLEMENT_CREATE': ('entitlement_create',),
+    'ENTITLEMENT_UPDATE': ('entitlement_update',),
+    'ENTITLEMENT_DELETE': ('entitlement_delete',),
+    'SUBSCRIPTION_CREATE': ('subscription_create',),
+    'SUBSCRIPTION_UPDATE': ('subscription_update',),
+    'SUBSCRIPTION_DELETE': ('subscription_delete',),
+}
+
 
 async def logging_coroutine(coroutine: Coroutine[Any, Any, T], *, info: str) -> Optional[T]:
     try:
@@ -175,6 +212,7 @@ class ConnectionState(Generic[ClientT]):
     if TYPE_CHECKING:
         _get_websocket: Callable[..., DiscordWebSocket]
         _get_client: Callable[..., ClientT]
+        _has_listeners: Callable[[str], bool]
         _parsers: Dict[str, Callable[[Dict[str, Any]], None]]
 
     def __init__(
@@ -193,6 +231,13 @@ class ConnectionState(Generic[ClientT]):
         if self.max_messages is not None and self.max_messages <= 0:
             self.max_messages = 1000
 
+        cache_storage = options.get('cache_storage', None)
+        if cache_storage is not None and not isinstance(cache_storage, CacheStorage):
+            raise TypeError(f'cache_storage parameter must be CacheStorage not {type(cache_storage)!r}')
+
+        self.cache_storage: CacheStorage = cache_storage or CacheStorage()
+        self.lazy_guilds: bool = options.get('lazy_guilds', False)
+
         self.dispatch: Callable[..., Any] = dispatch
         self.handlers: Dict[str, Callable[..., Any]] = handlers
         self.hooks: Dict[str, Callable[..., Coroutine[Any, Any, Any]]] = hooks
@@ -201,6 +246,12 @@ class ConnectionState(Generic[ClientT]):
         self.application_id: Optional[int] = utils._get_as_snowflake(options, 'application_id')
         self.application_flags: ApplicationFlags = utils.MISSING
         self.heartbeat_timeout: float = options.get('heartbeat_timeout', 60.0)
+        self.heartbeat_mode: str = options.get('heartbeat_mode', 'thread')
+        if self.heartbeat_mode not in ('thread', 'asyncio'):
+            raise ValueError(f'heartbeat_mode must be either "thread" or "asyncio" not {self.heartbeat_mode!r}')
+
+        self.heartbeat_watchdog: bool = options.get('heartbeat_watchdog', True)
+        self._heartbeat_scheduler: Optional[HeartbeatScheduler] = None
         self.guild_ready_timeout: float = options.get('guild_ready_timeout', 2.0)
         if self.guild_ready_timeout < 0:
             raise ValueError('guild_ready_timeout cannot be negative')
@@ -238,6 +289,7 @@ class ConnectionState(Generic[ClientT]):
             _log.warning('Guilds intent seems to be disabled. This may cause state related issues.')
 
         self._chunk_guilds: bool = options.get('chunk_guilds_at_startup', intents.members)
+        self.coalesce_chunk_requests: bool = options.get('coalesce_chunk_requests', False)
 
         # Ensure these two are set properly
         if not intents.members and self._chunk_guilds:
@@ -266,6 +318,18 @@ class ConnectionState(Generic[ClientT]):
         if self.raw_presence_flag is utils.MISSING:
             self.raw_presence_flag = not intents.members and intents.presences
 
+        # sessions loaded from a SessionStore that are being resumed, keyed by shard ID
+        self._restored_sessions: Dict[Optional[int], GatewaySession] = {}
+        # The payloads saved with the sessions, only kept when they are going to be saved
+        self._guild_snapshots: GuildSnapshots = GuildSnapshots(enabled=options.get('session_store') is not None)
+        self.gateway_offload_threshold: Optional[int] = options.get('gateway_offload_threshold', None)
+        self._gateway_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.gateway_recorder: Optional[GatewayRecorder] = options.get('gateway_recorder', None)
+
+        self.lazy_dispatch: bool = options.get('enable_lazy_dispatch', False)
+        # event name -> [parsed, skipped], only tracked with lazy dispatch
+        self._dispatch_counts: Dict[str, List[int]] = {}
+
         self.parsers: Dict[str, Callable[[Any], None]]
         self.parsers = parsers = {}
         for attr, func in inspect.getmembers(self):
@@ -292,14 +356,27 @@ class ConnectionState(Generic[ClientT]):
         if self._translator:
             await self._translator.unload()
 
+        if self._gateway_executor is not None:
+            self._gateway_executor.shutdown(wait=False)
+            self._gateway_executor = None
+
+        if self._heartbeat_scheduler is not None:
+            self._heartbeat_scheduler.close()
+            self._heartbeat_scheduler = None
+
         # Purposefully don't call `clear` because users rely on cache being available post-close
 
     def clear(self, *, views: bool = True) -> None:
         self.user: Optional[ClientUser] = None
-        self._users: weakref.WeakValueDictionary[int, User] = weakref.WeakValueDictionary()
-        self._emojis: Dict[int, Emoji] = {}
-        self._stickers: Dict[int, GuildSticker] = {}
-        self._guilds: Dict[int, Guild] = {}
+        storage = self.cache_storage
+        self._users: MutableMapping[int, User] = storage.users()
+        self._emojis: MutableMapping[int, Emoji] = storage.emojis()
+        self._stickers: MutableMapping[int, GuildSticker] = storage.stickers()
+        self._guilds: MutableMapping[int, Guild] = storage.guilds()
+        self._guild_snapshots.clear()
+        # Guild channel or thread ID -> Guild ID, so that get_channel doesn't have to check every guild
+        # Entries of removed channels may be left behind, they are only used to find the guild to look in
+        self._channel_guilds: Dict[int, int] = {}
         if views:
             self._view_store: ViewStore = ViewStore(self)
 
@@ -310,9 +387,9 @@ class ConnectionState(Generic[ClientT]):
         # extra dict to look up private channels by user id
         self._private_channels_by_user: Dict[int, DMChannel] = {}
         if self.max_messages is not None:
-            self._messages: Optional[Deque[Message]] = deque(maxlen=self.max_messages)
+            self._messages: Optional[MessageCache] = storage.messages(self.max_messages)
         else:
-            self._messages: Optional[Deque[Message]] = None
+            self._messages: Optional[MessageCache] = None
 
     def process_chunk_requests(self, guild_id: int, nonce: Optional[str], members: List[Member], complete: bool) -> None:
         removed = []
@@ -326,6 +403,12 @@ class ConnectionState(Generic[ClientT]):
         for key in removed:
             del self._chunk_requests[key]
 
+    def _merge_chunk_nonce(self, guild_id: int, nonce: str, merged_nonce: str) -> None:
+        # The gateway merged this request into another one, so its chunks come with that nonce
+        for request in self._chunk_requests.values():
+            if request.guild_id == guild_id and request.nonce == nonce:
+                request.nonce = merged_nonce
+
     def clear_chunk_requests(self, shard_id: int | None) -> None:
         removed = []
         for key, request in self._chunk_requests.items():
@@ -336,6 +419,39 @@ class ConnectionState(Generic[ClientT]):
         for key in removed:
             del self._chunk_requests[key]
 
+    def _get_heartbeat_scheduler(self) -> Optional[HeartbeatScheduler]:
+        if self.heartbeat_mode != 'asyncio':
+            return None
+
+        if self._heartbeat_scheduler is None:
+            self._heartbeat_scheduler = HeartbeatScheduler(self.loop, watchdog=self.heartbeat_watchdog)
+        return self._heartbeat_scheduler
+
+    def _get_gateway_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        # Shared by every shard, decoding is serialised per shard by the websocket anyway
+        if self._gateway_executor is None:
+            self._gateway_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='discord.py-gateway'
+            )
+        return self._gateway_executor
+
+    def _is_event_wanted(self, event: str) -> bool:
+        try:
+            names = _LAZY_DISPATCH_EVENTS[event]
+        except KeyError:
+            # Anything not listed is needed to keep the cache consistent
+            return True
+
+        return any(self._has_listeners(name) for name in names)
+
+    def _record_dispatch(self, event: str, *, skipped: bool) -> None:
+        try:
+            counts = self._dispatch_counts[event]
+        except KeyError:
+            counts = self._dispatch_counts[event] = [0, 0]
+
+        counts[skipped] += 1
+
     def call_handlers(self, key: str, *args: Any, **kwargs: Any) -> None:
         try:
             func = self.handlers[key]
@@ -436,14 +552,28 @@ class ConnectionState(Generic[ClientT]):
         # the keys of self._guilds are ints
         return self._guilds.get(guild_id)  # type: ignore
 
+    def _invalidate_responses(self, path: str, *, children: bool = False, **parameters: Any) -> None:
+        # Drops REST responses made stale by a gateway event from the response cache
+        cache = self.http.response_cache
+        if cache is not None:
+            cache.invalidate(Route('GET', path, **parameters), children=children)
+
     def _get_or_create_unavailable_guild(self, guild_id: int, *, data: Optional[Dict[str, Any]] = None) -> Guild:
         return self._guilds.get(guild_id) or Guild._create_unavailable(state=self, guild_id=guild_id, data=data)
 
     def _add_guild(self, guild: Guild) -> None:
+        old = self._guilds.get(guild.id)
+        if old is not None and old is not guild:
+            self._unindex_channels(old._channels)
+            self._unindex_channels(old._threads)
         self._guilds[guild.id] = guild
+        self._index_guild_channels(guild)
 
     def _remove_guild(self, guild: Guild) -> None:
         self._guilds.pop(guild.id, None)
+        self._guild_snapshots.remove_guild(guild.id)
+        self._unindex_channels(guild._channels)
+        self._unindex_channels(guild._threads)
 
         for emoji in guild.emojis:
             self._emojis.pop(emoji.id, None)
@@ -522,7 +652,7 @@ class ConnectionState(Generic[ClientT]):
                 self._private_channels_by_user.pop(recipient.id, None)
 
     def _get_message(self, msg_id: Optional[int]) -> Optional[Message]:
-        return utils.find(lambda m: m.id == msg_id, reversed(self._messages)) if self._messages else None
+        return self._messages.get(msg_id) if self._messages is not None else None
 
     def _add_guild_from_data(self, data: GuildPayload) -> Guild:
         guild = Guild(data=data, state=self)
@@ -533,6 +663,18 @@ class ConnectionState(Generic[ClientT]):
         # If presences are enabled then we get back the old guild.large behaviour
         return self._chunk_guilds and not guild.chunked and not (self._intents.presences and not guild.large)
 
+    def _index_guild_channels(self, guild: Guild) -> None:
+        self._index_channels(guild, guild._channels)
+        self._index_channels(guild, guild._threads)
+
+    def _index_channels(self, guild: Guild, channel_ids: Iterable[int]) -> None:
+        self._channel_guilds.update(dict.fromkeys(channel_ids, guild.id))
+
+    def _unindex_channels(self, channel_ids: Iterable[int]) -> None:
+        pop = self._channel_guilds.pop
+        for channel_id in channel_ids:
+            pop(channel_id, None)
+
     def _get_guild_channel(
         self, data: PartialMessagePayload, guild_id: Optional[int] = None
     ) -> Tuple[Union[Channel, Thread], Optional[Guild]]:
@@ -651,10 +793,30 @@ class ConnectionState(Generic[ClientT]):
         finally:
             self._ready_task = None
 
+    def _restore_session(self, session: GatewaySession) -> None:
+        # Discord does not replay READY and GUILD_CREATE when resuming, so the guild cache is
+        # restored from the session before connecting and the replayed events apply to it
+        guilds = [Guild(data=data, state=self) for data in session.guilds]  # type: ignore
+        self._restored_sessions[session.shard_id] = session
+        for guild, data in zip(guilds, session.guilds):
+            self._guild_snapshots.add_guild(data, self.self_id)
+            self._add_guild(guild)
+        _log.info('Shard ID %s restored %d guilds from its saved session.', session.shard_id, len(session.guilds))
+
+    def _resumed_session(self, session: GatewaySession) -> None:
+        if self._ready_task is not None:
+            self._ready_task.cancel()
+            self._ready_task = None
+
+        self.call_handlers('ready')
+        self.dispatch('ready')
+
     def parse_ready(self, data: gw.ReadyEvent) -> None:
         if self._ready_task is not None:
             self._ready_task.cancel()
 
+        # the saved session could not be resumed, a new one has been identified
+        self._restored_sessions.clear()
         self._ready_state: asyncio.Queue[Guild] = asyncio.Queue()
         self.clear(views=False)
         self.clear_chunk_requests(None)
@@ -678,6 +840,9 @@ class ConnectionState(Generic[ClientT]):
 
     def parse_resumed(self, data: gw.ResumedEvent) -> None:
         self.dispatch('resumed')
+        session = self._restored_sessions.pop(data['__shard_id__'], None)  # type: ignore # This is an internal discord.py key
+        if session is not None:
+            self._resumed_session(session)
 
     def parse_message_create(self, data: gw.MessageCreateEvent) -> None:
         channel, _ = self._get_guild_channel(data)
@@ -702,7 +867,9 @@ class ConnectionState(Generic[ClientT]):
     def parse_message_delete_bulk(self, data: gw.MessageDeleteBulkEvent) -> None:
         raw = RawBulkMessageDeleteEvent(data)
         if self._messages:
-            found_messages = [message for message in self._messages if message.id in raw.message_ids]
+            # Sorted by ID to keep the order the messages were cached in
+            found_messages = [message for message in map(self._messages.get, raw.message_ids) if message is not None]
+            found_messages.sort(key=lambda m: m.id)
         else:
             found_messages = []
         raw.cached_messages = found_messages
@@ -848,6 +1015,7 @@ class ConnectionState(Generic[ClientT]):
 
         old_member = Member._copy(member)
         user_update = member._presence_update(raw=raw, user=data['user'])
+        raw.guild._store_member(member)
 
         if user_update:
             self.dispatch('user_update', user_update[0], user_update[1])
@@ -855,6 +1023,7 @@ class ConnectionState(Generic[ClientT]):
         self.dispatch('presence_update', old_member, member)
 
     def parse_user_update(self, data: gw.UserUpdateEvent) -> None:
+        self._invalidate_responses('/users/{user_id}', user_id=data['id'])
         if self.user:
             self.user._update(data)
 
@@ -867,12 +1036,14 @@ class ConnectionState(Generic[ClientT]):
         self.dispatch('invite_delete', invite)
 
     def parse_channel_delete(self, data: gw.ChannelDeleteEvent) -> None:
+        self._invalidate_responses('/channels/{channel_id}', channel_id=data['id'], children=True)
         guild = self._get_guild(utils._get_as_snowflake(data, 'guild_id'))
         channel_id = int(data['id'])
         if guild is not None:
             channel = guild.get_channel(channel_id)
             if channel is not None:
                 guild._remove_channel(channel)
+                self._unindex_channels((channel_id,))
                 self.dispatch('guild_channel_delete', channel)
 
                 if channel.type in (ChannelType.voice, ChannelType.stage_voice):
@@ -882,12 +1053,16 @@ class ConnectionState(Generic[ClientT]):
                             self.dispatch('scheduled_event_delete', s)
 
                 threads = guild._remove_threads_by_channel(channel_id)
+                self._unindex_channels(thread.id for thread in threads)
+                self._guild_snapshots.remove(guild.id, 'channels', (channel_id,))
+                self._guild_snapshots.remove(guild.id, 'threads', [thread.id for thread in threads])
 
                 for thread in threads:
                     self.dispatch('thread_delete', thread)
                     self.dispatch('raw_thread_delete', RawThreadDeleteEvent._from_thread(thread))
 
     def parse_channel_update(self, data: gw.ChannelUpdateEvent) -> None:
+        self._invalidate_responses('/channels/{channel_id}', channel_id=data['id'])
         channel_type = try_enum(ChannelType, data.get('type'))
         channel_id = int(data['id'])
         if channel_type is ChannelType.group:
@@ -908,6 +1083,7 @@ class ConnectionState(Generic[ClientT]):
             if channel is not None:
                 old_channel = copy.copy(channel)
                 channel._update(guild, data)  # type: ignore # the data payload varies based on the channel type.
+                self._guild_snapshots.set(guild.id, 'channels', data)  # type: ignore
                 self.dispatch('guild_channel_update', old_channel, channel)
             else:
                 _log.debug('CHANNEL_UPDATE referencing an unknown channel ID: %s. Discarding.', channel_id)
@@ -926,6 +1102,8 @@ class ConnectionState(Generic[ClientT]):
             # the factory can't be a DMChannel or GroupChannel here
             channel = factory(guild=guild, state=self, data=data)  # type: ignore
             guild._add_channel(channel)  # type: ignore
+            self._index_channels(guild, (channel.id,))
+            self._guild_snapshots.set(guild.id, 'channels', data)  # type: ignore
             self.dispatch('guild_channel_create', channel)
         else:
             _log.debug('CHANNEL_CREATE referencing an unknown guild ID: %s. Discarding.', guild_id)
@@ -962,6 +1140,8 @@ class ConnectionState(Generic[ClientT]):
         thread = Thread(guild=guild, state=guild._state, data=data)
         has_thread = guild.get_thread(thread.id)
         guild._add_thread(thread)
+        self._index_channels(guild, (thread.id,))
+        self._guild_snapshots.set(guild_id, 'threads', data)  # type: ignore
         if not has_thread:
             if data.get('newly_created'):
                 if thread.parent.__class__ is ForumChannel:
@@ -972,6 +1152,7 @@ class ConnectionState(Generic[ClientT]):
                 self.dispatch('thread_join', thread)
 
     def parse_thread_update(self, data: gw.ThreadUpdateEvent) -> None:
+        self._invalidate_responses('/channels/{channel_id}', channel_id=data['id'])
         guild_id = int(data['guild_id'])
         guild = self._get_guild(guild_id)
         if guild is None:
@@ -986,14 +1167,22 @@ class ConnectionState(Generic[ClientT]):
             thread._update(data)
             if thread.archived:
                 guild._remove_thread(thread)
+                self._unindex_channels((thread.id,))
             self.dispatch('thread_update', old, thread)
         else:
             thread = Thread(guild=guild, state=guild._state, data=data)
             if not thread.archived:
                 guild._add_thread(thread)
+                self._index_channels(guild, (thread.id,))
             self.dispatch('thread_join', thread)
 
+        if thread.archived:
+            self._guild_snapshots.remove(guild_id, 'threads', (thread.id,))
+        else:
+            self._guild_snapshots.set(guild_id, 'threads', data)  # type: ignore
+
     def parse_thread_delete(self, data: gw.ThreadDeleteEvent) -> None:
+        self._invalidate_responses('/channels/{channel_id}', channel_id=data['id'], children=True)
         guild_id = int(data['guild_id'])
         guild = self._get_guild(guild_id)
         if guild is None:
@@ -1004,8 +1193,10 @@ class ConnectionState(Generic[ClientT]):
         raw.thread = thread = guild.get_thread(raw.thread_id)
         self.dispatch('raw_thread_delete', raw)
 
+        self._guild_snapshots.remove(guild_id, 'threads', (raw.thread_id,))
         if thread is not None:
             guild._remove_thread(thread)
+            self._unindex_channels((thread.id,))
             self.dispatch('thread_delete', thread)
 
     def parse_thread_list_sync(self, data: gw.ThreadListSyncEvent) -> None:
@@ -1020,12 +1211,15 @@ class ConnectionState(Generic[ClientT]):
         except KeyError:
             # If not provided, then the entire guild is being synced
             # So all previous thread data should be overwritten
-            previous_threads = guild._threads.copy()
+            previous_threads = dict(guild._threads)
             guild._clear_threads()
+            self._guild_snapshots.sync_threads(guild_id, None, data.get('threads', []))  # type: ignore
         else:
             previous_threads = guild._filter_threads(channel_ids)
+            self._guild_snapshots.sync_threads(guild_id, channel_ids, data.get('threads', []))  # type: ignore
 
         threads = {d['id']: guild._store_thread(d) for d in data.get('threads', [])}
+        self._index_channels(guild, (thread.id for thread in threads.values()))
 
         for member in data.get('members', []):
             try:
@@ -1041,6 +1235,7 @@ class ConnectionState(Generic[ClientT]):
             if old is None:
                 self.dispatch('thread_join', thread)
 
+        self._unindex_channels(previous_threads)
         for thread in previous_threads.values():
             self.dispatch('thread_remove', thread)
 
@@ -1116,6 +1311,9 @@ class ConnectionState(Generic[ClientT]):
         self.dispatch('member_join', member)
 
     def parse_guild_member_remove(self, data: gw.GuildMemberRemoveEvent) -> None:
+        self._invalidate_responses(
+            '/guilds/{guild_id}/members/{user_id}', guild_id=data['guild_id'], user_id=data['user']['id']
+        )
         user = self.store_user(data['user'])
         raw = RawMemberRemoveEvent(data, user)
 
@@ -1135,17 +1333,23 @@ class ConnectionState(Generic[ClientT]):
         self.dispatch('raw_member_remove', raw)
 
     def parse_guild_member_update(self, data: gw.GuildMemberUpdateEvent) -> None:
-        guild = self._get_guild(int(data['guild_id']))
         user = data['user']
+        self._invalidate_responses('/guilds/{guild_id}/members/{user_id}', guild_id=data['guild_id'], user_id=user['id'])
+        self._invalidate_responses('/users/{user_id}', user_id=user['id'])
+        guild = self._get_guild(int(data['guild_id']))
         user_id = int(user['id'])
         if guild is None:
             _log.debug('GUILD_MEMBER_UPDATE referencing an unknown guild ID: %s. Discarding.', data['guild_id'])
             return
 
+        if user_id == self.self_id:
+            self._guild_snapshots.set_member(guild.id, data)  # type: ignore
+
         member = guild.get_member(user_id)
         if member is not None:
             old_member = Member._copy(member)
             member._update(data)
+            guild._store_member(member)
             user_update = member._update_inner_user(user)
             if user_update:
                 self.dispatch('user_update', user_update[0], user_update[1])
@@ -1164,6 +1368,7 @@ class ConnectionState(Generic[ClientT]):
             _log.debug('GUILD_MEMBER_UPDATE referencing an unknown member ID: %s. Discarding.', user_id)
 
     def parse_guild_emojis_update(self, data: gw.GuildEmojisUpdateEvent) -> None:
+        self._invalidate_responses('/guilds/{guild_id}/emojis', guild_id=data['guild_id'], children=True)
         guild = self._get_guild(int(data['guild_id']))
         if guild is None:
             _log.debug('GUILD_EMOJIS_UPDATE referencing an unknown guild ID: %s. Discarding.', data['guild_id'])
@@ -1174,6 +1379,7 @@ class ConnectionState(Generic[ClientT]):
             self._emojis.pop(emoji.id, None)
         # guild won't be None here
         guild.emojis = tuple(map(lambda d: self.store_emoji(guild, d), data['emojis']))
+        self._guild_snapshots.update_guild(guild.id, {'emojis': data['emojis']})
         self.dispatch('guild_emojis_update', guild, before_emojis, guild.emojis)
 
     def parse_guild_stickers_update(self, data: gw.GuildStickersUpdateEvent) -> None:
@@ -1187,6 +1393,7 @@ class ConnectionState(Generic[ClientT]):
             self._stickers.pop(emoji.id, None)
 
         guild.stickers = tuple(map(lambda d: self.store_sticker(guild, d), data['stickers']))
+        self._guild_snapshots.update_guild(guild.id, {'stickers': data['stickers']})
         self.dispatch('guild_stickers_update', guild, before_stickers, guild.stickers)
 
     def parse_guild_audit_log_entry_create(self, data: gw.GuildAuditLogEntryCreate) -> None:
@@ -1248,6 +1455,7 @@ class ConnectionState(Generic[ClientT]):
         self.dispatch('automod_action', execution)
 
     def _get_create_guild(self, data: gw.GuildCreateEvent) -> Guild:
+        self._guild_snapshots.add_guild(data, self.self_id)  # type: ignore
         if data.get('unavailable') is False:
             # GUILD_CREATE with unavailable in the response
             # usually means that the guild has become available
@@ -1256,6 +1464,7 @@ class ConnectionState(Generic[ClientT]):
             if guild is not None:
                 guild.unavailable = False
                 guild._from_data(data)
+                self._index_guild_channels(guild)
                 return guild
 
         return self._add_guild_from_data(data)
@@ -1334,10 +1543,12 @@ class ConnectionState(Generic[ClientT]):
             self.dispatch('guild_join', guild)
 
     def parse_guild_update(self, data: gw.GuildUpdateEvent) -> None:
+        self._invalidate_responses('/guilds/{guild_id}', guild_id=data['id'])
         guild = self._get_guild(int(data['id']))
         if guild is not None:
             old_guild = copy.copy(guild)
             guild._from_data(data)
+            self._guild_snapshots.update_guild(guild.id, data)  # type: ignore
             self.dispatch('guild_update', old_guild, guild)
         else:
             _log.debug('GUILD_UPDATE referencing an unknown guild ID: %s. Discarding.', data['id'])
@@ -1357,9 +1568,8 @@ class ConnectionState(Generic[ClientT]):
 
         # do a cleanup of the messages cache
         if self._messages is not None:
-            self._messages: Optional[Deque[Message]] = deque(
-                (msg for msg in self._messages if msg.guild != guild), maxlen=self.max_messages
-            )
+            for msg in [msg for msg in self._messages if msg.guild == guild]:
+                self._messages.remove(msg)
 
         self._remove_guild(guild)
         self.dispatch('guild_remove', guild)
@@ -1395,12 +1605,14 @@ class ConnectionState(Generic[ClientT]):
         role_data = data['role']
         role = Role(guild=guild, data=role_data, state=self)
         guild._add_role(role)
+        self._guild_snapshots.set(guild.id, 'roles', role_data)  # type: ignore
         self.dispatch('guild_role_create', role)
 
     def parse_guild_role_delete(self, data: gw.GuildRoleDeleteEvent) -> None:
         guild = self._get_guild(int(data['guild_id']))
         if guild is not None:
             role_id = int(data['role_id'])
+            self._guild_snapshots.remove(guild.id, 'roles', (role_id,))
             try:
                 role = guild._remove_role(role_id)
             except KeyError:
@@ -1419,6 +1631,7 @@ class ConnectionState(Generic[ClientT]):
             if role is not None:
                 old_role = copy.copy(role)
                 role._update(role_data)
+                self._guild_snapshots.set(guild.id, 'roles', role_data)  # type: ignore
                 self.dispatch('guild_role_update', old_role, role)
         else:
             _log.debug('GUILD_ROLE_UPDATE referencing an unknown guild ID: %s. Discarding.', data['guild_id'])
@@ -1823,10 +2036,9 @@ class ConnectionState(Generic[ClientT]):
         if pm is not None:
             return pm
 
-        for guild in self.guilds:
-            channel = guild._resolve_channel(id)
-            if channel is not None:
-                return channel
+        guild = self._guilds.get(self._channel_guilds.get(id))  # type: ignore # None is never a key
+        if guild is not None:
+            return guild._resolve_channel(id)
 
     def create_message(self, *, channel: MessageableChannel, data: MessagePayload) -> Message:
         return Message(state=self, channel=channel, data=data)
@@ -1947,6 +2159,13 @@ class AutoShardedConnectionState(ConnectionState[ClientT]):
             self._ready_task.cancel()
 
         shard_id = data['shard'][0]  # shard_id, num_shards
+        session = self._restored_sessions.pop(shard_id, None)
+        if session is not None:
+            # The saved session could not be resumed, so the guilds restored from it may be stale
+            for guild_id in session.guild_ids:
+                guild = self._get_guild(guild_id)
+                if guild is not None:
+                    self._remove_guild(guild)
 
         if shard_id in self._ready_tasks:
             self._ready_tasks[shard_id].cancel()
@@ -1984,6 +2203,23 @@ class AutoShardedConnectionState(ConnectionState[ClientT]):
         if len(self._ready_tasks) == len(self.shard_ids):
             self._ready_task = asyncio.create_task(self._delay_ready())
 
+    async def _delay_restored_shard_ready(self, shard_id: int) -> None:
+        self.dispatch('shard_ready', shard_id)
+
+    def _resumed_session(self, session: GatewaySession) -> None:
+        shard_id: int = session.shard_id  # type: ignore # always set when sharded
+        if shard_id in self._ready_tasks:
+            self._ready_tasks[shard_id].cancel()
+
+        self._ready_tasks[shard_id] = asyncio.create_task(self._delay_restored_shard_ready(shard_id))
+
+        # The delay task for every shard has been started
+        if len(self._ready_tasks) == len(self.shard_ids):
+            self._ready_task = asyncio.create_task(self._delay_ready())
+
     def parse_resumed(self, data: gw.ResumedEvent) -> None:
         self.dispatch('resumed')
         self.dispatch('shard_resumed', data['__shard_id__'])  # type: ignore # This is an internal discord.py key
+        session = self._restored_sessions.pop(data['__shard_id__'], None)  # type: ignore # This is an internal discord.py key
+        if session is not None:
+            self._resumed_session(session)
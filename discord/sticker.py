@@ -23,7 +23,7 @@ DEALINGS IN THE SOFTWARE.
 """
 
 from __future__ import annotations
-from typing import Literal, TYPE_CHECKING, List, Optional, Tuple, Type, Union
+from typing import AsyncIterator, Literal, TYPE_CHECKING, List, Optional, Tuple, Type, Union
 import unicodedata
 
 from .mixins import Hashable
@@ -162,6 +162,40 @@ class _StickerTag(Hashable, AssetMixin):
             raise TypeError('Cannot read stickers of format "lottie".')
         return await super().read()
 
+    def stream(self, *, chunk_size: int = 65536, offset: int = 0) -> AsyncIterator[bytes]:
+        """Returns an :term:`asynchronous iterator` over the content of this sticker.
+
+        .. versionadded:: 2.8
+
+        .. note::
+
+            Stickers that use the :attr:`StickerFormatType.lottie` format cannot be read.
+
+        Parameters
+        ----------
+        chunk_size: :class:`int`
+            The maximum number of bytes to yield at a time.
+        offset: :class:`int`
+            The number of bytes to skip at the start of the sticker.
+
+        Raises
+        ------
+        HTTPException
+            Downloading the asset failed.
+        NotFound
+            The asset was deleted.
+        TypeError
+            The sticker is a lottie type.
+
+        Yields
+        -------
+        :class:`bytes`
+            The next chunk of the asset.
+        """
+        if self.format is StickerFormatType.lottie:
+            raise TypeError('Cannot read stickers of format "lottie".')
+        return super().stream(chunk_size=chunk_size, offset=offset)
+
 
 class StickerItem(_StickerTag):
     """Represents a sticker item.
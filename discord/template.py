@@ -27,6 +27,7 @@ from __future__ import annotations
 from typing import Any, Optional, TYPE_CHECKING, List
 from .utils import parse_time, _bytes_to_base64_data, MISSING, deprecated
 from .guild import Guild
+from .cache_storage import CacheStorage
 
 # fmt: off
 __all__ = (
@@ -41,6 +42,10 @@ if TYPE_CHECKING:
     from .user import User
 
 
+# The source guild of a template is not cached anywhere
+_default_cache_storage = CacheStorage()
+
+
 class _FriendlyHttpAttributeErrorHelper:
     __slots__ = ()
 
@@ -73,6 +78,14 @@ class _PartialTemplateState:
     def cache_guild_expressions(self):
         return False
 
+    @property
+    def cache_storage(self):
+        return _default_cache_storage
+
+    @property
+    def lazy_guilds(self):
+        return False
+
     def store_emoji(self, guild, packet) -> None:
         return None
 
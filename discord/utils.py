@@ -43,6 +43,7 @@ from typing import (
     Iterator,
     List,
     Literal,
+    MutableMapping,
     NamedTuple,
     Optional,
     Protocol,
@@ -278,6 +279,74 @@ class SequenceProxy(Sequence[T_co]):
         return self.__copied.count(value)
 
 
+class LazyMapping(MutableMapping[int, T]):
+    """A mapping that keeps raw payloads and only creates the objects from them
+    when they are accessed.
+
+    Objects are stored in ``objects``, which the created objects are moved to.
+    Iterating over the keys or checking the length does not create any objects.
+    """
+
+    __slots__ = ('objects', 'raw', 'factory')
+
+    def __init__(self, objects: MutableMapping[int, T], factory: Callable[[Any], T]) -> None:
+        self.objects: MutableMapping[int, T] = objects
+        self.raw: Dict[int, Any] = {}
+        self.factory: Callable[[Any], T] = factory
+
+    def __repr__(self) -> str:
+        return f'<LazyMapping objects={len(self.objects)} raw={len(self.raw)}>'
+
+    def add_raw(self, key: int, data: Any) -> None:
+        self.objects.pop(key, None)
+        self.raw[key] = data
+
+    def materialise(self) -> None:
+        while self.raw:
+            self[next(iter(self.raw))]
+
+    def __getitem__(self, key: int) -> T:
+        try:
+            return self.objects[key]
+        except KeyError:
+            # The payload is kept if the object cannot be created from it
+            value = self.objects[key] = self.factory(self.raw[key])
+            del self.raw[key]
+            return value
+
+    def __setitem__(self, key: int, value: T) -> None:
+        self.raw.pop(key, None)
+        self.objects[key] = value
+
+    def __delitem__(self, key: int) -> None:
+        try:
+            del self.raw[key]
+        except KeyError:
+            del self.objects[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.raw or key in self.objects
+
+    def __len__(self) -> int:
+        return len(self.objects) + len(self.raw)
+
+    def __iter__(self) -> Iterator[int]:
+        # Objects may be created while iterating
+        return iter([*self.objects, *self.raw])
+
+    def values(self) -> collections.abc.ValuesView[T]:
+        self.materialise()
+        return self.objects.values()
+
+    def items(self) -> collections.abc.ItemsView[int, T]:
+        self.materialise()
+        return self.objects.items()
+
+    def clear(self) -> None:
+        self.raw.clear()
+        self.objects.clear()
+
+
 @overload
 def parse_time(timestamp: None) -> None: ...
 
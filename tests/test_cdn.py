@@ -0,0 +1,347 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+from typing import List, Optional
+
+import discord
+import pytest
+from aiohttp import web
+
+from discord.http import HTTPClient, Route
+
+
+DATA = os.urandom(200_000)
+CUT = 50_000
+
+
+class FakeCDN:
+    def __init__(self, *, drops: int = 0, ranges: bool = True, delay: float = 0.0) -> None:
+        self.drops = drops
+        self.delay = delay
+        self.ranges = ranges
+        self.requests: List[Optional[str]] = []
+        self.app = web.Application()
+        self.app.router.add_get('/api/v10/users/@me', self.get_me)
+        self.app.router.add_get('/attachments/{name}', self.get_attachment)
+        self.runner = web.AppRunner(self.app)
+        self.url = ''
+
+    async def start(self) -> None:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = site._server.sockets[0].getsockname()[:2]  # type: ignore
+        self.url = f'http://{host}:{port}'
+
+    async def close(self) -> None:
+        await self.runner.cleanup()
+
+    async def get_me(self, request: web.Request) -> web.Response:
+        data = {'id': '1', 'username': 'bot', 'discriminator': '0', 'avatar': None}
+        return web.Response(body=json.dumps(data).encode(), content_type='application/json')
+
+    async def get_attachment(self, request: web.Request) -> web.StreamResponse:
+        header = request.headers.get('Range')
+        self.requests.append(header)
+        await asyncio.sleep(self.delay)
+        if request.match_info['name'] == 'missing.bin':
+            return web.Response(status=404)
+
+        start = 0
+        status = 200
+        if header is not None and self.ranges:
+            start = int(header[len('bytes=') : -1])
+            if start >= len(DATA):
+                return web.Response(status=416)
+            status = 206
+
+        body = DATA[start:]
+        response = web.StreamResponse(status=status)
+        response.content_length = len(body)
+        if status == 206:
+            response.headers['Content-Range'] = f'bytes {start}-{len(DATA) - 1}/{len(DATA)}'
+        await response.prepare(request)
+
+        if self.drops:
+            # Hang up part way through the body
+            self.drops -= 1
+            await response.write(body[:CUT])
+            request.transport.close()  # type: ignore
+            return response
+
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+
+async def login(cdn: FakeCDN, monkeypatch, *, asset_cache: Optional[discord.AssetCache] = None) -> HTTPClient:
+    await cdn.start()
+    monkeypatch.setattr(Route, 'BASE', cdn.url + '/api/v10')
+    http = HTTPClient(asyncio.get_running_loop(), asset_cache=asset_cache)
+    await http.static_login('token')
+    return http
+
+
+class FakeState:
+    def __init__(self, http: HTTPClient) -> None:
+        self.http = http
+
+
+def make_attachment(cdn: FakeCDN, http: HTTPClient, name: str = 'file.bin') -> discord.Attachment:
+    url = f'{cdn.url}/attachments/{name}'
+    data = {'id': '1', 'size': len(DATA), 'filename': name, 'url': url, 'proxy_url': url}
+    return discord.Attachment(data=data, state=FakeState(http))  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_after_dropped_connection(monkeypatch):
+    cdn = FakeCDN(drops=2)
+    http = await login(cdn, monkeypatch)
+    try:
+        attachment = make_attachment(cdn, http)
+        chunks = [chunk async for chunk in attachment.stream(chunk_size=4096)]
+        assert b''.join(chunks) == DATA
+        assert max(map(len, chunks)) <= 4096
+        assert cdn.requests == [None, f'bytes={CUT}-', f'bytes={CUT * 2}-']
+    finally:
+        await http.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_without_range_support(monkeypatch):
+    cdn = FakeCDN(drops=1, ranges=False)
+    http = await login(cdn, monkeypatch)
+    try:
+        attachment = make_attachment(cdn, http)
+        assert b''.join([chunk async for chunk in attachment.stream()]) == DATA
+        assert cdn.requests == [None, f'bytes={CUT}-']
+    finally:
+        await http.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_offset(monkeypatch):
+    cdn = FakeCDN()
+    http = await login(cdn, monkeypatch)
+    try:
+        attachment = make_attachment(cdn, http)
+        assert b''.join([chunk async for chunk in attachment.stream(offset=1234)]) == DATA[1234:]
+        assert [chunk async for chunk in attachment.stream(offset=len(DATA))] == []
+
+        with pytest.raises(discord.NotFound):
+            async for _ in make_attachment(cdn, http, 'missing.bin').stream():
+                pass
+    finally:
+        await http.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_save_and_to_file(monkeypatch, tmp_path):
+    cdn = FakeCDN(drops=1)
+    http = await login(cdn, monkeypatch)
+    try:
+        attachment = make_attachment(cdn, http)
+        path = tmp_path / 'file.bin'
+        assert await attachment.save(path) == len(DATA)
+        assert path.read_bytes() == DATA
+
+        buffer = io.BytesIO()
+        assert await attachment.save(buffer) == len(DATA)
+        assert buffer.read() == DATA
+
+        file = await attachment.to_file()
+        assert isinstance(file.fp, io.BytesIO)
+        assert file.filename == 'file.bin'
+        assert file.fp.read() == DATA
+
+        # Bigger downloads are kept on disk
+        monkeypatch.setattr(discord.file, '_SPOOL_MAX_SIZE', 1024)
+        file = await attachment.to_file(spoiler=True)
+        assert not isinstance(file.fp, io.BytesIO) or os.name != 'posix'
+        assert file.filename == 'SPOILER_file.bin'
+        assert file.fp.read() == DATA
+        file.close()
+        assert file.fp.closed
+    finally:
+        await http.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_save_keeps_existing_file(monkeypatch, tmp_path):
+    cdn = FakeCDN()
+    http = await login(cdn, monkeypatch)
+    try:
+        path = tmp_path / 'file.bin'
+        path.write_bytes(b'old')
+        with pytest.raises(discord.NotFound):
+            await make_attachment(cdn, http, 'missing.bin').save(path)
+
+        assert path.read_bytes() == b'old'
+        assert os.listdir(tmp_path) == ['file.bin']
+
+        assert await make_attachment(cdn, http).save(path) == len(DATA)
+        assert path.read_bytes() == DATA
+        assert os.listdir(tmp_path) == ['file.bin']
+    finally:
+        await http.close()
+        await cdn.close()
+
+
+def test_asset_cache_key():
+    url = 'https://cdn.discordapp.com/attachments/1/2/file.png'
+    assert discord.AssetCache.key(url) == url
+    assert discord.AssetCache.key(url + '?ex=1&is=2&hm=3') == url
+    assert discord.AssetCache.key(url + '?size=64&ex=1') == url + '?size=64'
+    assert discord.AssetCache.key(url + '?size=64') != discord.AssetCache.key(url + '?size=128')
+
+
+@pytest.mark.asyncio
+async def test_asset_cache_memory_eviction():
+    cache = discord.AssetCache(max_memory=10)
+    await cache.set('https://cdn/a', b'aaaa')
+    await cache.set('https://cdn/b', b'bbbb')
+    assert await cache.get('https://cdn/a') == b'aaaa'
+    await cache.set('https://cdn/c', b'cccc')
+    # b was used least recently
+    assert await cache.get('https://cdn/b') is None
+    assert await cache.get('https://cdn/a') == b'aaaa'
+    assert await cache.get('https://cdn/c') == b'cccc'
+    assert cache.memory_size == 8
+
+    await cache.set('https://cdn/big', b'x' * 11)
+    assert await cache.get('https://cdn/big') is None
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+@pytest.mark.asyncio
+async def test_asset_cache_deduplicates_downloads(monkeypatch):
+    cdn = FakeCDN(delay=0.05)
+    cache = discord.AssetCache()
+    http = await login(cdn, monkeypatch, asset_cache=cache)
+    try:
+        url = f'{cdn.url}/attachments/file.bin'
+        results = await asyncio.gather(*(http.get_from_cdn(f'{url}?ex={index}') for index in range(10)))
+        assert all(result == DATA for result in results)
+        assert len(cdn.requests) == 1
+        assert http._cdn_inflight == {}
+
+        assert await make_attachment(cdn, http).read() == DATA
+        assert len(cdn.requests) == 1
+        assert cache.hits >= 1
+
+        with pytest.raises(discord.NotFound):
+            await http.get_from_cdn(f'{cdn.url}/attachments/missing.bin')
+        assert await cache.get(f'{cdn.url}/attachments/missing.bin') is None
+    finally:
+        await http.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_asset_cache_serves_streams(monkeypatch, tmp_path):
+    cdn = FakeCDN()
+    cache = discord.AssetCache()
+    http = await login(cdn, monkeypatch, asset_cache=cache)
+    try:
+        attachment = make_attachment(cdn, http)
+        assert await attachment.read() == DATA
+        assert len(cdn.requests) == 1
+
+        chunks = [chunk async for chunk in attachment.stream(chunk_size=4096, offset=10)]
+        assert b''.join(chunks) == DATA[10:]
+        assert max(map(len, chunks)) <= 4096
+
+        path = tmp_path / 'file.bin'
+        assert await attachment.save(path) == len(DATA)
+        assert path.read_bytes() == DATA
+
+        file = await attachment.to_file()
+        assert file.fp.read() == DATA
+        assert len(cdn.requests) == 1
+    finally:
+        await http.close()
+        await cdn.close()
+
+
+@pytest.mark.asyncio
+async def test_asset_cache_disk(tmp_path):
+    size = 100
+    cache = discord.AssetCache(max_memory=0, path=tmp_path, max_disk=size * 2 + size // 2)
+    for name in 'abc':
+        await cache.set(f'https://cdn/{name}', name.encode() * size)
+        # Modification times decide the order across restarts
+        os.utime(tmp_path / cache._file_name(f'https://cdn/{name}'), (ord(name), ord(name)))
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert cache.disk_size == size * 2
+    assert await cache.get('https://cdn/a') is None
+    assert await cache.get('https://cdn/b') == b'b' * size
+
+    # A new cache picks up the content and recency from the directory
+    cache = discord.AssetCache(max_memory=0, path=tmp_path, max_disk=size * 2 + size // 2)
+    assert await cache.get('https://cdn/b') == b'b' * size
+    assert cache.disk_size == size * 2
+    await cache.set('https://cdn/d', b'd' * size)
+    assert await cache.get('https://cdn/c') is None
+    assert await cache.get('https://cdn/b') == b'b' * size
+
+    await cache.clear()
+    assert os.listdir(tmp_path) == []
+    assert cache.disk_size == 0
+
+
+@pytest.mark.asyncio
+async def test_asset_cache_disk_read_error_after_eviction(tmp_path, monkeypatch):
+    size = 100
+    cache = discord.AssetCache(max_memory=0, path=tmp_path, max_disk=size)
+    await cache.set('https://cdn/a', b'a' * size)
+    reading = asyncio.Event()
+    evicted = asyncio.Event()
+
+    def read(name: str) -> bytes:
+        loop.call_soon_threadsafe(reading.set)
+        asyncio.run_coroutine_threadsafe(evicted.wait(), loop).result()
+        raise OSError('gone')
+
+    loop = asyncio.get_running_loop()
+    monkeypatch.setattr(cache, '_read', read)
+    task = asyncio.create_task(cache.get('https://cdn/a'))
+    await reading.wait()
+    # Evicts a while it is being read
+    await cache.set('https://cdn/b', b'b' * size)
+    evicted.set()
+
+    assert await task is None
+    assert cache.disk_size == size
+    assert os.listdir(tmp_path) == [cache._file_name('https://cdn/b')]
@@ -0,0 +1,284 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+import pytest
+import yarl
+from aiohttp import WSMsgType, web
+
+import discord
+from discord import ClusterError
+from discord._ipc import Channel
+from discord.cluster import ClusterClient, ClusterCoordinator, ShardCluster
+
+
+SHARD_COUNT = 4
+USER = {'id': '1000', 'username': 'bot', 'discriminator': '0', 'avatar': None, 'bot': True}
+APPLICATION = {
+    'id': '1000',
+    'name': 'bot',
+    'description': '',
+    'icon': None,
+    'bot_public': True,
+    'bot_require_code_grant': False,
+    'owner': USER,
+    'verify_key': '',
+    'flags': 0,
+}
+
+
+def guild_id(shard_id: int, index: int) -> int:
+    return ((index * SHARD_COUNT + shard_id) << 22) | 1
+
+
+class FakeDiscord:
+    """A fake REST API and gateway that serves two guilds per shard."""
+
+    def __init__(self) -> None:
+        self.identifies: List[Tuple[int, float]] = []
+        self.presences: List[Tuple[int, Dict[str, Any]]] = []
+        self.app = web.Application()
+        self.app.router.add_get('/api/v10/users/@me', self.get_user)
+        self.app.router.add_get('/api/v10/oauth2/applications/@me', self.get_application)
+        self.app.router.add_get('/gateway', self.gateway)
+        self.runner = web.AppRunner(self.app)
+        self.url = ''
+
+    async def start(self) -> None:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = site._server.sockets[0].getsockname()[:2]  # type: ignore
+        self.url = f'http://{host}:{port}'
+
+    async def close(self) -> None:
+        await self.runner.cleanup()
+
+    def json_response(self, data: Any) -> web.Response:
+        # The library only decodes responses with an exact application/json content type
+        return web.Response(body=json.dumps(data).encode(), content_type='application/json')
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        return self.json_response(USER)
+
+    async def get_application(self, request: web.Request) -> web.Response:
+        return self.json_response(APPLICATION)
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json({'op': 10, 'd': {'heartbeat_interval': 45000}, 's': None, 't': None})
+
+        shard_id = None
+        async for msg in ws:
+            if msg.type is not WSMsgType.TEXT:
+                break
+
+            payload = json.loads(msg.data)
+            if payload['op'] == 1:
+                await ws.send_json({'op': 11, 'd': None, 's': None, 't': None})
+            elif payload['op'] == 2:
+                shard_id = payload['d']['shard'][0]
+                self.identifies.append((shard_id, asyncio.get_running_loop().time()))
+                guilds = [guild_id(shard_id, index) for index in range(2)]
+                ready = {
+                    'v': 10,
+                    'user': USER,
+                    'guilds': [{'id': str(id), 'unavailable': True} for id in guilds],
+                    'session_id': f'session-{shard_id}',
+                    'resume_gateway_url': self.url + '/gateway',
+                    'shard': [shard_id, SHARD_COUNT],
+                    'application': {'id': APPLICATION['id'], 'flags': 0},
+                }
+                await ws.send_json({'op': 0, 's': 1, 't': 'READY', 'd': ready})
+                for sequence, id in enumerate(guilds, start=2):
+                    guild = {
+                        'id': str(id),
+                        'name': f'guild-{id}',
+                        'owner_id': USER['id'],
+                        'member_count': 10,
+                        'roles': [],
+                        'channels': [],
+                        'members': [],
+                        'emojis': [],
+                        'stickers': [],
+                        'features': [],
+                    }
+                    await ws.send_json({'op': 0, 's': sequence, 't': 'GUILD_CREATE', 'd': guild})
+            elif payload['op'] == 3:
+                self.presences.append((shard_id, payload['d']))  # type: ignore
+
+        return ws
+
+
+class ReadyClient(discord.AutoShardedClient):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(intents=discord.Intents(guilds=True), **kwargs)
+        self.ready = asyncio.Event()
+
+    async def on_ready(self) -> None:
+        self.ready.set()
+
+
+def test_split_shards():
+    cluster = ShardCluster(lambda: None, 'token', clusters=3)  # type: ignore
+    assert cluster._split_shards(list(range(8))) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert cluster._split_shards([0, 1]) == [[0], [1]]
+
+
+@pytest.mark.asyncio
+async def test_clusters_with_fake_gateway(monkeypatch):
+    fake = FakeDiscord()
+    await fake.start()
+    monkeypatch.setattr(discord.http.Route, 'BASE', fake.url + '/api/v10')
+    monkeypatch.setattr(discord.gateway.DiscordWebSocket, 'DEFAULT_GATEWAY', yarl.URL(fake.url + '/gateway'))
+
+    path = os.path.join(tempfile.mkdtemp(), 'cluster.sock')
+    coordinator = ClusterCoordinator(path, max_concurrency=2, identify_delay=0.2)
+    await coordinator.start()
+    loop = asyncio.get_running_loop()
+    granted: List[Tuple[int, float]] = []
+    identify = coordinator._identify
+
+    async def record_identify(shard_id: int) -> None:
+        await identify(shard_id)
+        granted.append((shard_id, loop.time()))
+
+    monkeypatch.setattr(coordinator, '_identify', record_identify)
+
+    clients: List[ReadyClient] = []
+    for cluster_id, shard_ids in enumerate(([0, 1], [2, 3])):
+        client = ReadyClient(shard_ids=shard_ids, shard_count=SHARD_COUNT, identify_concurrency=2, guild_ready_timeout=0.1)
+        client.cluster = ClusterClient(client, path, cluster_id=cluster_id, cluster_count=2)
+        clients.append(client)
+
+    tasks = [asyncio.create_task(client.start('token')) for client in clients]
+    try:
+        await asyncio.wait_for(asyncio.gather(*(client.ready.wait() for client in clients)), timeout=10)
+
+        # Shards 0 and 2 share a bucket but run in different clusters
+        assert sorted(shard_id for shard_id, _ in fake.identifies) == [0, 1, 2, 3]
+        times: Dict[int, List[float]] = {}
+        for shard_id, when in granted:
+            times.setdefault(shard_id % 2, []).append(when)
+        for bucket in times.values():
+            assert len(bucket) == 2
+            assert bucket[1] - bucket[0] >= 0.19
+
+        cluster = clients[0].cluster
+        assert cluster is not None
+        assert await cluster.guild_count() == 8
+        assert [shard_id for shard_id, _ in await cluster.latencies()] == [0, 1, 2, 3]
+
+        guild = await cluster.query_guild(guild_id(3, 1))
+        assert guild is not None
+        assert guild.cluster_id == 1
+        assert guild.shard_id == 3
+        assert guild.name == f'guild-{guild_id(3, 1)}'
+        assert await cluster.query_guild(guild_id(3, 5)) is None
+
+        await cluster.change_presence(activity=discord.Game('cluster'), status=discord.Status.idle)
+        for _ in range(50):
+            if len(fake.presences) == SHARD_COUNT:
+                break
+            await asyncio.sleep(0.02)
+        assert sorted(shard_id for shard_id, _ in fake.presences) == [0, 1, 2, 3]
+        assert all(data['status'] == 'idle' for _, data in fake.presences)
+        assert all(data['activities'][0]['name'] == 'cluster' for _, data in fake.presences)
+    finally:
+        for client in clients:
+            await client.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await coordinator.close()
+        await fake.close()
+
+
+async def resolve_responses(channel: Channel) -> None:
+    # Answers nothing, like a cluster whose event loop is stuck
+    while True:
+        payload = await channel.read()
+        if payload is None:
+            return
+        if payload['op'] == 'response':
+            channel.resolve(payload)
+
+
+@pytest.mark.asyncio
+async def test_coordinator_times_out_unresponsive_clusters():
+    path = os.path.join(tempfile.mkdtemp(), 'cluster.sock')
+    coordinator = ClusterCoordinator(path, timeout=0.1)
+    await coordinator.start()
+
+    channels: List[Channel] = []
+    for _ in range(2):
+        reader, writer = await asyncio.open_unix_connection(path)
+        channels.append(Channel(reader, writer))
+    hung, caller = channels
+    tasks = [asyncio.create_task(resolve_responses(channel)) for channel in channels]
+    try:
+        await hung.request('hello', {'cluster_id': 0, 'shard_ids': [0]}, timeout=1)
+        for shard_id in (0, None):
+            query = {'name': 'guild_count', 'args': [], 'shard_id': shard_id}
+            with pytest.raises(ClusterError, match='did not answer in time'):
+                await caller.request('query', query, timeout=1)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for channel in channels:
+            channel.close()
+        await coordinator.close()
+
+
+@pytest.mark.asyncio
+async def test_coordinator_drops_oversized_messages(monkeypatch, caplog):
+    monkeypatch.setattr(discord.cluster, 'STREAM_LIMIT', 1024)
+    path = os.path.join(tempfile.mkdtemp(), 'cluster.sock')
+    coordinator = ClusterCoordinator(path)
+    await coordinator.start()
+
+    channels: List[Channel] = []
+    for _ in range(2):
+        reader, writer = await asyncio.open_unix_connection(path)
+        channels.append(Channel(reader, writer))
+    oversized, other = channels
+    try:
+        oversized.send('hello', {'cluster_id': 0, 'shard_ids': list(range(1000))}, nonce=0)
+        assert await asyncio.wait_for(oversized.read(), timeout=1) is None
+        assert 'longer than its stream limit' in caplog.text
+
+        task = asyncio.create_task(resolve_responses(other))
+        await other.request('hello', {'cluster_id': 1, 'shard_ids': [1]}, timeout=1)
+        task.cancel()
+        assert [worker.cluster_id for worker in coordinator._workers] == [1]
+    finally:
+        for channel in channels:
+            channel.close()
+        await coordinator.close()
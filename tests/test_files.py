@@ -26,8 +26,10 @@ from __future__ import annotations
 
 from io import BytesIO
 
+import aiohttp
 import discord
 import pytest
+from aiohttp import web
 
 
 FILE = BytesIO()
@@ -183,3 +185,72 @@ def test_file_to_dict():
     assert data["id"] == 0
     assert data["filename"] == ".gitignore"
     assert data["description"] == "test description"
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_file_source_readers_are_independent(tmp_path, use_mmap):
+    path = tmp_path / 'data.bin'
+    data = bytes(range(256)) * 100
+    path.write_bytes(data)
+
+    with discord.FileSource(path, mmap=use_mmap) as source:
+        assert source.size == len(data)
+        first = source.to_file()
+        second = source.to_file('other.bin', spoiler=True)
+        assert first.filename == 'data.bin'
+        assert second.filename == 'SPOILER_other.bin'
+
+        assert first.fp.read(10) == data[:10]
+        assert second.fp.read() == data
+        assert first.fp.read(10) == data[10:20]
+
+        # Retries start over from the beginning
+        second.reset(seek=1)
+        assert second.fp.read(5) == data[:5]
+        first.close()
+        second.close()
+
+
+def test_file_source_empty(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    with discord.FileSource(path, mmap=True) as source:
+        assert source.to_file().fp.read() == b''
+
+
+@pytest.mark.asyncio
+async def test_file_source_upload(tmp_path):
+    path = tmp_path / 'data.bin'
+    data = bytes(range(256)) * 4096
+    path.write_bytes(data)
+    received = []
+
+    async def upload(request: web.Request) -> web.Response:
+        assert request.content_length is not None
+        reader = await request.multipart()
+        async for part in reader:
+            received.append(await part.read())  # type: ignore
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post('/upload', upload)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = site._server.sockets[0].getsockname()[:2]  # type: ignore
+
+    try:
+        with discord.FileSource(path) as source:
+            async with aiohttp.ClientSession() as session:
+                for _ in range(2):
+                    file = source.to_file()
+                    form = aiohttp.FormData(quote_fields=False)
+                    form.add_field(name='files[0]', value=file.fp, filename=file.filename)
+                    async with session.post(f'http://{host}:{port}/upload', data=form) as resp:
+                        assert resp.status == 200
+                    file.close()
+    finally:
+        await runner.cleanup()
+
+    assert received == [data, data]
@@ -0,0 +1,345 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from typing import Any, List, Set
+from unittest import mock
+
+import discord
+import pytest
+
+from discord.gateway import DiscordWebSocket, GatewayRatelimiter, HeartbeatScheduler, KeepAliveHandler
+from discord.state import ChunkRequest, ConnectionState
+
+
+def make_websocket(*, listening: Set[str], lazy: bool = True, **options: Any) -> DiscordWebSocket:
+    dispatched: List[str] = []
+    state = ConnectionState(
+        dispatch=lambda event, *args: dispatched.append(event),
+        handlers={},
+        hooks={},
+        http=mock.MagicMock(),
+        intents=discord.Intents.default(),
+        enable_lazy_dispatch=lazy,
+        **options,
+    )
+    state._has_listeners = lambda event: event in listening
+
+    ws = DiscordWebSocket(mock.MagicMock(), loop=asyncio.get_running_loop())
+    ws._connection = state
+    ws._discord_parsers = state.parsers
+    ws._dispatch = state.dispatch
+    ws._lazy_dispatch = lazy
+    ws.shard_id = None
+    return ws
+
+
+TYPING = '{"t":"TYPING_START","s":%d,"op":0,"d":{"user_id":"1","timestamp":1,"channel_id":"2"}}'
+
+
+@pytest.mark.asyncio
+async def test_lazy_dispatch_skips_unwanted_events():
+    ws = make_websocket(listening=set())
+    parser = mock.MagicMock()
+    ws._discord_parsers = {'TYPING_START': parser}
+
+    await ws.received_message(TYPING % 5)
+
+    parser.assert_not_called()
+    assert ws.sequence == 5
+    assert ws._connection._dispatch_counts == {'TYPING_START': [0, 1]}
+
+
+@pytest.mark.asyncio
+async def test_lazy_dispatch_parses_wanted_events():
+    ws = make_websocket(listening={'raw_typing'})
+    parser = mock.MagicMock()
+    ws._discord_parsers = {'TYPING_START': parser}
+
+    await ws.received_message(TYPING % 7)
+
+    parser.assert_called_once()
+    assert ws.sequence == 7
+    assert ws._connection._dispatch_counts == {'TYPING_START': [1, 0]}
+
+
+@pytest.mark.asyncio
+async def test_lazy_dispatch_always_parses_cache_events():
+    ws = make_websocket(listening=set())
+    parser = mock.MagicMock()
+    ws._discord_parsers = {'CHANNEL_DELETE': parser}
+
+    await ws.received_message('{"t":"CHANNEL_DELETE","s":3,"op":0,"d":{"id":"1","type":0}}')
+
+    parser.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_lazy_dispatch_disabled():
+    ws = make_websocket(listening=set(), lazy=False)
+    parser = mock.MagicMock()
+    ws._discord_parsers = {'TYPING_START': parser}
+
+    await ws.received_message(TYPING % 1)
+
+    parser.assert_called_once()
+    assert ws._connection._dispatch_counts == {}
+
+
+@pytest.mark.asyncio
+async def test_large_frames_are_decoded_in_executor():
+    ws = make_websocket(listening=set(), lazy=False, gateway_offload_threshold=64)
+    ws._offload_threshold = 64
+    ws._offload_executor = ws._connection._get_gateway_executor()
+    calls = []
+    ws._discord_parsers = {'GUILD_CREATE': lambda data: calls.append((threading.get_ident(), data['id']))}
+    decode = mock.Mock(wraps=ws._decode_frame)
+    ws._decode_frame = decode
+
+    frames = [
+        '{"t":"GUILD_CREATE","s":%d,"op":0,"d":{"id":"%d","padding":"%s"}}' % (seq, seq, 'x' * 64) for seq in range(1, 4)
+    ]
+    for frame in frames:
+        await ws.received_message(frame)
+
+    await ws._connection.close()
+
+    assert decode.call_count == 3
+    assert [guild_id for _, guild_id in calls] == ['1', '2', '3']
+    assert all(thread_id == threading.get_ident() for thread_id, _ in calls)
+    assert ws.sequence == 3
+
+
+@pytest.mark.asyncio
+async def test_small_frames_are_decoded_inline():
+    ws = make_websocket(listening=set(), lazy=False)
+    ws._offload_threshold = 1024
+    ws._offload_executor = executor = mock.MagicMock()
+    ws._discord_parsers = {'TYPING_START': mock.MagicMock()}
+
+    await ws.received_message(TYPING % 1)
+
+    executor.submit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_is_indexed_by_event():
+    ws = make_websocket(listening=set(), lazy=False)
+    ws._discord_parsers = {}
+
+    typing = ws.wait_for('TYPING_START', lambda d: d['user_id'] == '1')
+    other = ws.wait_for('TYPING_START', lambda d: d['user_id'] == '2')
+    unrelated = ws.wait_for('MESSAGE_CREATE', lambda d: True)
+    assert set(ws._dispatch_listeners) == {'TYPING_START', 'MESSAGE_CREATE'}
+
+    await ws.received_message(TYPING % 1)
+
+    assert typing.result()['user_id'] == '1'
+    assert not other.done()
+    assert list(ws._dispatch_listeners['TYPING_START'].values())[0].future is other
+
+    other.cancel()
+    unrelated.cancel()
+    await asyncio.sleep(0)
+    assert ws._dispatch_listeners == {}
+
+
+@pytest.mark.asyncio
+async def test_wait_for_predicate_error_is_propagated():
+    ws = make_websocket(listening=set(), lazy=False)
+    ws._discord_parsers = {}
+
+    future = ws.wait_for('TYPING_START', lambda d: 1 / 0)
+    await ws.received_message(TYPING % 1)
+
+    with pytest.raises(ZeroDivisionError):
+        future.result()
+    assert ws._dispatch_listeners == {}
+
+
+def make_heartbeat_ws(sequence: int) -> mock.MagicMock:
+    ws = mock.MagicMock()
+    ws.HEARTBEAT = DiscordWebSocket.HEARTBEAT
+    ws.sequence = sequence
+    ws.thread_id = threading.get_ident()
+    ws._max_heartbeat_timeout = 60.0
+    ws.send_heartbeat = mock.AsyncMock()
+    ws.close = mock.AsyncMock()
+    return ws
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_scheduler_runs_handlers_without_threads():
+    scheduler = HeartbeatScheduler(asyncio.get_running_loop(), watchdog=False)
+    first, second = make_heartbeat_ws(1), make_heartbeat_ws(2)
+    handlers = [
+        KeepAliveHandler(ws=first, interval=0.01, shard_id=0, scheduler=scheduler),
+        KeepAliveHandler(ws=second, interval=0.02, shard_id=1, scheduler=scheduler),
+    ]
+    threads = threading.active_count()
+    for handler in handlers:
+        handler.start()
+
+    await asyncio.sleep(0.1)
+    assert threading.active_count() == threads
+    assert len(scheduler) == 2
+    first.send_heartbeat.assert_awaited_with({'op': 1, 'd': 1})
+    second.send_heartbeat.assert_awaited_with({'op': 1, 'd': 2})
+    assert first.send_heartbeat.await_count > second.send_heartbeat.await_count
+
+    handlers[0].stop()
+    await asyncio.sleep(0.05)
+    assert len(scheduler) == 1
+
+    handlers[1].ack()
+    assert handlers[1].latency < 1
+
+    scheduler.close()
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_scheduler_closes_unresponsive_shards():
+    scheduler = HeartbeatScheduler(asyncio.get_running_loop(), watchdog=False)
+    ws = make_heartbeat_ws(1)
+    ws._max_heartbeat_timeout = 0.0
+    handler = KeepAliveHandler(ws=ws, interval=0.01, shard_id=0, scheduler=scheduler)
+    handler.start()
+
+    await asyncio.sleep(0.05)
+    ws.close.assert_awaited_once_with(4000)
+    ws.send_heartbeat.assert_not_awaited()
+    assert handler.is_stopped()
+    scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_ratelimiter_releases_by_priority():
+    limiter = GatewayRatelimiter(count=1, per=0.05)
+    await limiter.block()
+
+    order: List[str] = []
+
+    async def send(name: str, priority: int) -> None:
+        await limiter.block(priority)
+        order.append(name)
+
+    tasks = [
+        asyncio.create_task(send('chunk 1', GatewayRatelimiter.LOW)),
+        asyncio.create_task(send('chunk 2', GatewayRatelimiter.LOW)),
+        asyncio.create_task(send('presence', GatewayRatelimiter.HIGH)),
+    ]
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 3
+
+    await asyncio.gather(*tasks)
+
+    assert order == ['presence', 'chunk 1', 'chunk 2']
+    stats = limiter.get_stats()
+    assert stats.queue_depth == 0
+    assert stats.sent == 4
+    assert stats.delayed == 3
+    assert stats.max_wait > 0
+    assert stats.average_wait > 0
+
+
+@pytest.mark.asyncio
+async def test_ratelimiter_skips_cancelled_sends():
+    limiter = GatewayRatelimiter(count=1, per=0.05)
+    await limiter.block()
+
+    cancelled = asyncio.create_task(limiter.block(GatewayRatelimiter.HIGH))
+    waiting = asyncio.create_task(limiter.block(GatewayRatelimiter.LOW))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    await asyncio.wait_for(waiting, timeout=1)
+    assert limiter.get_stats().sent == 2
+
+
+@pytest.mark.asyncio
+async def test_chunk_requests_are_coalesced():
+    ws = make_websocket(listening=set(), coalesce_chunk_requests=True)
+    ws._coalesce_chunk_requests = True
+    ws._rate_limiter = GatewayRatelimiter(count=1, per=0.05)
+    ws._send_frame = mock.AsyncMock()
+    state = ws._connection
+
+    requests = []
+    for guild_id in (1, 2):
+        request = ChunkRequest(guild_id, 0, asyncio.get_running_loop(), lambda _: None)
+        state._chunk_requests[request.nonce] = request
+        requests.append(request)
+
+    await ws._rate_limiter.block()
+    await asyncio.gather(
+        ws.request_chunks(1, query='', limit=0, nonce=requests[0].nonce),
+        ws.request_chunks(2, query='', limit=0, nonce=requests[1].nonce),
+        ws.request_chunks(3, limit=0, user_ids=[10], nonce='other'),
+    )
+
+    payloads = [json.loads(call.args[0]) for call in ws._send_frame.await_args_list]
+    assert len(payloads) == 2
+    merged = next(payload['d'] for payload in payloads if 'user_ids' not in payload['d'])
+    assert merged['guild_id'] == [1, 2]
+    assert merged['nonce'] == requests[0].nonce
+    assert requests[1].nonce == requests[0].nonce
+    assert ws._rate_limiter.get_stats().coalesced == 1
+
+
+@pytest.mark.asyncio
+async def test_coalesced_chunk_request_survives_cancelled_sender():
+    ws = make_websocket(listening=set(), coalesce_chunk_requests=True)
+    ws._coalesce_chunk_requests = True
+    ws._rate_limiter = GatewayRatelimiter(count=1, per=0.05)
+    ws._send_frame = mock.AsyncMock()
+
+    await ws._rate_limiter.block()
+    leader = asyncio.create_task(ws.request_chunks(1, query='', limit=0))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(ws.request_chunks(2, query='', limit=0))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    await asyncio.wait_for(follower, timeout=1)
+    assert leader.cancelled()
+    payloads = [json.loads(call.args[0]) for call in ws._send_frame.await_args_list]
+    assert [payload['d']['guild_id'] for payload in payloads] == [2]
+
+
+@pytest.mark.asyncio
+async def test_chunk_requests_are_not_coalesced_by_default():
+    ws = make_websocket(listening=set())
+    ws._rate_limiter = GatewayRatelimiter(count=1, per=0.05)
+    ws._send_frame = mock.AsyncMock()
+
+    await ws._rate_limiter.block()
+    await asyncio.gather(ws.request_chunks(1, query='', limit=0), ws.request_chunks(2, query='', limit=0))
+
+    payloads = [json.loads(call.args[0]) for call in ws._send_frame.await_args_list]
+    assert sorted(payload['d']['guild_id'] for payload in payloads) == [1, 2]
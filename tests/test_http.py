@@ -24,12 +24,16 @@ DEALINGS IN THE SOFTWARE.
 
 from __future__ import annotations
 
+import asyncio
+import json
 from io import BytesIO
+from typing import Any, Dict, List, Optional, Set
 
 import discord
 import pytest
+from aiohttp import web
 
-from discord.http import handle_message_parameters
+from discord.http import HTTPClient, Route, _RequestScheduler, handle_message_parameters
 from discord.webhook.async_ import interaction_message_response_params
 
 
@@ -51,3 +55,412 @@ def test_interaction_message_response_params_rejects_too_many_files():
         interaction_message_response_params(type=4, content='test', files=files)
 
 
+
+
+class FakeUsers:
+    def __init__(self) -> None:
+        self.requests: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # User IDs that were already rate limited once
+        self.limited: Set[str] = set()
+        self.app = web.Application()
+        self.app.router.add_get('/api/v10/users/{user_id}', self.get_user)
+        self.runner = web.AppRunner(self.app)
+        self.url = ''
+
+    async def start(self) -> None:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = site._server.sockets[0].getsockname()[:2]  # type: ignore
+        self.url = f'http://{host}:{port}'
+
+    async def close(self) -> None:
+        await self.runner.cleanup()
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        user_id = request.match_info['user_id']
+        self.requests.append(request.path_qs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self.in_flight -= 1
+        if user_id == '404':
+            body = {'message': 'Unknown User', 'code': 10013}
+            return web.Response(body=json.dumps(body).encode(), status=404, content_type='application/json')
+
+        if user_id in ('bucket', 'global') and user_id not in self.limited:
+            self.limited.add(user_id)
+            body = {'message': 'You are being rate limited.', 'retry_after': 0.01, 'global': user_id == 'global'}
+            headers = {'Via': '1.1 google', 'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Bucket': 'users'}
+            return web.Response(body=json.dumps(body).encode(), status=429, headers=headers, content_type='application/json')
+        if user_id == 'cloudflare':
+            return web.Response(text='error code: 1015', status=429)
+
+        user = {'id': '1000' if user_id == '@me' else user_id, 'username': 'user', 'discriminator': '0', 'avatar': None}
+        headers = {
+            'X-Ratelimit-Bucket': 'users',
+            'X-Ratelimit-Limit': '50',
+            'X-Ratelimit-Remaining': '49',
+            'X-Ratelimit-Reset-After': '1.0',
+        }
+        return web.Response(body=json.dumps(user).encode(), headers=headers, content_type='application/json')
+
+
+async def login(
+    users: FakeUsers, monkeypatch, *, coalesce: bool = False, metrics: Optional[discord.HTTPMetrics] = None
+) -> HTTPClient:
+    await users.start()
+    monkeypatch.setattr(Route, 'BASE', users.url + '/api/v10')
+    http = HTTPClient(asyncio.get_running_loop(), coalesce_get_requests=coalesce, metrics=metrics)
+    await http.static_login('token')
+    return http
+
+
+@pytest.mark.asyncio
+async def test_coalesce_identical_get_requests(monkeypatch):
+    users = FakeUsers()
+    http = await login(users, monkeypatch, coalesce=True)
+    try:
+        route = Route('GET', '/users/{user_id}', user_id=1)
+        results = await asyncio.gather(*(http.request(route) for _ in range(10)))
+        assert users.requests.count('/api/v10/users/1') == 1
+        assert all(result == {'id': '1', 'username': 'user', 'discriminator': '0', 'avatar': None} for result in results)
+        # Every caller gets its own copy of the response
+        assert len({id(result) for result in results}) == 10
+        assert http._coalesce_counts['GET /users/{user_id}'] == [9, 1]
+
+        # Different parameters or sequential requests are not shared
+        await asyncio.gather(http.request(route), http.request(route, params={'with_counts': 1}))
+        await http.request(route)
+        assert users.requests.count('/api/v10/users/1') == 3
+        assert users.requests.count('/api/v10/users/1?with_counts=1') == 1
+    finally:
+        await http.close()
+        await users.close()
+
+
+@pytest.mark.asyncio
+async def test_coalesce_first_consumer_mutating_payload(monkeypatch):
+    users = FakeUsers()
+    http = await login(users, monkeypatch, coalesce=True)
+    try:
+        route = Route('GET', '/users/{user_id}', user_id=1)
+
+        async def consume(mutate: bool) -> Dict[str, Any]:
+            data = await http.request(route)
+            if mutate:
+                # e.g. models setting or popping keys of their payload
+                data['guild_id'] = '5'
+                data.pop('username')
+            return data
+
+        first = asyncio.create_task(consume(True))
+        await asyncio.sleep(0)
+        others = await asyncio.gather(*(consume(False) for _ in range(3)))
+        await first
+        assert users.requests.count('/api/v10/users/1') == 1
+        assert all(data == {'id': '1', 'username': 'user', 'discriminator': '0', 'avatar': None} for data in others)
+    finally:
+        await http.close()
+        await users.close()
+
+
+@pytest.mark.asyncio
+async def test_coalesce_shares_errors_and_survives_cancellation(monkeypatch):
+    users = FakeUsers()
+    http = await login(users, monkeypatch, coalesce=True)
+    try:
+        route = Route('GET', '/users/{user_id}', user_id=404)
+        results = await asyncio.gather(*(http.request(route) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, discord.NotFound) for result in results)
+        assert users.requests.count('/api/v10/users/404') == 1
+
+        route = Route('GET', '/users/{user_id}', user_id=2)
+        first = asyncio.create_task(http.request(route))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(http.request(route))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert (await second)['id'] == '2'
+        assert users.requests.count('/api/v10/users/2') == 1
+    finally:
+        await http.close()
+        await users.close()
+
+
+@pytest.mark.asyncio
+async def test_coalesce_disabled(monkeypatch):
+    users = FakeUsers()
+    http = await login(users, monkeypatch, coalesce=False)
+    try:
+        route = Route('GET', '/users/{user_id}', user_id=1)
+        await asyncio.gather(*(http.request(route) for _ in range(3)))
+        assert users.requests.count('/api/v10/users/1') == 3
+        assert http._coalesce_counts == {}
+    finally:
+        await http.close()
+        await users.close()
+
+
+@pytest.mark.asyncio
+async def test_response_cache(monkeypatch):
+    users = FakeUsers()
+    await users.start()
+    monkeypatch.setattr(Route, 'BASE', users.url + '/api/v10')
+    cache = discord.ResponseCache(routes={'GET /users/{user_id}': 60.0}, max_size=2)
+    http = HTTPClient(asyncio.get_running_loop(), response_cache=cache)
+    await http.static_login('token')
+    try:
+        route = Route('GET', '/users/{user_id}', user_id=1)
+        first = await http.request(route)
+        first['username'] = 'mutated'
+        second = await http.request(route)
+        assert second['username'] == 'user'
+        assert users.requests.count('/api/v10/users/1') == 1
+        assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+        # Other query parameters are cached separately but invalidated together
+        await http.request(route, params={'with_counts': 1})
+        assert len(cache) == 2
+        cache.invalidate(Route('GET', '/users/{user_id}', user_id='1'))
+        assert len(cache) == 0
+
+        # The least recently used response is evicted
+        for user_id in (1, 2, 1, 3):
+            await http.request(Route('GET', '/users/{user_id}', user_id=user_id))
+        assert len(cache) == 2
+        assert cache.get(Route('GET', '/users/{user_id}', user_id=2)) is None
+        assert cache.get(Route('GET', '/users/{user_id}', user_id=1)) is not None
+
+        # Uncached routes and errors are not stored
+        await http.request(Route('GET', '/users/@me'))
+        with pytest.raises(discord.NotFound):
+            await http.request(Route('GET', '/users/{user_id}', user_id=404))
+        assert len(cache) == 2
+
+        # Modifying a resource drops the cached responses for it
+        with pytest.raises(discord.HTTPException):
+            await http.request(Route('PATCH', '/users/{user_id}', user_id=1), json={})
+        assert cache.get(Route('GET', '/users/{user_id}', user_id=1)) is None
+    finally:
+        await http.close()
+        await users.close()
+
+
+@pytest.mark.asyncio
+async def test_response_cache_skips_responses_invalidated_in_flight(monkeypatch):
+    users = FakeUsers()
+    await users.start()
+    monkeypatch.setattr(Route, 'BASE', users.url + '/api/v10')
+    cache = discord.ResponseCache(routes={'GET /users/{user_id}': 60.0})
+    http = HTTPClient(asyncio.get_running_loop(), response_cache=cache)
+    await http.static_login('token')
+    try:
+        route = Route('GET', '/users/{user_id}', user_id=1)
+        task = asyncio.create_task(http.request(route))
+        await asyncio.sleep(0.02)
+        # e.g. a USER_UPDATE received while the request was in flight
+        cache.invalidate(route)
+        await task
+        assert len(cache) == 0
+        assert cache._in_flight == {}
+        assert cache._invalidated == {}
+
+        await http.request(route)
+        assert len(cache) == 1
+    finally:
+        await http.close()
+        await users.close()
+
+
+def test_response_cache_expiry_and_children(monkeypatch):
+    cache = discord.ResponseCache()
+    now = 100.0
+    monkeypatch.setattr('discord.response_cache.time.monotonic', lambda: now)
+
+    emojis = Route('GET', '/guilds/{guild_id}/emojis', guild_id=1)
+    emoji = Route('GET', '/guilds/{guild_id}/emojis/{emoji_id}', guild_id=1, emoji_id=2)
+    member = Route('GET', '/guilds/{guild_id}/members/{user_id}', guild_id=1, user_id=3)
+    cache.set(emojis, None, [{'id': '2'}])
+    cache.set(emoji, None, {'id': '2'})
+    cache.set(member, None, {'user': {'id': '3'}})
+    assert cache.get(member) == {'user': {'id': '3'}}
+
+    now += 61.0
+    assert cache.get(member) is None
+    assert cache.get(emoji) == {'id': '2'}
+
+    cache.invalidate(emojis, children=True)
+    assert len(cache) == 0
+    assert cache.hit_rate == pytest.approx(2 / 3)
+
+
+def test_response_cache_modified_parents():
+    cache = discord.ResponseCache()
+    channel = Route('GET', '/channels/{channel_id}', channel_id=1)
+    emojis = Route('GET', '/guilds/{guild_id}/emojis', guild_id=1)
+    emoji = Route('GET', '/guilds/{guild_id}/emojis/{emoji_id}', guild_id=1, emoji_id=2)
+    other_emojis = Route('GET', '/guilds/{guild_id}/emojis', guild_id=3)
+    commands = Route('GET', '/applications/{application_id}/commands', application_id=1)
+    command = Route('GET', '/applications/{application_id}/commands/{command_id}', application_id=1, command_id=2)
+    for route in (channel, emojis, emoji, other_emojis, commands, command):
+        cache.set(route, None, {})
+
+    # Sending a message doesn't change the channel
+    cache._invalidate_modified(Route('POST', '/channels/{channel_id}/messages', channel_id=1))
+    assert len(cache) == 6
+
+    cache._invalidate_modified(Route('PATCH', '/guilds/{guild_id}/emojis/{emoji_id}', guild_id=1, emoji_id=2))
+    assert cache.get(emoji) is None
+    assert cache.get(emojis) is None
+    assert cache.get(other_emojis) is not None
+
+    # Bulk overwriting replaces every command
+    cache._invalidate_modified(Route('PUT', '/applications/{application_id}/commands', application_id=1))
+    assert cache.get(commands) is None
+    assert cache.get(command) is None
+    assert cache.get(channel) is not None
+
+
+def test_response_cache_gateway_invalidation():
+    cache = discord.ResponseCache()
+    client = discord.Client(intents=discord.Intents.none(), response_cache=cache)
+    member = Route('GET', '/guilds/{guild_id}/members/{user_id}', guild_id=1, user_id=3)
+    user = Route('GET', '/users/{user_id}', user_id=3)
+    channel = Route('GET', '/channels/{channel_id}', channel_id=4)
+    cache.set(member, None, {'user': {'id': '3'}})
+    cache.set(user, None, {'id': '3'})
+    cache.set(channel, None, {'id': '4'})
+
+    user_data = {'id': '3', 'username': 'user', 'discriminator': '0', 'avatar': None}
+    client._connection.parse_guild_member_update({'guild_id': '1', 'user': user_data, 'roles': []})  # type: ignore
+    assert len(cache) == 1
+    client._connection.parse_channel_update({'id': '4', 'type': 0, 'guild_id': '1'})  # type: ignore
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_orders_by_priority():
+    scheduler = _RequestScheduler(3, None)
+    order: List[str] = []
+
+    async def send(name: str, priority: discord.RequestPriority) -> None:
+        await scheduler.block(priority)
+        order.append(name)
+
+    # The first requests use up the budget of the current second
+    await send('first', discord.RequestPriority.normal)
+    await send('second', discord.RequestPriority.bulk)
+    await send('third', discord.RequestPriority.bulk)
+
+    tasks = [
+        asyncio.create_task(send('bulk', discord.RequestPriority.bulk)),
+        asyncio.create_task(send('normal', discord.RequestPriority.normal)),
+        asyncio.create_task(send('bulk-2', discord.RequestPriority.bulk)),
+        asyncio.create_task(send('interaction', discord.RequestPriority.interaction)),
+    ]
+    await asyncio.gather(*tasks)
+    assert order == ['first', 'second', 'third', 'interaction', 'normal', 'bulk', 'bulk-2']
+
+
+@pytest.mark.asyncio
+async def test_bulk_requests_are_capped(monkeypatch):
+    users = FakeUsers()
+    await users.start()
+    monkeypatch.setattr(Route, 'BASE', users.url + '/api/v10')
+    client = discord.Client(intents=discord.Intents.none(), bulk_request_concurrency=2)
+    http = client.http
+    await http.static_login('token')
+    try:
+        # Learn the bucket's limit so that requests can be sent concurrently
+        await http.request(Route('GET', '/users/{user_id}', user_id=0))
+
+        with client.request_priority(discord.RequestPriority.bulk):
+            tasks = [asyncio.create_task(http.request(Route('GET', '/users/{user_id}', user_id=i))) for i in range(6)]
+        # Requests outside of the block are not capped
+        normal = [http.request(Route('GET', '/users/{user_id}', user_id=i)) for i in range(10, 14)]
+        await asyncio.gather(*tasks, *normal)
+        assert users.max_in_flight == 6
+        users.max_in_flight = 0
+
+        await asyncio.gather(*(http.request(Route('GET', '/users/{user_id}', user_id=i), priority=discord.RequestPriority.bulk) for i in range(6)))
+        assert users.max_in_flight == 2
+    finally:
+        await http.close()
+        await users.close()
+
+
+def test_latency_histogram():
+    histogram = discord.LatencyHistogram((0.1, 0.5, 1.0))
+    for value in (0.05, 0.1, 0.2, 0.3, 2.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 0, 1]
+    assert histogram.count == 5
+    assert histogram.mean == pytest.approx(0.53)
+    assert histogram.quantile(0.4) == 0.1
+    assert histogram.quantile(0.5) == 0.5
+    assert histogram.quantile(0.99) == float('inf')
+    assert discord.LatencyHistogram().quantile(0.5) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_http_metrics(monkeypatch):
+    users = FakeUsers()
+    metrics = discord.HTTPMetricsCollector()
+    http = await login(users, monkeypatch, metrics=metrics)
+    try:
+        for user_id in (1, 'bucket', 'global'):
+            await http.request(Route('GET', '/users/{user_id}', user_id=user_id))
+        for user_id in (404, 'cloudflare'):
+            with pytest.raises(discord.HTTPException):
+                await http.request(Route('GET', '/users/{user_id}', user_id=user_id))
+        await http.request(Route('GET', '/users/@me'))
+
+        snapshot = metrics.snapshot()
+        assert list(snapshot) == ['GET /users/@me', 'GET /users/{user_id}']
+        me = snapshot['GET /users/@me']
+        assert (me.requests, me.retries, me.errors, me.responses) == (2, 0, 0, {200: 2})
+
+        route = snapshot['GET /users/{user_id}']
+        assert route.bucket == 'users'
+        assert (route.requests, route.retries, route.errors) == (5, 2, 2)
+        assert route.responses == {200: 3, 404: 1, 429: 3}
+        assert (route.global_ratelimits, route.bucket_ratelimits, route.cloudflare_ratelimits) == (1, 1, 1)
+        assert route.ratelimits == 3
+        assert route.latency.count == 7
+        # Every response took at least the server's delay
+        assert route.latency.total >= 0.05 * 7
+        assert route.blocked >= 0.0 and route.connect_time >= 0.0
+
+        assert [[metrics.route for metrics in group] for group in metrics.by_bucket().values()] == [
+            ['GET /users/@me', 'GET /users/{user_id}']
+        ]
+
+        # Snapshots are not affected by later requests
+        await http.request(Route('GET', '/users/@me'))
+        assert snapshot['GET /users/@me'].requests == 2
+        assert metrics.snapshot()['GET /users/@me'].requests == 3
+
+        metrics.reset()
+        assert metrics.snapshot() == {}
+    finally:
+        await http.close()
+        await users.close()
+
+
+@pytest.mark.asyncio
+async def test_http_metrics_blocked_time(monkeypatch):
+    users = FakeUsers()
+    metrics = discord.HTTPMetricsCollector()
+    http = await login(users, monkeypatch, metrics=metrics)
+    try:
+        await http.ratelimit_backend.set_global(0.2)
+        await http.request(Route('GET', '/users/{user_id}', user_id=1))
+        assert metrics.snapshot()['GET /users/{user_id}'].blocked >= 0.15
+    finally:
+        await http.close()
+        await users.close()
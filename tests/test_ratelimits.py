@@ -0,0 +1,336 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+from typing import Any, List, Optional
+from unittest import mock
+
+import pytest
+from aiohttp import web
+
+from discord.http import HTTPClient, Route
+from discord.ratelimits import RateLimitBackend, RateLimitBroker, SharedRateLimitBackend
+
+
+USER = {'id': '1000', 'username': 'bot', 'discriminator': '0', 'avatar': None, 'bot': True}
+LIMIT = 3
+WINDOW = 0.5
+
+
+class FakeDiscord:
+    """A fake REST API enforcing a single bucket shared by every client using the token."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.ratelimited = 0
+        self.remaining = LIMIT
+        self.reset: Optional[float] = None
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.app = web.Application()
+        self.app.router.add_get('/api/v10/users/@me', self.get_user)
+        self.app.router.add_get('/api/v10/channels/{channel_id}/messages', self.get_messages)
+        self.runner = web.AppRunner(self.app)
+        self.url = ''
+
+    async def start(self) -> None:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = site._server.sockets[0].getsockname()[:2]  # type: ignore
+        self.url = f'http://{host}:{port}'
+
+    async def close(self) -> None:
+        await self.runner.cleanup()
+
+    def json_response(self, data: Any, *, status: int = 200, headers: Any = None) -> web.Response:
+        return web.Response(body=json.dumps(data).encode(), status=status, headers=headers, content_type='application/json')
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        return self.json_response(USER)
+
+    async def get_messages(self, request: web.Request) -> web.Response:
+        now = asyncio.get_running_loop().time()
+        if self.reset is None or now >= self.reset:
+            self.reset = now + WINDOW
+            self.remaining = LIMIT
+
+        reset_after = self.reset - now
+        headers = {
+            'X-Ratelimit-Bucket': 'messages',
+            'X-Ratelimit-Limit': str(LIMIT),
+            'X-Ratelimit-Reset-After': f'{reset_after:.3f}',
+        }
+        if self.remaining <= 0:
+            self.ratelimited += 1
+            headers['X-Ratelimit-Remaining'] = '0'
+            headers['Via'] = '1.1 google'
+            return self.json_response({'message': 'You are being rate limited.', 'retry_after': reset_after, 'global': False}, status=429, headers=headers)
+
+        self.requests += 1
+        self.remaining -= 1
+        headers['X-Ratelimit-Remaining'] = str(self.remaining)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return self.json_response([], headers=headers)
+
+
+async def burst(clients: List[HTTPClient], count: int) -> None:
+    route = Route('GET', '/channels/{channel_id}/messages', channel_id=1)
+    await asyncio.gather(*(client.request(route) for client in clients for _ in range(count)))
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_global(monkeypatch):
+    backend = RateLimitBackend()
+    await backend.start()
+    await backend.set_global(0.1)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await backend.wait_global()
+    assert loop.time() - start >= 0.09
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('shared', [False, True])
+async def test_backends_share_bucket(monkeypatch, shared: bool):
+    fake = FakeDiscord()
+    await fake.start()
+    monkeypatch.setattr(Route, 'BASE', fake.url + '/api/v10')
+
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimits.sock')
+    broker = RateLimitBroker(path)
+    await broker.start()
+
+    loop = asyncio.get_running_loop()
+    clients: List[HTTPClient] = []
+    for _ in range(2):
+        backend = SharedRateLimitBackend(path) if shared else RateLimitBackend()
+        client = HTTPClient(loop, ratelimit_backend=backend)
+        await client.static_login('token')
+        clients.append(client)
+
+    try:
+        # Learn the bucket first, every process has to do this before coordinating
+        await burst(clients[:1], 1)
+        await burst(clients, LIMIT * 2)
+        assert fake.requests == 1 + LIMIT * 4
+        if shared:
+            assert fake.ratelimited == 0
+            assert await clients[1].ratelimit_backend.get_bucket_hash('GET /channels/{channel_id}/messages') == 'messages'
+        else:
+            assert fake.ratelimited > 0
+    finally:
+        for client in clients:
+            await client.close()
+        await broker.close()
+        await fake.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_restores_buckets(monkeypatch):
+    fake = FakeDiscord()
+    await fake.start()
+    monkeypatch.setattr(Route, 'BASE', fake.url + '/api/v10')
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimits.json')
+    loop = asyncio.get_running_loop()
+    route = Route('GET', '/channels/{channel_id}/messages', channel_id=1)
+
+    try:
+        client = HTTPClient(loop, ratelimit_backend=RateLimitBackend(snapshot=path))
+        await client.static_login('token')
+        await client.request(route)
+        await client.close()
+
+        with open(path, encoding='utf-8') as fp:
+            data = json.load(fp)
+        assert data['bucket_hashes'] == {'GET /channels/{channel_id}/messages': 'messages'}
+        assert data['limits']['messages'] == LIMIT
+
+        # Wait for the window to be over as if the process restarted
+        await asyncio.sleep(WINDOW)
+        client = HTTPClient(loop, ratelimit_backend=RateLimitBackend(snapshot=path))
+        await client.static_login('token')
+        ratelimit = client.get_ratelimit('messages:1')
+        assert ratelimit.limit == LIMIT
+        assert ratelimit.remaining == LIMIT
+
+        # The whole bucket is sent at once instead of one request at a time
+        fake.delay = 0.05
+        await burst([client], LIMIT)
+        assert fake.max_in_flight == LIMIT
+        assert fake.ratelimited == 0
+        await client.close()
+    finally:
+        await fake.close()
+
+
+def test_snapshot_corrupted():
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimits.json')
+    with open(path, 'w', encoding='utf-8') as fp:
+        fp.write('{"bucket_hashes": [1, 2]')
+
+    backend = RateLimitBackend(snapshot=path)
+    backend.load_snapshot()
+    assert backend.to_dict()['bucket_hashes'] == {}
+
+    backend.update_from_dict({'bucket_hashes': {'GET /users/@me': 'abc'}, 'limits': {'abc': 5}})
+    backend.update_from_dict({'bucket_hashes': {'GET /users/@me': 'def'}, 'limits': {'abc': 1}})
+    assert backend.to_dict()['bucket_hashes'] == {'GET /users/@me': 'abc'}
+    assert backend.to_dict()['limits'] == {'abc': 5}
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_without_broker():
+    path = os.path.join(tempfile.mkdtemp(), 'missing.sock')
+    backend = SharedRateLimitBackend(path)
+    await backend.start()
+    assert await backend.acquire('key') == 0.0
+    await backend.update('key', limit=1, remaining=0, reset_after=1.0)
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_caches_bucket_hashes():
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimits.sock')
+    broker = RateLimitBroker(path)
+    await broker.start()
+    backend = SharedRateLimitBackend(path)
+    other = SharedRateLimitBackend(path)
+    await backend.start()
+    await other.start()
+    try:
+        route_key = 'GET /users/@me'
+        backend._request = mock.AsyncMock(wraps=backend._request)
+        assert await backend.get_bucket_hash(route_key) is None
+        assert await backend.get_bucket_hash(route_key) is None
+        assert backend._request.await_count == 1
+
+        await backend.set_bucket_hash(route_key, 'abc')
+        assert await backend.get_bucket_hash(route_key) == 'abc'
+        assert backend._request.await_count == 1
+        # Answered after the broker stored the hash, since messages of a connection are handled in order
+        await backend.acquire('key')
+
+        # Learnt through the broker, then answered locally
+        other._request = mock.AsyncMock(wraps=other._request)
+        assert await other.get_bucket_hash(route_key) == 'abc'
+        assert await other.get_bucket_hash(route_key) == 'abc'
+        assert other._request.await_count == 1
+    finally:
+        await backend.close()
+        await other.close()
+        await broker.close()
+
+
+def test_broker_buckets():
+    broker = RateLimitBroker('unused', global_limit=None)
+    assert broker._acquire('key', 0.0) == 0.0
+
+    broker._update('key', 2, 1, 1.0, 0.0)
+    assert broker._acquire('key', 0.1) == 0.0
+    assert broker._acquire('key', 0.1) == pytest.approx(0.9)
+
+    # A stale response from the same window cannot give tokens back
+    broker._update('key', 2, 1, 0.8, 0.2)
+    assert broker._acquire('key', 0.3) == pytest.approx(0.7)
+
+    # Once the window is over the limit is available again for a window of the same length
+    assert broker._acquire('key', 1.1) == 0.0
+    assert broker._acquire('key', 1.1) == 0.0
+    assert broker._acquire('key', 1.1) == pytest.approx(1.0)
+
+    # A rate limit hit extends the window
+    broker._update('key', 2, 0, 3.0, 1.2)
+    assert broker._acquire('key', 1.2) == pytest.approx(3.0)
+
+
+def test_broker_global_limit():
+    broker = RateLimitBroker('unused', global_limit=2)
+    assert broker._acquire('a', 0.0) == 0.0
+    assert broker._acquire('b', 0.0) == 0.0
+    assert broker._acquire('c', 0.5) == pytest.approx(0.5)
+    assert broker._acquire('c', 1.0) == 0.0
+
+    broker._global_until = 5.0
+    assert broker._acquire('d', 2.0) == pytest.approx(3.0)
+
+
+@pytest.mark.asyncio
+async def test_expire_inactive_buckets():
+    backend = RateLimitBackend()
+    buckets = [backend.get_ratelimit(f'bucket:{i}') for i in range(10)]
+    assert backend.bucket_count == 10
+
+    # Using a bucket moves it behind the others
+    assert backend.get_ratelimit('bucket:0') is buckets[0]
+    assert list(backend._buckets)[-1] == 'bucket:0'
+
+    for bucket in buckets[1:5]:
+        bucket._last_request -= 301
+    # A request is still being sent with this one so it has to be kept
+    buckets[1].outgoing = 1
+
+    backend.get_ratelimit('bucket:new')
+    assert backend.bucket_count == 8
+    assert backend.expired_buckets == 3
+    assert list(backend._buckets)[0] == 'bucket:5'
+    assert list(backend._buckets)[-2:] == ['bucket:new', 'bucket:1']
+
+    buckets[1].outgoing = 0
+    for bucket in buckets[5:]:
+        bucket._last_request -= 301
+    backend.get_ratelimit('bucket:new')
+    # bucket:1 is only checked again once the buckets used before it have expired
+    assert list(backend._buckets) == ['bucket:0', 'bucket:1', 'bucket:new']
+    assert backend.expired_buckets == 8
+
+
+@pytest.mark.asyncio
+async def test_known_limit_counts_outgoing_requests():
+    backend = RateLimitBackend()
+    backend.update_from_dict({'bucket_hashes': {}, 'limits': {'abc': 5}})
+    ratelimit = backend.get_ratelimit('abc:1')
+    for _ in range(5):
+        await ratelimit.acquire()
+    assert ratelimit.remaining == 0 and ratelimit.outgoing == 5
+
+    # The first response only accounts for its own request, the other 4 are still being sent
+    response = mock.Mock(headers={'X-Ratelimit-Limit': '5', 'X-Ratelimit-Remaining': '4', 'X-Ratelimit-Reset-After': '10'})
+    ratelimit.update(response)
+    assert ratelimit.remaining == 0
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(ratelimit.acquire(), timeout=0.1)
+    assert ratelimit.outgoing == 5
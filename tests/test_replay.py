@@ -0,0 +1,119 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import tempfile
+from typing import Any, Dict, List
+
+import pytest
+
+import discord
+from discord.replay import GatewayRecorder, GatewayReplayer
+
+
+USER = {'id': '1000', 'username': 'bot', 'discriminator': '0', 'avatar': None, 'bot': True}
+
+
+def frames() -> List[str]:
+    ready = {
+        'v': 10,
+        'user': USER,
+        'guilds': [],
+        'session_id': 'session',
+        'resume_gateway_url': 'wss://gateway.discord.gg',
+        'application': {'id': '1000', 'flags': 0},
+    }
+    typing = {'channel_id': '2000', 'user_id': '3000', 'timestamp': 1700000000}
+    return [
+        json.dumps({'t': None, 's': None, 'op': 10, 'd': {'heartbeat_interval': 41250}}),
+        json.dumps({'t': 'READY', 's': 1, 'op': 0, 'd': ready}),
+        json.dumps({'t': None, 's': None, 'op': 11, 'd': None}),
+        json.dumps({'t': 'TYPING_START', 's': 2, 'op': 0, 'd': typing}),
+        json.dumps({'t': 'SOME_UNKNOWN_EVENT', 's': 3, 'op': 0, 'd': {}}),
+    ]
+
+
+@pytest.fixture
+def path():
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, 'recording.gz')
+
+
+def test_recorder_round_trip(path: str):
+    resumed = '{"op":0,"t":"RESUMED","s":1,"d":{}}'
+    with GatewayRecorder(path) as recorder:
+        recorder.record(None, '{"op":11}')
+        recorder.record(3, resumed)
+
+    assert recorder.is_closed()
+    assert recorder.frames == 2
+    recorder.record(None, 'ignored')
+
+    recorded = list(GatewayReplayer(path))
+    assert [(frame.shard_id, frame.data) for frame in recorded] == [(None, '{"op":11}'), (3, resumed)]
+    assert recorded[0].timestamp <= recorded[1].timestamp
+
+
+def test_replayer_rejects_other_files(path: str):
+    with gzip.open(path, 'wb') as fp:
+        fp.write(b'not a recording')
+
+    with pytest.raises(ValueError):
+        list(GatewayReplayer(path))
+
+
+@pytest.mark.asyncio
+async def test_replay_into_client(path: str):
+    with GatewayRecorder(path) as recorder:
+        for frame in frames():
+            recorder.record(None, frame)
+
+    rerecorded = path + '.copy'
+    client = discord.Client(intents=discord.Intents.all(), gateway_recorder=GatewayRecorder(rerecorded))
+    received: List[Dict[str, Any]] = []
+
+    @client.event
+    async def on_raw_typing(payload: discord.RawTypingEvent) -> None:
+        received.append({'channel_id': payload.channel_id, 'user_id': payload.user_id})
+
+    stats = await GatewayReplayer(path).replay(client, trace_memory=True)
+    client._connection.gateway_recorder.close()  # type: ignore
+
+    assert stats.frames == 5
+    assert stats.events == 3
+    assert stats.parser_calls['READY'] == 1
+    assert stats.parser_calls['TYPING_START'] == 1
+    assert stats.parser_time['READY'] > 0
+    assert stats.peak_memory is not None and stats.peak_memory > 0
+    assert client.user is not None and client.user.id == 1000
+    assert received == [{'channel_id': 2000, 'user_id': 3000}]
+
+    # the replayed frames go through the gateway just like live traffic
+    assert [frame.data for frame in GatewayReplayer(rerecorded)] == frames()
+
+    await client.close()
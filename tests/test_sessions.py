@@ -0,0 +1,181 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, Dict
+from unittest import mock
+
+import discord
+import pytest
+
+
+def guild_payload(guild_id: int) -> Dict[str, Any]:
+    return {
+        'id': str(guild_id),
+        'name': 'guild',
+        'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0}],
+        'channels': [{'id': str(guild_id * 10), 'type': 0, 'name': 'general', 'position': 0}],
+        'threads': [],
+        'members': [],
+    }
+
+
+def make_session(shard_id=None, **kwargs) -> discord.GatewaySession:
+    return discord.GatewaySession(
+        shard_id=shard_id,
+        session_id='abc',
+        sequence=42,
+        resume_gateway_url='wss://gateway-us-east1-b.discord.gg',
+        guilds=[guild_payload(guild_id) for guild_id in (1, 2, 3)],
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_file_session_store_roundtrip(tmp_path):
+    store = discord.FileSessionStore(tmp_path / 'sessions')
+    assert await store.load(None) is None
+
+    await store.save(make_session())
+    await store.save(make_session(shard_id=3))
+
+    session = await store.load(None)
+    assert session is not None
+    assert session.to_dict() == make_session(saved_at=session.saved_at).to_dict()
+    assert (await store.load(3)).shard_id == 3  # type: ignore
+    assert await store.load(4) is None
+
+    await store.delete(None)
+    await store.delete(None)
+    assert await store.load(None) is None
+
+
+@pytest.mark.asyncio
+async def test_file_session_store_ignores_old_sessions(tmp_path):
+    store = discord.FileSessionStore(tmp_path, max_age=60)
+    await store.save(make_session(saved_at=time.time() - 120))
+    assert await store.load(None) is None
+
+    store.max_age = None
+    assert await store.load(None) is not None
+
+
+@pytest.mark.asyncio
+async def test_file_session_store_ignores_corrupted_files(tmp_path):
+    store = discord.FileSessionStore(tmp_path)
+    (tmp_path / 'session.json').write_text('{"session_id":')
+    assert await store.load(None) is None
+
+    (tmp_path / 'session.json').write_text(json.dumps({'shard_id': None}))
+    assert await store.load(None) is None
+
+
+def make_state(**options: Any):
+    from discord.state import ConnectionState
+
+    dispatched = []
+    state = ConnectionState(
+        dispatch=lambda event, *args: dispatched.append(event),
+        handlers={},
+        hooks={},
+        http=mock.MagicMock(),
+        intents=discord.Intents.default(),
+        **options,
+    )
+    state.user = discord.ClientUser(state=state, data={'id': '99', 'username': 'bot', 'discriminator': '0', 'avatar': None})
+    return state, dispatched
+
+
+@pytest.mark.asyncio
+async def test_resumed_session_restores_guild_cache(tmp_path):
+    state, dispatched = make_state(session_store=discord.FileSessionStore(tmp_path))
+    state._restore_session(make_session())
+
+    # The cache is restored before connecting, so the events replayed before RESUMED apply to it
+    assert [guild.id for guild in state.guilds] == [1, 2, 3]
+    assert state.get_channel(20).guild.id == 2  # type: ignore
+    state.parse_channel_update({'id': '10', 'guild_id': '1', 'type': 0, 'name': 'renamed', 'position': 0})  # type: ignore
+    assert dispatched == ['guild_channel_update']
+
+    state.parse_resumed({'__shard_id__': None})  # type: ignore
+    assert dispatched[1:] == ['resumed', 'ready']
+    assert state._restored_sessions == {}
+    state.http.get_guild.assert_not_called()
+
+    # The restored guilds are kept up to date to be saved again
+    assert state._guild_snapshots.to_list([1])[0]['channels'][0]['name'] == 'renamed'
+
+
+def test_guild_snapshots_follow_events():
+    state, _ = make_state(session_store=discord.FileSessionStore('unused'))
+    payload = guild_payload(1)
+    payload['members'] = [
+        {'user': {'id': '99', 'username': 'bot', 'discriminator': '0', 'avatar': None}, 'roles': [], 'flags': 0},
+        {'user': {'id': '5', 'username': 'other', 'discriminator': '0', 'avatar': None}, 'roles': [], 'flags': 0},
+    ]
+    payload['presences'] = []
+    state.parse_guild_create(payload)  # type: ignore
+
+    state.parse_channel_create({'id': '11', 'guild_id': '1', 'type': 0, 'name': 'new', 'position': 1})  # type: ignore
+    state.parse_channel_delete({'id': '10', 'guild_id': '1', 'type': 0})  # type: ignore
+    thread = {
+        'id': '12',
+        'guild_id': '1',
+        'parent_id': '11',
+        'owner_id': '5',
+        'name': 'thread',
+        'type': 11,
+        'message_count': 0,
+        'member_count': 0,
+        'thread_metadata': {'archived': False, 'auto_archive_duration': 60, 'archive_timestamp': '2024-01-01T00:00:00+00:00'},
+    }
+    state.parse_thread_create(thread)  # type: ignore
+    role = {'id': '2', 'name': 'role', 'permissions': '0', 'position': 1, 'color': 0}
+    state.parse_guild_role_create({'guild_id': '1', 'role': role})  # type: ignore
+    state.parse_guild_role_delete({'guild_id': '1', 'role_id': '1'})  # type: ignore
+    state.parse_guild_update({**guild_payload(1), 'name': 'renamed', 'roles': [role]})  # type: ignore
+
+    (snapshot,) = state._guild_snapshots.to_list([1, 2])
+    assert snapshot['name'] == 'renamed'
+    assert [c['id'] for c in snapshot['channels']] == ['11']
+    assert [t['id'] for t in snapshot['threads']] == ['12']
+    assert [r['id'] for r in snapshot['roles']] == ['2']
+    assert [m['user']['id'] for m in snapshot['members']] == ['99']
+    assert 'presences' not in snapshot
+
+    state.parse_thread_update({**thread, 'thread_metadata': {**thread['thread_metadata'], 'archived': True}})  # type: ignore
+    assert state._guild_snapshots.to_list([1])[0]['threads'] == []
+
+    state.parse_guild_delete({'id': '1'})  # type: ignore
+    assert state._guild_snapshots.to_list([1]) == []
+
+
+def test_guild_snapshots_disabled():
+    state, _ = make_state()
+    state.parse_guild_create(guild_payload(1))  # type: ignore
+    assert state._guild_snapshots.to_list([1]) == []
@@ -0,0 +1,72 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import List, Tuple
+
+import pytest
+
+import discord
+
+
+def make_client(**kwargs) -> discord.AutoShardedClient:
+    return discord.AutoShardedClient(intents=discord.Intents.none(), **kwargs)
+
+
+def test_identify_rounds():
+    client = make_client()
+    assert client._get_identify_rounds(range(6), 1) == [[0], [1], [2], [3], [4], [5]]
+    assert client._get_identify_rounds(range(6), 4) == [[0, 1, 2, 3], [4, 5]]
+    assert client._get_identify_rounds([5, 1, 3, 2], 2) == [[5, 2], [1], [3]]
+
+
+@pytest.mark.asyncio
+async def test_launch_shards_concurrently():
+    client = make_client(shard_count=6, identify_concurrency=2)
+    launches: List[Tuple[int, bool]] = []
+    running = 0
+    peak = 0
+
+    async def launch_shard(gateway, shard_id: int, *, initial: bool = False) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0)
+        launches.append((shard_id, initial))
+        running -= 1
+
+    progress: List[Tuple[int, int, int]] = []
+    client.launch_shard = launch_shard  # type: ignore
+    client.dispatch = lambda event, *args: progress.append(args) if event == 'shard_launch' else None  # type: ignore
+
+    await client.launch_shards()
+
+    assert peak == 2
+    assert sorted(launches[:2]) == [(0, True), (1, True)]
+    assert sorted(launches[2:4]) == [(2, False), (3, False)]
+    assert sorted(launches[4:]) == [(4, False), (5, False)]
+    assert [launched for _, launched, _ in progress] == [1, 2, 3, 4, 5, 6]
+    assert {total for _, _, total in progress} == {6}
@@ -0,0 +1,354 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2015-present Rapptz
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+from unittest import mock
+
+import discord
+import pytest
+
+from discord.cache_storage import CompactCacheStorage, CompactMemberStore, LRUCache, LRUCacheStorage, MessageCache
+from discord.state import ConnectionState
+
+
+def make_state(**options: Any) -> Tuple[ConnectionState, List[Tuple[str, Tuple[Any, ...]]]]:
+    dispatched: List[Tuple[str, Tuple[Any, ...]]] = []
+    state = ConnectionState(
+        dispatch=lambda event, *args: dispatched.append((event, args)),
+        handlers={},
+        hooks={},
+        http=mock.MagicMock(),
+        **{'intents': discord.Intents.default(), **options},
+    )
+    return state, dispatched
+
+
+def message_payload(message_id: int, *, channel_id: int = 10, content: str = 'hello') -> Dict[str, Any]:
+    return {
+        'id': str(message_id),
+        'type': 0,
+        'content': content,
+        'channel_id': str(channel_id),
+        'author': {'id': '1', 'username': 'user', 'discriminator': '0', 'avatar': None},
+        'attachments': [],
+        'embeds': [],
+        'mentions': [],
+        'mention_roles': [],
+        'pinned': False,
+        'mention_everyone': False,
+        'tts': False,
+        'timestamp': '2024-01-01T00:00:00.000000+00:00',
+        'edited_timestamp': None,
+        'flags': 0,
+        'components': [],
+    }
+
+
+def test_message_cache_eviction():
+    state, _ = make_state(max_messages=3)
+    for message_id in range(1, 6):
+        state.parse_message_create(message_payload(message_id))  # type: ignore
+
+    cache = state._messages
+    assert isinstance(cache, MessageCache)
+    assert [m.id for m in cache] == [3, 4, 5]
+    assert [m.id for m in reversed(cache)] == [5, 4, 3]
+    assert state._get_message(4).id == 4  # type: ignore
+    assert state._get_message(1) is None
+    assert state._get_message(None) is None
+
+    # The same message being cached again is moved to the back instead of being duplicated
+    state.parse_message_create(message_payload(3, content='again'))  # type: ignore
+    assert [m.id for m in cache] == [4, 5, 3]
+    assert state._get_message(3).content == 'again'  # type: ignore
+    assert [m.id for m in discord.utils.SequenceProxy(cache)] == [4, 5, 3]
+
+
+def test_message_cache_delete():
+    state, dispatched = make_state(max_messages=10)
+    for message_id in range(1, 6):
+        state.parse_message_create(message_payload(message_id))  # type: ignore
+    cache = state._messages
+    assert cache is not None
+
+    message = state._get_message(2)
+    state.parse_message_delete({'id': '2', 'channel_id': '10'})  # type: ignore
+    assert dispatched[-1] == ('message_delete', (message,))
+    assert message not in cache
+    assert state._get_message(2) is None
+
+    state.parse_message_delete_bulk({'ids': ['5', '1', '4', '100'], 'channel_id': '10'})  # type: ignore
+    event, (found,) = dispatched[-1]
+    assert event == 'bulk_message_delete'
+    assert [m.id for m in found] == [1, 4, 5]
+    assert [m.id for m in cache] == [3]
+
+    with pytest.raises(ValueError):
+        cache.remove(message)  # type: ignore
+
+
+def test_message_cache_disabled():
+    state, _ = make_state(max_messages=None)
+    state.parse_message_create(message_payload(1))  # type: ignore
+    assert state._messages is None
+    assert state._get_message(1) is None
+
+
+def guild_payload(guild_id: int, channel_ids: List[int], thread_ids: List[int] = []) -> Dict[str, Any]:
+    return {
+        'id': str(guild_id),
+        'name': 'guild',
+        'owner_id': '1',
+        'roles': [],
+        'emojis': [],
+        'stickers': [],
+        'members': [],
+        'member_count': 0,
+        'features': [],
+        'channels': [
+            {'id': str(channel_id), 'type': 0, 'name': 'channel', 'position': 0, 'permission_overwrites': []}
+            for channel_id in channel_ids
+        ],
+        'threads': [thread_payload(guild_id, thread_id, channel_ids[0]) for thread_id in thread_ids],
+    }
+
+
+def thread_payload(guild_id: int, thread_id: int, parent_id: int, *, archived: bool = False) -> Dict[str, Any]:
+    return {
+        'id': str(thread_id),
+        'guild_id': str(guild_id),
+        'parent_id': str(parent_id),
+        'owner_id': '1',
+        'name': 'thread',
+        'type': 11,
+        'last_message_id': None,
+        'rate_limit_per_user': 0,
+        'message_count': 0,
+        'member_count': 0,
+        'thread_metadata': {'archived': archived, 'auto_archive_duration': 60, 'archive_timestamp': '2024-01-01T00:00:00+00:00'},
+    }
+
+
+def test_channel_index():
+    state, _ = make_state()
+    state._add_guild_from_data(guild_payload(100, [101, 102], [103]))  # type: ignore
+    state._add_guild_from_data(guild_payload(200, [201]))  # type: ignore
+
+    assert state.get_channel(102).guild.id == 100  # type: ignore
+    assert state.get_channel(103).guild.id == 100  # type: ignore
+    assert state.get_channel(201).guild.id == 200  # type: ignore
+    assert state.get_channel(999) is None
+    assert state.get_channel(None) is None
+
+    state.parse_channel_create({'id': '202', 'guild_id': '200', 'type': 0, 'name': 'new', 'position': 1})  # type: ignore
+    state.parse_thread_create(thread_payload(200, 203, 202))  # type: ignore
+    assert state.get_channel(202).guild.id == 200  # type: ignore
+    assert state.get_channel(203).parent_id == 202  # type: ignore
+
+    # Deleting a channel removes its threads as well
+    state.parse_channel_delete({'id': '202', 'guild_id': '200', 'type': 0})  # type: ignore
+    assert state.get_channel(202) is None
+    assert state.get_channel(203) is None
+    assert 202 not in state._channel_guilds and 203 not in state._channel_guilds
+
+    state.parse_thread_update(thread_payload(100, 103, 101, archived=True))  # type: ignore
+    assert state.get_channel(103) is None
+
+    state.parse_thread_list_sync({'guild_id': '100', 'threads': [thread_payload(100, 104, 101)], 'members': []})  # type: ignore
+    assert state.get_channel(104).guild.id == 100  # type: ignore
+
+    state._remove_guild(state._get_guild(100))  # type: ignore
+    assert state.get_channel(101) is None
+    assert state.get_channel(104) is None
+    assert set(state._channel_guilds) == {201}
+
+
+def member_payload(user_id: int) -> Dict[str, Any]:
+    return {
+        'user': {'id': str(user_id), 'username': f'user{user_id}', 'discriminator': '0', 'avatar': None},
+        'roles': [],
+        'joined_at': '2024-01-01T00:00:00.000000+00:00',
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+
+def test_lru_cache():
+    cache: LRUCache[int, str] = LRUCache(3, pinned=(1,))
+    for key in range(1, 4):
+        cache[key] = str(key)
+
+    # Using 2 makes 3 the least recently used unpinned key
+    assert cache.get(2) == '2'
+    cache[4] = '4'
+    assert list(cache) == [2, 4, 1]
+    cache[5] = '5'
+    assert list(cache) == [4, 1, 5]
+    assert cache.evictions == 2
+    assert 1 in cache and 3 not in cache
+    assert cache.get(3) is None
+
+    # Iterating over a copy allows modifying the cache meanwhile
+    for key, value in cache.items():
+        cache[key] = value * 2
+    assert list(cache.values()) == ['44', '11', '55']
+
+    del cache[4]
+    assert len(cache) == 2
+
+    with pytest.raises(ValueError):
+        LRUCache(0)
+
+
+def test_lru_cache_storage():
+    storage = LRUCacheStorage(members=2, emojis=1)
+    state, _ = make_state(cache_storage=storage, intents=discord.Intents.all())
+    state.user = discord.ClientUser(state=state, data=member_payload(1)['user'])  # type: ignore
+    assert isinstance(state._emojis, LRUCache)
+    assert isinstance(state._stickers, dict)
+
+    payload = guild_payload(100, [101])
+    payload['members'] = [member_payload(user_id) for user_id in range(1, 5)]
+    guild = state._add_guild_from_data(payload)  # type: ignore
+    assert isinstance(guild._members, LRUCache)
+    assert guild.me is not None
+    assert [m.id for m in guild.members] == [4, 1]
+
+    guild._remove_member(discord.Object(4))
+    assert [m.id for m in guild.members] == [1]
+    assert guild.get_member(1) is guild.me
+
+    with pytest.raises(TypeError):
+        make_state(cache_storage={})
+
+
+def test_compact_member_store():
+    state, dispatched = make_state(cache_storage=CompactCacheStorage(), intents=discord.Intents.all())
+    state.user = discord.ClientUser(state=state, data=member_payload(1)['user'])  # type: ignore
+
+    payload = guild_payload(100, [101])
+    payload['members'] = [member_payload(user_id) for user_id in range(1, 5)]
+    payload['members'][1].update(nick='nick', roles=['20', '10'], premium_since='2024-02-01T12:30:00.123456+00:00')
+    payload['members'][2].update(roles=['10', '20'], avatar='abc')
+    payload['presences'] = [{'user': {'id': '3'}, 'status': 'online', 'client_status': {'web': 'online'}, 'activities': []}]
+    guild = state._add_guild_from_data(payload)  # type: ignore
+    store = guild._members
+    assert isinstance(store, CompactMemberStore)
+    assert len(store) == 4 and 2 in store and 5 not in store
+    # Members with the same roles share the same role set
+    assert len(store._role_sets) == 2
+
+    member = guild.get_member(2)
+    assert member is not None and member is not guild.get_member(2)
+    assert member == guild.get_member(2)
+    assert member.nick == 'nick'
+    assert list(member._roles) == [10, 20]
+    assert member.joined_at == discord.utils.parse_time('2024-01-01T00:00:00.000000+00:00')
+    assert member.premium_since == discord.utils.parse_time('2024-02-01T12:30:00.123456+00:00')
+    assert member.timed_out_until is None
+    assert member._user is state.get_user(2)
+    assert member.status is discord.Status.offline
+
+    member = guild.get_member(3)
+    assert member is not None
+    assert member._avatar == 'abc'
+    assert member.status is discord.Status.online
+    assert member.web_status is discord.Status.online
+
+    # Gateway updates are stored back
+    state.parse_presence_update({'guild_id': '100', 'user': {'id': '2'}, 'status': 'idle', 'client_status': {}, 'activities': []})  # type: ignore
+    assert guild.get_member(2).status is discord.Status.idle  # type: ignore
+    update = {'guild_id': '100', **member_payload(4), 'nick': 'renamed', 'communication_disabled_until': None}
+    state.parse_guild_member_update(update)  # type: ignore
+    event, (before, after) = dispatched[-1]
+    assert event == 'member_update'
+    assert (before.nick, after.nick) == (None, 'renamed')
+    assert guild.get_member(4).nick == 'renamed'  # type: ignore
+
+    # Rows of removed members are reused
+    guild._remove_member(discord.Object(3))
+    assert guild.get_member(3) is None
+    state.parse_guild_member_add({'guild_id': '100', **member_payload(5)})  # type: ignore
+    assert len(store._users) == 4
+    member = guild.get_member(5)
+    assert member is not None and member._avatar is None and member.status is discord.Status.offline
+    assert sorted(m.id for m in guild.members) == [1, 2, 4, 5]
+    assert guild.me is not None and guild.me.id == 1
+
+    # Role sets no member has anymore are removed and their index is reused
+    update = {'guild_id': '100', **member_payload(2), 'roles': ['30'], 'communication_disabled_until': None}
+    state.parse_guild_member_update(update)  # type: ignore
+    assert set(store._role_set_indexes) == {(), (30,)}
+    update = {'guild_id': '100', **member_payload(4), 'roles': ['40'], 'communication_disabled_until': None}
+    state.parse_guild_member_update(update)  # type: ignore
+    assert len(store._role_sets) == 3
+    assert list(guild.get_member(4)._roles) == [40]  # type: ignore
+    guild._remove_member(discord.Object(4))
+    assert set(store._role_set_indexes) == {(), (30,)}
+
+
+def role_payload(role_id: int, name: str = 'role') -> Dict[str, Any]:
+    return {'id': str(role_id), 'name': name, 'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}
+
+
+def test_lazy_guild():
+    state, dispatched = make_state(lazy_guilds=True)
+    payload = guild_payload(100, [101, 102], [103])
+    payload['roles'] = [role_payload(100, '@everyone'), role_payload(110), role_payload(111)]
+    guild = state._add_guild_from_data(payload)  # type: ignore
+    channels = guild._channels
+    assert isinstance(channels, discord.utils.LazyMapping)
+    assert len(channels.objects) == 0 and len(guild._roles.objects) == 0  # type: ignore
+    assert len(channels) == 2 and 101 in channels and 103 in guild._threads
+
+    # Only what is accessed is created
+    channel = state.get_channel(102)
+    assert isinstance(channel, discord.TextChannel) and channel.guild is guild
+    assert list(channels.objects) == [102]
+    assert state.get_channel(102) is channel
+    assert guild.default_role.name == '@everyone'
+    assert list(guild._roles.objects) == [100]  # type: ignore
+
+    # Events apply to objects that have not been created yet
+    state.parse_channel_update({'id': '101', 'guild_id': '100', 'type': 0, 'name': 'renamed', 'position': 0})  # type: ignore
+    assert guild.get_channel(101).name == 'renamed'  # type: ignore
+    state.parse_guild_role_delete({'guild_id': '100', 'role_id': '111'})  # type: ignore
+    assert dispatched[-1][0] == 'guild_role_delete'
+    assert guild.get_role(111) is None
+    state.parse_thread_delete({'id': '103', 'guild_id': '100', 'parent_id': '101', 'type': 11})  # type: ignore
+    assert guild.get_thread(103) is None and state.get_channel(103) is None
+
+    assert sorted(r.id for r in guild.roles) == [100, 110]
+    assert sorted(c.id for c in guild.channels) == [101, 102]
+    assert len(channels.raw) == 0  # type: ignore
+
+    # A guild update replaces the roles with new payloads
+    update = {k: v for k, v in payload.items() if k not in ('channels', 'threads', 'members')}
+    state.parse_guild_update({**update, 'roles': [role_payload(100, '@everyone'), role_payload(112)]})  # type: ignore
+    assert len(guild._roles.raw) == 2  # type: ignore
+    assert guild.get_role(112) is not None and guild.get_role(110) is None
+    assert guild.get_channel(101).name == 'renamed'  # type: ignore
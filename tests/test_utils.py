@@ -334,3 +334,20 @@ def test_is_inside_class():
 )
 def test_format_dt(dt: datetime.datetime, style: typing.Optional[utils.TimestampStyle], formatted: str):
     assert utils.format_dt(dt, style=style) == formatted
+
+
+def test_lazy_mapping_keeps_payload_when_factory_fails():
+    def factory(data: typing.Dict[str, typing.Any]) -> str:
+        return data['name']
+
+    mapping = utils.LazyMapping({}, factory)
+    mapping.add_raw(1, {})
+    mapping.add_raw(2, {'name': 'two'})
+    with pytest.raises(KeyError):
+        mapping[1]
+    assert 1 in mapping and len(mapping) == 2
+
+    mapping.add_raw(1, {'name': 'one'})
+    assert mapping[1] == 'one'
+    assert dict(mapping.items()) == {1: 'one', 2: 'two'}
+    assert mapping.raw == {}